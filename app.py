@@ -1,68 +1,77 @@
 ﻿import json
+import multiprocessing
+import os
 import threading
+import time
 import webbrowser
-from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
-from typing import Dict, List, Optional, Tuple
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
 
-import ccxt
-import requests
 import tkinter as tk
 from tkinter import ttk
-from license_manager import ensure_valid_license, format_license_summary
-
-
-EXCHANGES: List[Tuple[str, str]] = [
-    ("binance", "Binance"),
-    ("bybit", "Bybit"),
-    ("coinbase", "Coinbase"),
-    ("okx", "OKX"),
-    ("kraken", "Kraken"),
-    ("gateio", "Gate.io"),
-    ("mexc", "MEXC"),
-    ("bitget", "Bitget"),
-    ("htx", "HTX"),
-    ("upbit", "Upbit"),
-    ("kucoin", "KuCoin"),
-    ("bingx", "BingX"),
-    ("cryptocom", "Crypto.com"),
-    ("bitmart", "BitMart"),
-    ("lbank", "LBank"),
-    ("whitebit", "WhiteBIT"),
-    ("poloniex", "Poloniex"),
-    ("bitstamp", "Bitstamp"),
-    ("coinex", "CoinEx"),
-    ("btse", "BTSE"),
-    ("bitfinex", "Bitfinex"),
-]
-
-FALLBACK_QUOTES = ["USDT", "USD", "USDC", "BTC"]
+from license_core import format_license_summary
+from license_manager import ensure_valid_license
+from metrics import (
+    METRICS_FILE,
+    STAGE_CYCLE,
+    STAGE_DEPTH,
+    STAGE_FETCH,
+    STAGE_FILTERS,
+    STAGE_MERGE,
+    STAGE_RENDER,
+    STAGE_SPREAD,
+    STAGE_USD_RATES,
+    write_metrics_file,
+)
+from record_replay import Recorder, Replay, recording_client_factory, replay_client_factory
+from scanner import (
+    DEFAULT_TRADE_NOTIONAL_USD,
+    EXCHANGES,
+    POPULAR_START_COUNT,
+    SCAN_BACKENDS,
+    ArbitrageScanner,
+    create_exchange_client,
+)
+from spread_engine import SpreadEngine
+from spread_history import SpreadHistory, render_sparkline
+from spread_stats import SpreadStatsBook
+from stream_feed import StreamFeed, stream_backend_available, stream_supported_exchanges
+from universe_cache import load_scan_state, save_scan_state
+from universe_scheduler import UniverseScheduler
+from virtual_table import Cell, VirtualTable
+
+
 SETTINGS_FILE = "user_settings.json"
 BLACKLIST_FILE = "coin_blacklist.json"
-POPULAR_START_COUNT = 500
-LONG_SCAN_LIMIT = 10000
+SCAN_MODES = ["AUTO", "MANUAL", "SNAPSHOT", "STREAM"]
+STREAM_RENDER_INTERVAL_MS = 500
+STREAM_URL_ENV = "ARBITRAJ_STREAM_URL"
+RECORD_FILE_ENV = "ARBITRAJ_RECORD_FILE"
+REPLAY_FILE_ENV = "ARBITRAJ_REPLAY_FILE"
+REPLAY_SPEED_ENV = "ARBITRAJ_REPLAY_SPEED"
 SAVED_TOP_LIMIT = 10
+SCAN_STATE_SAVE_INTERVAL_SECONDS = 60.0
+STATS_REFRESH_INTERVAL_MS = 1000
+METRICS_WRITE_INTERVAL_MS = 10000
+HISTORY_SUMMARY_LIMIT = 100
+HISTORY_DEFAULT_THRESHOLD = 2.0
+SPARKLINE_WINDOW_SECONDS = 60 * 60
+SPARKLINE_BUCKETS = 12
+STAGE_LABELS = {
+    STAGE_CYCLE: "Цикл целиком",
+    STAGE_USD_RATES: "Курсы в $",
+    STAGE_FETCH: "Запросы к биржам",
+    STAGE_MERGE: "Запись в матрицу",
+    STAGE_SPREAD: "Расчёт спредов",
+    STAGE_FILTERS: "Фильтры",
+    STAGE_DEPTH: "Стаканы",
+    STAGE_RENDER: "Отрисовка таблицы",
+}
 SAVED_TOP_POOL_LIMIT = 15
 SAVED_BATCH_ADD = 5
-NETWORK_ALIASES = {
-    "ERC20": "ETHEREUM",
-    "ETH": "ETHEREUM",
-    "ARBITRUMONE": "ARBITRUM",
-    "ARBONE": "ARBITRUM",
-    "ARBEVM": "ARBITRUM",
-    "BEP20": "BSC",
-    "BSC": "BSC",
-    "BSC(BEP20)": "BSC",
-    "TRC20": "TRON",
-    "TRX": "TRON",
-    "MATIC": "POLYGON",
-    "POLYGON": "POLYGON",
-    "SOL": "SOLANA",
-    "AVAXC": "AVALANCHE-C",
-    "AVAXC-CHAIN": "AVALANCHE-C",
-    "OPTIMISM": "OPTIMISM",
-    "OP": "OPTIMISM",
-}
+
+
 class SavedTopWindow:
     def __init__(
         self,
@@ -101,20 +110,8 @@ class SavedTopWindow:
         )
         self.coins_label.pack(anchor=tk.W, pady=(4, 0))
 
-        table_wrap = tk.Frame(self.window, bg="#111827", bd=1, relief=tk.FLAT)
-        table_wrap.pack(fill=tk.BOTH, expand=True, padx=10, pady=(0, 10))
-
-        self.canvas = tk.Canvas(table_wrap, bg="#111827", highlightthickness=0)
-        self.scroll_y = ttk.Scrollbar(table_wrap, orient=tk.VERTICAL, command=self.canvas.yview)
-        self.scroll_x = ttk.Scrollbar(table_wrap, orient=tk.HORIZONTAL, command=self.canvas.xview)
-        self.canvas.configure(yscrollcommand=self.scroll_y.set, xscrollcommand=self.scroll_x.set)
-        self.scroll_y.pack(side=tk.RIGHT, fill=tk.Y)
-        self.scroll_x.pack(side=tk.BOTTOM, fill=tk.X)
-        self.canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
-
-        self.inner = tk.Frame(self.canvas, bg="#111827")
-        self.inner.bind("<Configure>", lambda _: self.canvas.configure(scrollregion=self.canvas.bbox("all")))
-        self.canvas.create_window((0, 0), window=self.inner, anchor="nw")
+        self.table = VirtualTable(self.window)
+        self.table.pack(fill=tk.BOTH, expand=True, padx=10, pady=(0, 10))
 
         self.status_var = tk.StringVar(value="Ожидание обновления...")
         ttk.Label(self.window, textvariable=self.status_var).pack(anchor=tk.W, padx=10, pady=(0, 10))
@@ -136,137 +133,142 @@ class SavedTopWindow:
         if not self.alive:
             return
 
-        for child in self.inner.winfo_children():
-            child.destroy()
-
-        headers = ["X", "MONETA", "PAIR", "TX"] + [self.app.exchange_name_by_id[ex_id] for ex_id in self.exchanges] + ["% RAZNICA"]
-        for col, header in enumerate(headers):
-            tk.Label(
-                self.inner,
-                text=header,
-                bg="#1e293b",
-                fg="#9ab6ff",
-                font=("Consolas", 10, "bold"),
-                padx=6,
-                pady=6,
-                relief=tk.GROOVE,
-                borderwidth=1,
-            ).grid(row=0, column=col, sticky="nsew")
-
-        for row_idx, (coin, row_data) in enumerate(items, start=1):
-            spread = row_data.get("spread")
-            min_ex = row_data.get("min_ex")
-            max_ex = row_data.get("max_ex")
-            coin_bg = "#111827" if row_idx % 2 else "#0f172a"
-
-            remove_btn = tk.Label(
-                self.inner,
-                text="x",
-                bg=coin_bg,
-                fg="#ff8c8c",
-                font=("Consolas", 10, "bold"),
-                padx=6,
-                pady=5,
-                relief=tk.GROOVE,
-                borderwidth=1,
-                cursor="hand2",
-            )
-            remove_btn.grid(row=row_idx, column=0, sticky="nsew")
-            remove_btn.bind("<Button-1>", lambda _e, c=coin: self.app.exclude_saved_top_coin(c))
-
-            tk.Label(
-                self.inner,
-                text=coin,
-                bg=coin_bg,
-                fg="#d7dde8",
-                font=("Consolas", 10, "bold"),
-                padx=6,
-                pady=5,
-                relief=tk.GROOVE,
-                borderwidth=1,
-            ).grid(row=row_idx, column=1, sticky="nsew")
-
-            pair_label = tk.Label(
-                self.inner,
-                text=str(row_data.get("pair", "-")),
-                bg=coin_bg,
-                fg="#bac7dd",
-                font=("Consolas", 10),
-                padx=6,
-                pady=5,
-                relief=tk.GROOVE,
-                borderwidth=1,
-                cursor="hand2" if min_ex and max_ex else "",
-            )
-            pair_label.grid(row=row_idx, column=2, sticky="nsew")
-            if min_ex and max_ex:
-                pair_label.bind(
-                    "<Button-1>",
-                    lambda _e, row=row_data: self.app.open_pair_links(row),
-                )
-
-            tx_text = str(row_data.get("tx", "NO"))
-            tk.Label(
-                self.inner,
-                text=tx_text,
-                bg=coin_bg,
-                fg="#8dd6ff" if tx_text in {"GOOO", "YES"} else "#8fa1bf",
-                font=("Consolas", 9, "bold"),
-                padx=4,
-                pady=5,
-                relief=tk.GROOVE,
-                borderwidth=1,
-            ).grid(row=row_idx, column=3, sticky="nsew")
-
-            for c_off, exchange_id in enumerate(self.exchanges, start=4):
-                price = row_data["prices"].get(exchange_id)
-                link = row_data["links"].get(exchange_id)
-                bg = coin_bg
-                fg = "#d7dde8"
-                if exchange_id == min_ex:
-                    bg = "#0f3d26"
-                    fg = "#9cffc7"
-                if exchange_id == max_ex:
-                    bg = "#4c1d1d"
-                    fg = "#ffb3b3"
-
-                cell = tk.Label(
-                    self.inner,
-                    text=self.app._format_price(price),
-                    bg=bg,
-                    fg=fg,
-                    font=("Consolas", 10, "underline" if link and price is not None else "normal"),
-                    cursor="hand2" if link and price is not None else "",
-                    padx=6,
-                    pady=5,
-                    relief=tk.GROOVE,
-                    borderwidth=1,
-                )
-                cell.grid(row=row_idx, column=c_off, sticky="nsew")
-                if link and price is not None:
-                    cell.bind("<Button-1>", lambda _e, url=link: webbrowser.open_new_tab(url))
-
-            spread_text = "N/A" if spread is None else f"{spread:.2f}%"
-            spread_fg = "#8fa1bf" if spread is None else "#ffe08a"
-            tk.Label(
-                self.inner,
-                text=spread_text,
-                bg=coin_bg,
-                fg=spread_fg,
-                font=("Consolas", 10, "bold"),
-                padx=6,
-                pady=5,
-                relief=tk.GROOVE,
-                borderwidth=1,
-            ).grid(row=row_idx, column=len(headers) - 1, sticky="nsew")
-
-        for col in range(len(headers)):
-            self.inner.grid_columnconfigure(col, weight=1)
+        headers = ["X", "MONETA", "PAIR", "TX"] + [self.app.exchange_name_by_id[ex_id] for ex_id in self.exchanges] + ["% RAZNICA", "% NET"]
+        widths = [40, 110, 130, 60] + [125 for _ in self.exchanges] + [150, 90]
+        exchanges = list(self.exchanges)
+        self.table.set_columns(headers, widths)
+        self.table.set_items(
+            items,
+            lambda item, idx: self.app._table_row_cells(item, idx, exchanges, removable=True),
+        )
 
         now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         self.status_var.set(f"Обновлено: {now} | Монет: {len(items)}")
 
 
+class StatsWindow:
+    def __init__(self, app: "PriceTrackerApp") -> None:
+        self.app = app
+        self.window = tk.Toplevel(app.root)
+        self.window.title("Статистика сканирования")
+        self.window.geometry("1400x720")
+        self.window.minsize(640, 360)
+        self.window.resizable(True, True)
+        self.window.configure(bg="#0f131a")
+        self.alive = True
+        self.refresh_job: Optional[str] = None
+
+        tk.Label(
+            self.window,
+            text="Этапы цикла",
+            bg="#0f131a",
+            fg="#8fb4ff",
+            font=("Consolas", 12, "bold"),
+        ).pack(anchor=tk.W, padx=10, pady=(10, 4))
+        self.stages_table = VirtualTable(self.window)
+        self.stages_table.pack(fill=tk.X, padx=10)
+        self.stages_table.frame.configure(height=250)
+        self.stages_table.frame.grid_propagate(False)
+        self.stages_table.set_columns(
+            ["ЭТАП", "РАЗ", "ПОСЛ. мс", "EWMA мс", "СРЕДН. мс", "МАКС мс"],
+            [200, 80, 110, 110, 110, 110],
+        )
+
+        tk.Label(
+            self.window,
+            text="Биржи",
+            bg="#0f131a",
+            fg="#8fb4ff",
+            font=("Consolas", 12, "bold"),
+        ).pack(anchor=tk.W, padx=10, pady=(10, 4))
+        self.exchanges_table = VirtualTable(self.window)
+        self.exchanges_table.pack(fill=tk.BOTH, expand=True, padx=10)
+        self.exchanges_table.set_columns(
+            ["БИРЖА", "ЗАПРОСОВ", "ОШИБОК", "EWMA мс", "TICKERS мс", "TICKER шт", "MARKETS мс", "КБ", "ВОЗРАСТ с", "УСТАР.", "ЦЕПЬ", "THROTTLE", "КЛАССЫ ОШИБОК"],
+            [120, 90, 80, 90, 100, 90, 100, 90, 90, 80, 90, 90, 330],
+        )
+
+        self.status_var = tk.StringVar(value=f"Файл метрик: {METRICS_FILE}")
+        ttk.Label(self.window, textvariable=self.status_var).pack(anchor=tk.W, padx=10, pady=(6, 10))
+
+        self.window.protocol("WM_DELETE_WINDOW", self._on_close)
+        self.refresh()
+
+    def _on_close(self) -> None:
+        self.alive = False
+        if self.refresh_job is not None:
+            self.window.after_cancel(self.refresh_job)
+        self.window.destroy()
+
+    def refresh(self) -> None:
+        if not self.alive:
+            return
+        snapshot = self.app.scanner.metrics_snapshot()
+        stages = [
+            (stage, snapshot["stages"][stage]) for stage in STAGE_LABELS if stage in snapshot["stages"]
+        ]
+        self.stages_table.set_items(stages, self._stage_cells)
+        exchanges = sorted(
+            snapshot["exchanges"].items(),
+            key=lambda item: item[1].get("latency_ewma_ms") or 0.0,
+            reverse=True,
+        )
+        self.exchanges_table.set_items(exchanges, self._exchange_cells)
+        uptime = int(snapshot["uptime_seconds"])
+        self.status_var.set(f"Время работы: {uptime // 60} мин {uptime % 60} с | Файл метрик: {METRICS_FILE}")
+        self.refresh_job = self.window.after(STATS_REFRESH_INTERVAL_MS, self.refresh)
+
+    def _stage_cells(self, item: Tuple[str, dict], row_idx: int) -> List[Cell]:
+        stage, stats = item
+        bg = "#0f172a" if row_idx % 2 else "#111827"
+        cells: List[Cell] = [(STAGE_LABELS[stage], "#d7dde8", bg, "bold", None)]
+        for key in ["count", "last_ms", "ewma_ms", "avg_ms", "max_ms"]:
+            cells.append((str(stats[key]), "#bac7dd", bg, "normal", None))
+        return cells
+
+    def _exchange_cells(self, item: Tuple[str, dict], row_idx: int) -> List[Cell]:
+        exchange_id, entry = item
+        bg = "#0f172a" if row_idx % 2 else "#111827"
+        methods = entry.get("methods", {})
+        errors = entry.get("error_classes", {})
+        circuit = entry.get("circuit", "closed")
+        quote_age = entry.get("quote_age_ewma_ms")
+        values = [
+            str(entry.get("calls", 0)),
+            str(entry.get("errors", 0)),
+            str(entry.get("latency_ewma_ms", "-")),
+            str(methods.get("fetch_tickers", {}).get("avg_ms", "-")),
+            str(methods.get("fetch_ticker", {}).get("count", 0)),
+            str(methods.get("load_markets", {}).get("last_ms", "-")),
+            f"{entry.get('bytes', 0) / 1024:.0f}",
+            "-" if quote_age is None else f"{quote_age / 1000.0:.1f}",
+            str(entry.get("stale_quotes", 0)),
+        ]
+        cells: List[Cell] = [(str(entry.get("name", exchange_id)), "#d7dde8", bg, "bold", None)]
+        cells.extend((value, "#bac7dd", bg, "normal", None) for value in values)
+        cells.append((circuit, "#8dd6ff" if circuit == "closed" else "#ff8c8c", bg, "small_bold", None))
+        cells.append((str(entry.get("throttle", 1.0)), "#bac7dd", bg, "normal", None))
+        cells.append((", ".join(f"{name}:{count}" for name, count in errors.items()) or "-", "#ffb86b", bg, "normal", None))
+        return cells
+
+
+def _client_setup_from_env() -> Tuple[Optional[Callable[[str], object]], Optional[Recorder], str]:
+    # Exchange clients for the scanner: replayed, recorded or plain ccxt.
+    replay_path = os.environ.get(REPLAY_FILE_ENV, "").strip()
+    if replay_path:
+        try:
+            speed = float(os.environ.get(REPLAY_SPEED_ENV, "1") or 1)
+        except ValueError:
+            speed = 1.0
+        replay = Replay(Path(replay_path), speed)
+        return replay_client_factory(replay), None, f"Воспроизведение ответов бирж из {replay_path} (скорость {speed:g})."
+    record_path = os.environ.get(RECORD_FILE_ENV, "").strip()
+    if record_path:
+        recorder = Recorder(Path(record_path))
+        return recording_client_factory(recorder, create_exchange_client), recorder, f"Запись ответов бирж в {record_path}."
+    return None, None, ""
+
+
 class PriceTrackerApp:
     def __init__(self, root: tk.Tk, license_info: Optional[Dict[str, str]] = None) -> None:
         self.root = root
@@ -276,34 +278,64 @@ class PriceTrackerApp:
         self.root.configure(bg="#0f131a")
         self.license_info = license_info or {}
 
-        self.exchange_clients: Dict[str, ccxt.Exchange] = {}
-        self.exchange_markets: Dict[str, set] = {}
-        self.exchange_locks: Dict[str, threading.Lock] = {}
-        self.exchange_market_locks: Dict[str, threading.Lock] = {}
-        self.exchange_available: Dict[str, bool] = {}
-        self.exchange_currency_networks: Dict[str, Dict[str, List[dict]]] = {}
+        client_factory, self.recorder, client_note = _client_setup_from_env()
+        self.scanner = ArbitrageScanner(
+            log=lambda message: self.root.after(0, lambda: self.log(message)),
+            client_factory=client_factory,
+        )
+        if client_note:
+            self.scanner.log(client_note)
+        self.scan_engine = self.scanner.scan_engine
 
         self.auto_refresh_job: Optional[str] = None
         self.is_loading_exchanges = False
-        self.is_refreshing = False
+        self.stream_feed: Optional[StreamFeed] = None
+        self.stream_lock = threading.Lock()
+        self.stream_rows: Dict[str, Dict[str, object]] = {}
+        self.stream_coins: List[str] = []
+        self.stream_exchanges: List[str] = []
+        self.stream_symbol_coin: Dict[Tuple[str, str], str] = {}
+        self.stream_dirty: set[str] = set()
+        self.stream_render_job: Optional[str] = None
+        # Bumped by every start/stop; a start whose preparation finishes after
+        # a newer start or stop is dropped.
+        self.stream_generation = 0
+        # (coins, exchanges, quote, pricing) the feed is subscribed to
+        self.stream_key: Optional[Tuple] = None
+        self.stream_engine = SpreadEngine()
 
         self.exchange_name_by_id = {exchange_id: name for exchange_id, name in EXCHANGES}
         self.exchange_order = [exchange_id for exchange_id, _ in EXCHANGES]
         self.exchange_vars: Dict[str, tk.BooleanVar] = {}
         self.bybit_universe: List[str] = []
-        self.bybit_cursor = 0
-        self.bybit_cycle_count = 0
         self.bybit_universe_ready = False
+        self.universe_scheduler = UniverseScheduler(self.scanner, POPULAR_START_COUNT)
+        self.scan_state_saved_at = 0.0
+        self.universe_refreshing = False
         self.scan_batch_size = 50
         self.saved_top_window: Optional[SavedTopWindow] = None
+        self.stats_window: Optional[StatsWindow] = None
+        self.spread_history: Optional[SpreadHistory] = None
+        try:
+            self.spread_history = SpreadHistory()
+        except Exception as exc:
+            self.scanner.log(f"История спредов отключена: {exc}")
+        # coin -> sparkline and time above the threshold, for the main table;
+        # refreshed on the background pool after a render, one query at a time
+        self.history_view: Dict[str, str] = {}
+        self.history_refreshing = False
+        # Rolling per-coin spread stats; the saved top is ranked by their score.
+        self.spread_stats = SpreadStatsBook()
         self.saved_top_memory: Dict[str, Dict[str, object]] = {}
         self.saved_top_excluded: set[str] = set()
         self.blacklist: set[str] = set()
 
         self._load_blacklist(silent=True)
+        self.scanner.blacklist = self.blacklist
         self._build_ui()
         self.load_settings(silent=True)
         self._bootstrap_exchanges_async()
+        self.root.after(METRICS_WRITE_INTERVAL_MS, self._write_metrics_periodically)
 
         self.root.protocol("WM_DELETE_WINDOW", self._on_close)
 
@@ -367,13 +399,25 @@ class PriceTrackerApp:
         self.scan_mode_combo = ttk.Combobox(
             controls,
             textvariable=self.scan_mode_var,
-            values=["AUTO", "MANUAL"],
+            values=SCAN_MODES,
             width=8,
             state="readonly",
             style="Dark.TCombobox",
         )
         self.scan_mode_combo.pack(side=tk.LEFT, padx=(8, 14))
 
+        ttk.Label(controls, text="Движок:").pack(side=tk.LEFT)
+        self.backend_var = tk.StringVar(value="THREADS")
+        self.backend_combo = ttk.Combobox(
+            controls,
+            textvariable=self.backend_var,
+            values=SCAN_BACKENDS,
+            width=9,
+            state="readonly",
+            style="Dark.TCombobox",
+        )
+        self.backend_combo.pack(side=tk.LEFT, padx=(8, 14))
+
         ttk.Label(controls, text="Котировка:").pack(side=tk.LEFT)
         self.quote_var = tk.StringVar(value="USDT")
         self.quote_combo = ttk.Combobox(
@@ -406,6 +450,9 @@ class PriceTrackerApp:
         self.load_btn = ttk.Button(controls, text="Загрузить", command=self.load_settings)
         self.load_btn.pack(side=tk.LEFT, padx=(8, 0))
 
+        self.stats_btn = ttk.Button(controls, text="Статистика", command=self.open_stats_window)
+        self.stats_btn.pack(side=tk.LEFT, padx=(8, 0))
+
         filters = ttk.Frame(top)
         filters.pack(fill=tk.X, pady=(10, 0))
 
@@ -440,6 +487,23 @@ class PriceTrackerApp:
         )
         self.top_n_combo.pack(side=tk.LEFT, padx=(8, 0))
 
+        execution = ttk.Frame(top)
+        execution.pack(fill=tk.X, pady=(10, 0))
+
+        self.executable_spread_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(execution, text="Исполнимый спред (ask/bid)", variable=self.executable_spread_var).pack(side=tk.LEFT)
+
+        self.depth_check_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(execution, text="Глубина стакана", variable=self.depth_check_var).pack(side=tk.LEFT, padx=(14, 0))
+
+        ttk.Label(execution, text="Сделка $:").pack(side=tk.LEFT, padx=(14, 0))
+        self.trade_notional_var = tk.StringVar(value=str(int(DEFAULT_TRADE_NOTIONAL_USD)))
+        self.trade_notional_entry = ttk.Entry(execution, textvariable=self.trade_notional_var, width=9)
+        self.trade_notional_entry.pack(side=tk.LEFT, padx=(8, 0))
+
+        self.net_spread_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(execution, text="Чистый спред (комиссии)", variable=self.net_spread_var).pack(side=tk.LEFT, padx=(14, 0))
+
         blacklist_bar = ttk.Frame(top)
         blacklist_bar.pack(fill=tk.X, pady=(10, 0))
 
@@ -546,21 +610,8 @@ class PriceTrackerApp:
             cb.pack(fill=tk.X, padx=4, pady=1)
 
     def _build_table_area(self, parent: ttk.Frame) -> None:
-        frame = tk.Frame(parent, bg="#111827", bd=1, relief=tk.FLAT)
-        frame.pack(fill=tk.BOTH, expand=True)
-
-        self.table_canvas = tk.Canvas(frame, bg="#111827", highlightthickness=0)
-        self.table_scroll_y = ttk.Scrollbar(frame, orient=tk.VERTICAL, command=self.table_canvas.yview)
-        self.table_scroll_x = ttk.Scrollbar(frame, orient=tk.HORIZONTAL, command=self.table_canvas.xview)
-        self.table_canvas.configure(yscrollcommand=self.table_scroll_y.set, xscrollcommand=self.table_scroll_x.set)
-
-        self.table_scroll_y.pack(side=tk.RIGHT, fill=tk.Y)
-        self.table_scroll_x.pack(side=tk.BOTTOM, fill=tk.X)
-        self.table_canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
-
-        self.table_inner = tk.Frame(self.table_canvas, bg="#111827")
-        self.table_inner.bind("<Configure>", lambda _: self.table_canvas.configure(scrollregion=self.table_canvas.bbox("all")))
-        self.table_canvas.create_window((0, 0), window=self.table_inner, anchor="nw")
+        self.table = VirtualTable(parent)
+        self.table.pack(fill=tk.BOTH, expand=True)
 
     def _build_log_area(self, parent: ttk.Frame) -> None:
         log_wrap = tk.Frame(parent, bg="#111827", bd=1, relief=tk.FLAT)
@@ -599,6 +650,7 @@ class PriceTrackerApp:
         return {
             "coins": self.coins_entry.get().strip(),
             "scan_mode": self.scan_mode_var.get().strip().upper(),
+            "scan_backend": self.backend_var.get().strip().upper(),
             "quote": self.quote_var.get().strip(),
             "interval": self.interval_var.get().strip(),
             "sort_by_spread": bool(self.sort_by_spread_var.get()),
@@ -607,6 +659,10 @@ class PriceTrackerApp:
             "min_volume_k": self.min_volume_k_var.get().strip(),
             "min_spread": self.min_spread_var.get().strip(),
             "top_n": self.top_n_var.get().strip(),
+            "executable_spread": bool(self.executable_spread_var.get()),
+            "depth_check": bool(self.depth_check_var.get()),
+            "trade_notional": self.trade_notional_var.get().strip(),
+            "net_spread": bool(self.net_spread_var.get()),
             "selected_exchanges": self._selected_exchange_ids(),
             "geometry": self.root.geometry(),
         }
@@ -642,9 +698,13 @@ class PriceTrackerApp:
             self.coins_entry.insert(0, coins)
 
         scan_mode = str(data.get("scan_mode", "AUTO")).strip().upper()
-        if scan_mode in {"AUTO", "MANUAL"}:
+        if scan_mode in SCAN_MODES:
             self.scan_mode_var.set(scan_mode)
 
+        scan_backend = str(data.get("scan_backend", "THREADS")).strip().upper()
+        if scan_backend in SCAN_BACKENDS:
+            self.backend_var.set(scan_backend)
+
         quote = str(data.get("quote", "")).strip().upper()
         if quote in {"USDT", "USD", "USDC", "BTC", "ETH"}:
             self.quote_var.set(quote)
@@ -669,6 +729,13 @@ class PriceTrackerApp:
         if top_n in {"ALL", "10", "20", "50", "100"}:
             self.top_n_var.set(top_n)
 
+        self.executable_spread_var.set(bool(data.get("executable_spread", False)))
+        self.depth_check_var.set(bool(data.get("depth_check", False)))
+        trade_notional = str(data.get("trade_notional", "")).strip()
+        if trade_notional:
+            self.trade_notional_var.set(trade_notional)
+        self.net_spread_var.set(bool(data.get("net_spread", False)))
+
         selected = data.get("selected_exchanges")
         if isinstance(selected, list):
             selected_set = {str(x) for x in selected}
@@ -688,11 +755,46 @@ class PriceTrackerApp:
             self.refresh_prices_async()
         return bool(coins)
 
+    def _save_scan_state(self) -> None:
+        self.scan_state_saved_at = time.monotonic()
+        if not self.bybit_universe_ready:
+            return
+        try:
+            save_scan_state(self.universe_scheduler.export_state())
+        except Exception as exc:
+            self.log(f"Не удалось сохранить позицию сканирования: {exc}")
+
+    def open_stats_window(self) -> None:
+        if self.stats_window is not None and self.stats_window.alive:
+            self.stats_window.window.lift()
+            return
+        self.stats_window = StatsWindow(self)
+
+    def _write_metrics_periodically(self) -> None:
+        def worker() -> None:
+            try:
+                write_metrics_file(self.scanner.metrics_snapshot())
+            except Exception:
+                pass
+
+        self.scan_engine.submit_job(worker)
+        self.root.after(METRICS_WRITE_INTERVAL_MS, self._write_metrics_periodically)
+
     def _on_close(self) -> None:
         self.save_settings(silent=True)
         self._save_blacklist(silent=True)
+        self._save_scan_state()
         if self.saved_top_window and self.saved_top_window.alive:
             self.saved_top_window._on_close()
+        if self.stats_window and self.stats_window.alive:
+            self.stats_window._on_close()
+        if self.stream_feed is not None:
+            self.stream_feed.close()
+        self.scanner.close()
+        if self.recorder is not None:
+            self.recorder.close()
+        if self.spread_history is not None:
+            self.spread_history.close()
         self.root.destroy()
 
     def _load_blacklist(self, silent: bool = False) -> None:
@@ -780,26 +882,10 @@ class PriceTrackerApp:
         self.log("Запуск инициализации подключений к биржам.")
 
         def worker() -> None:
-            ok = 0
-            for exchange_id, exchange_name in EXCHANGES:
-                try:
-                    client_cls = getattr(ccxt, exchange_id)
-                    client = client_cls({"enableRateLimit": True, "timeout": 15000})
-                    self.exchange_clients[exchange_id] = client
-                    self.exchange_markets[exchange_id] = set()
-                    self.exchange_locks[exchange_id] = threading.Lock()
-                    self.exchange_market_locks[exchange_id] = threading.Lock()
-                    self.exchange_available[exchange_id] = True
-                    self.exchange_currency_networks[exchange_id] = {}
-                    ok += 1
-                    self.root.after(0, lambda n=exchange_name: self.log(f"{n}: API клиент готов."))
-                except Exception as exc:
-                    self.exchange_available[exchange_id] = False
-                    self.root.after(0, lambda n=exchange_name, e=exc: self.log(f"{n}: недоступна ({e})."))
-
+            ok = self.scanner.init_exchanges()
             self.root.after(0, lambda: self._on_bootstrap_complete(ok))
 
-        threading.Thread(target=worker, daemon=True).start()
+        self.scan_engine.submit_job(worker)
 
     def _on_bootstrap_complete(self, ok: int) -> None:
         self.is_loading_exchanges = False
@@ -811,89 +897,55 @@ class PriceTrackerApp:
         self.log("Загрузка 500 популярных монет и длинного universe...")
 
         def worker() -> None:
-            symbols = self._fetch_bybit_universe()
+            cached, fresh = self.scanner.cached_universe()
+            if cached:
+                # Markets first, so the scheduler can count listings right away.
+                self.scanner.load_all_markets()
+                self.root.after(0, lambda: self._apply_bybit_universe(cached))
+                if fresh:
+                    return
+                self.root.after(0, lambda: self.log("Кэш universe устарел, обновление в фоне..."))
+            symbols = self.scanner.fetch_universe()
             self.root.after(0, lambda: self._apply_bybit_universe(symbols))
 
-        threading.Thread(target=worker, daemon=True).start()
-
-    def _fetch_bybit_universe(self) -> List[str]:
-        def worker(exchange_id: str) -> List[str]:
-            if not self._ensure_exchange_markets(exchange_id):
-                return []
-            client = self.exchange_clients.get(exchange_id)
-            if client is None:
-                return []
-            markets = getattr(client, "markets", {}) or {}
-            coins = set()
-            for _symbol, meta in markets.items():
-                if not bool(meta.get("spot")):
-                    continue
-                base = str(meta.get("base", "")).upper().strip()
-                if base:
-                    coins.add(base)
-            return sorted(coins)
-
-        coins = set()
-        exchange_ids = [exchange_id for exchange_id, _ in EXCHANGES]
-        with ThreadPoolExecutor(max_workers=10) as pool:
-            futures = {pool.submit(worker, ex_id): ex_id for ex_id in exchange_ids}
-            for future in as_completed(futures):
-                try:
-                    coins.update(future.result())
-                except Exception as exc:
-                    ex_id = futures[future]
-                    self.root.after(0, lambda e=exc, x=ex_id: self.log(f"Ошибка universe {x}: {e}"))
-
-        global_universe = [coin for coin in sorted(coins) if coin not in self.blacklist][:LONG_SCAN_LIMIT]
-        popular = self._fetch_popular_symbols(global_universe)
-        popular_set = set(popular)
-        tail = [coin for coin in global_universe if coin not in popular_set]
-        return popular + tail
-
-    def _fetch_popular_symbols(self, available_coins: List[str]) -> List[str]:
-        available_set = set(available_coins)
-        popular: List[str] = []
-        seen = set()
-        try:
-            for page in [1, 2]:
-                response = requests.get(
-                    "https://api.coingecko.com/api/v3/coins/markets",
-                    params={
-                        "vs_currency": "usd",
-                        "order": "market_cap_desc",
-                        "per_page": 250,
-                        "page": page,
-                        "sparkline": "false",
-                    },
-                    timeout=12,
-                )
-                response.raise_for_status()
-                for item in response.json():
-                    symbol = str(item.get("symbol", "")).upper().strip()
-                    if symbol and symbol in available_set and symbol not in seen:
-                        seen.add(symbol)
-                        popular.append(symbol)
-                if len(popular) >= POPULAR_START_COUNT:
-                    break
-        except Exception as exc:
-            self.root.after(0, lambda e=exc: self.log(f"Не удалось загрузить топ-500 популярных монет: {e}"))
+        self.scan_engine.submit_job(worker)
+
+    def _refresh_universe_async(self) -> None:
+        # Rebuilt between passes once the cached universe outlives its TTL.
+        if self.universe_refreshing:
+            return
+        self.universe_refreshing = True
+
+        def worker() -> None:
+            try:
+                if self.scanner.cached_universe()[1]:
+                    return
+                symbols = self.scanner.fetch_universe()
+                self.root.after(0, lambda: self._apply_bybit_universe(symbols))
+            finally:
+                self.universe_refreshing = False
 
-        if len(popular) < POPULAR_START_COUNT:
-            fallback = available_coins[:POPULAR_START_COUNT]
-            for coin in fallback:
-                if coin not in seen:
-                    popular.append(coin)
-        return popular[:POPULAR_START_COUNT]
+        self.scan_engine.submit_job(worker)
 
     def _apply_bybit_universe(self, symbols: List[str]) -> None:
         if not symbols:
-            self.bybit_universe_ready = False
-            self.status_var.set("Не удалось загрузить глобальный список монет.")
+            if not self.bybit_universe_ready:
+                self.status_var.set("Не удалось загрузить глобальный список монет.")
             return
 
+        refreshed = self.bybit_universe_ready
         self.bybit_universe = symbols
-        self.bybit_cursor = 0
-        self.bybit_cycle_count = 0
+        self.universe_scheduler.set_universe(symbols)
+        if refreshed:
+            # Background refresh of a cached universe: the pass goes on.
+            self.log(f"Universe обновлён: {len(symbols)} монет.")
+            return
+
+        state = load_scan_state()
+        if state is not None:
+            self.universe_scheduler.restore_state(state)
+            self.log(f"Продолжение прохода: цикл #{self.universe_scheduler.cycle_count + 1}.")
+        self.scan_state_saved_at = time.monotonic()
         self.bybit_universe_ready = True
         self.log(f"Universe готов: сначала {POPULAR_START_COUNT} популярных, затем длинный хвост. Всего {len(symbols)} монет.")
         if self.scan_mode_var.get().strip().upper() == "AUTO":
@@ -904,20 +956,15 @@ class PriceTrackerApp:
         if not self.bybit_universe:
             return []
 
-        batch: List[str] = []
-        target_size = min(self.scan_batch_size, len(self.bybit_universe))
-        attempts = 0
-        max_attempts = len(self.bybit_universe) * 2
-        while len(batch) < target_size and attempts < max_attempts:
-            coin = self.bybit_universe[self.bybit_cursor]
-            self.bybit_cursor = (self.bybit_cursor + 1) % len(self.bybit_universe)
-            if self.bybit_cursor == 0:
-                self.bybit_cycle_count += 1
-                self.log(f"Завершен цикл сканирования #{self.bybit_cycle_count}.")
-            attempts += 1
-            if coin in self.blacklist or coin in batch:
-                continue
-            batch.append(coin)
+        scheduler = self.universe_scheduler
+        scheduler.set_exchanges(self._selected_exchange_ids())
+        cycles_before = scheduler.cycle_count
+        batch = scheduler.next_batch(self.scan_batch_size, self.blacklist)
+        if scheduler.cycle_count != cycles_before:
+            self.log(f"Завершен цикл сканирования #{scheduler.cycle_count}.")
+            self._refresh_universe_async()
+        if time.monotonic() - self.scan_state_saved_at >= SCAN_STATE_SAVE_INTERVAL_SECONDS:
+            self._save_scan_state()
 
         if self.scan_mode_var.get().strip().upper() == "AUTO":
             self.coins_entry.delete(0, tk.END)
@@ -950,275 +997,6 @@ class PriceTrackerApp:
             return f"{price:,.4f}"
         return f"{price:,.8f}"
 
-    def _normalize_network(self, value: Optional[str]) -> Optional[str]:
-        if not value:
-            return None
-        cleaned = "".join(ch for ch in str(value).upper() if ch.isalnum())
-        if not cleaned:
-            return None
-        return NETWORK_ALIASES.get(cleaned, cleaned)
-
-    def _build_exchange_metadata_index(self, exchange_id: str) -> None:
-        client = self.exchange_clients.get(exchange_id)
-        if client is None:
-            return
-
-        currencies = getattr(client, "currencies", {}) or {}
-        currency_networks: Dict[str, List[dict]] = {}
-
-        for code, currency in currencies.items():
-            base_code = str(code).upper().strip()
-            if not base_code:
-                continue
-
-            parsed_networks: List[dict] = []
-            networks = currency.get("networks") or {}
-            for network_name, network in networks.items():
-                info = network.get("info") or {}
-                normalized_network = self._normalize_network(
-                    network.get("network") or network_name or info.get("chain") or info.get("name")
-                )
-                parsed = {
-                    "network": normalized_network,
-                    "display": network.get("network") or network_name,
-                    "deposit": network.get("deposit"),
-                    "withdraw": network.get("withdraw"),
-                    "active": network.get("active"),
-                }
-                parsed_networks.append(parsed)
-
-            if parsed_networks:
-                currency_networks[base_code] = parsed_networks
-
-        self.exchange_currency_networks[exchange_id] = currency_networks
-
-    def _build_symbol_candidates(self, coin: str, preferred_quote: str) -> List[str]:
-        quotes = [preferred_quote] + [q for q in FALLBACK_QUOTES if q != preferred_quote]
-        return [f"{coin}/{q}" for q in quotes]
-
-    def _ensure_exchange_markets(self, exchange_id: str) -> bool:
-        if not self.exchange_available.get(exchange_id, False):
-            return False
-
-        if self.exchange_markets.get(exchange_id):
-            return True
-
-        lock = self.exchange_market_locks.get(exchange_id)
-        client = self.exchange_clients.get(exchange_id)
-        if lock is None or client is None:
-            return False
-
-        with lock:
-            if self.exchange_markets.get(exchange_id):
-                return True
-            try:
-                markets = client.load_markets()
-                self.exchange_markets[exchange_id] = set(markets.keys())
-                self._build_exchange_metadata_index(exchange_id)
-                return True
-            except Exception:
-                self.exchange_available[exchange_id] = False
-                return False
-
-    def _extract_price(self, ticker: Optional[dict]) -> Optional[float]:
-        if not ticker:
-            return None
-        value = ticker.get("last") or ticker.get("close") or ticker.get("bid")
-        try:
-            return float(value) if value else None
-        except (TypeError, ValueError):
-            return None
-
-    def _extract_float(self, value: object) -> Optional[float]:
-        try:
-            return float(value) if value is not None else None
-        except (TypeError, ValueError):
-            return None
-
-    def _is_usd_quote(self, quote: str) -> bool:
-        return quote.upper() in {"USD", "USDT", "USDC", "FDUSD", "TUSD", "USDE", "DAI"}
-
-    def _quote_to_usd_multiplier(
-        self,
-        exchange_id: str,
-        quote: str,
-        tickers_map: Dict[str, dict],
-        client: ccxt.Exchange,
-        lock: threading.Lock,
-    ) -> Optional[float]:
-        quote_upper = quote.upper()
-        if self._is_usd_quote(quote_upper):
-            return 1.0
-
-        for symbol in [f"{quote_upper}/USDT", f"{quote_upper}/USD", f"{quote_upper}/USDC"]:
-            ticker = tickers_map.get(symbol)
-            if ticker is None:
-                if symbol not in self.exchange_markets.get(exchange_id, set()):
-                    continue
-                try:
-                    with lock:
-                        ticker = client.fetch_ticker(symbol)
-                    tickers_map[symbol] = ticker
-                except Exception:
-                    continue
-
-            price = self._extract_price(ticker)
-            if price is not None and price > 0:
-                return price
-        return None
-
-    def _extract_volume_usd(
-        self,
-        exchange_id: str,
-        symbol: str,
-        ticker: Optional[dict],
-        price: Optional[float],
-        tickers_map: Dict[str, dict],
-        client: ccxt.Exchange,
-        lock: threading.Lock,
-    ) -> Optional[float]:
-        if not ticker or not symbol:
-            return None
-
-        try:
-            _base, quote = symbol.split("/")
-        except ValueError:
-            return None
-
-        quote_volume = self._extract_float(ticker.get("quoteVolume"))
-        if quote_volume is None:
-            base_volume = self._extract_float(ticker.get("baseVolume"))
-            if base_volume is not None and price is not None:
-                quote_volume = base_volume * price
-        if quote_volume is None or quote_volume <= 0:
-            return None
-
-        multiplier = self._quote_to_usd_multiplier(exchange_id, quote, tickers_map, client, lock)
-        if multiplier is None or multiplier <= 0:
-            return None
-        return quote_volume * multiplier
-
-    def _resolve_symbol_candidates(
-        self,
-        exchange_id: str,
-        coin: str,
-        preferred_quote: str,
-    ) -> List[Tuple[str, str]]:
-        markets = self.exchange_markets.get(exchange_id, set())
-        base_code = coin.strip().upper()
-        resolved: List[Tuple[str, str]] = []
-        for candidate in self._build_symbol_candidates(base_code, preferred_quote):
-            if candidate in markets:
-                resolved.append((base_code, candidate))
-        return resolved
-
-    def _asset_meta_for_symbol(self, exchange_id: str, base_code: str, symbol: str) -> dict:
-        networks = list(self.exchange_currency_networks.get(exchange_id, {}).get(base_code.upper(), []))
-        return {
-            "base_code": base_code.upper(),
-            "networks": networks,
-        }
-
-    def _fetch_prices_for_exchange(
-        self,
-        exchange_id: str,
-        coins: List[str],
-        preferred_quote: str,
-    ) -> Tuple[str, Dict[str, Tuple[Optional[float], str, Optional[str], dict, Optional[float]]]]:
-        result: Dict[str, Tuple[Optional[float], str, Optional[str], dict, Optional[float]]] = {
-            coin: (None, "-", None, {}, None) for coin in coins
-        }
-        if not self._ensure_exchange_markets(exchange_id):
-            return exchange_id, result
-
-        client = self.exchange_clients.get(exchange_id)
-        lock = self.exchange_locks.get(exchange_id)
-        markets = self.exchange_markets.get(exchange_id, set())
-        if client is None or lock is None:
-            return exchange_id, result
-
-        symbol_by_coin: Dict[str, Tuple[str, str]] = {}
-        symbols: List[str] = []
-        for coin in coins:
-            candidates = self._resolve_symbol_candidates(
-                exchange_id,
-                coin,
-                preferred_quote,
-            )
-            if candidates:
-                base_code, symbol = candidates[0]
-                symbol_by_coin[coin] = (base_code, symbol)
-                symbols.append(symbol)
-
-        if not symbols:
-            return exchange_id, result
-
-        tickers_map: Dict[str, dict] = {}
-        has_fetch_tickers = bool(client.has.get("fetchTickers")) if hasattr(client, "has") else False
-        missing_symbols = list(symbols)
-
-        if has_fetch_tickers:
-            try:
-                with lock:
-                    batch = client.fetch_tickers(symbols)
-                if isinstance(batch, dict):
-                    tickers_map = batch
-                    missing_symbols = [s for s in symbols if s not in tickers_map]
-            except Exception:
-                missing_symbols = list(symbols)
-
-        if missing_symbols:
-            for symbol in missing_symbols:
-                try:
-                    with lock:
-                        tickers_map[symbol] = client.fetch_ticker(symbol)
-                except Exception:
-                    continue
-
-        for coin, (base_code, symbol) in symbol_by_coin.items():
-            ticker = tickers_map.get(symbol)
-            price = self._extract_price(ticker)
-            link = self._build_exchange_link(exchange_id, symbol)
-            meta = self._asset_meta_for_symbol(exchange_id, base_code, symbol)
-            volume_usd = self._extract_volume_usd(exchange_id, symbol, ticker, price, tickers_map, client, lock)
-            result[coin] = (price, symbol, link, meta, volume_usd)
-
-        return exchange_id, result
-
-    def _build_exchange_link(self, exchange_id: str, symbol: str) -> Optional[str]:
-        try:
-            base, quote = symbol.split("/")
-        except ValueError:
-            return None
-
-        base_u, quote_u = base.upper(), quote.upper()
-        base_l, quote_l = base.lower(), quote.lower()
-
-        templates = {
-            "binance": f"https://www.binance.com/en/trade/{base_u}_{quote_u}",
-            "bybit": f"https://www.bybit.com/trade/spot/{base_u}/{quote_u}",
-            "coinbase": f"https://www.coinbase.com/advanced-trade/spot/{base_u}-{quote_u}",
-            "okx": f"https://www.okx.com/trade-spot/{base_l}-{quote_l}",
-            "kraken": f"https://pro.kraken.com/app/trade/{base_l}-{quote_l}",
-            "gateio": f"https://www.gate.io/trade/{base_u}_{quote_u}",
-            "mexc": f"https://www.mexc.com/exchange/{base_u}_{quote_u}",
-            "bitget": f"https://www.bitget.com/spot/{base_u}{quote_u}",
-            "htx": f"https://www.htx.com/trade/{base_l}_{quote_l}",
-            "upbit": f"https://upbit.com/exchange?code=CRIX.UPBIT.{quote_u}-{base_u}",
-            "kucoin": f"https://www.kucoin.com/trade/{base_u}-{quote_u}",
-            "bingx": f"https://bingx.com/en/spot/{base_u}{quote_u}/",
-            "cryptocom": f"https://crypto.com/exchange/trade/spot/{base_u}_{quote_u}",
-            "bitmart": f"https://www.bitmart.com/trade/en-US?symbol={base_u}_{quote_u}",
-            "lbank": f"https://www.lbank.com/trade/{base_l}_{quote_l}/",
-            "whitebit": f"https://whitebit.com/trade/{base_u}-{quote_u}",
-            "poloniex": f"https://poloniex.com/trade/{base_u}_{quote_u}/?type=spot",
-            "bitstamp": f"https://www.bitstamp.net/trade/{base_l}/{quote_l}/",
-            "coinex": f"https://www.coinex.com/exchange/{base_l}-{quote_l}",
-            "btse": f"https://www.btse.com/en/trading/{base_u}-{quote_u}",
-            "bitfinex": f"https://trading.bitfinex.com/t/{base_u}:{quote_u}?type=exchange",
-        }
-        return templates.get(exchange_id)
-
     def open_pair_links(self, row_data: Dict[str, object]) -> None:
         min_ex = row_data.get("min_ex")
         max_ex = row_data.get("max_ex")
@@ -1241,155 +1019,43 @@ class PriceTrackerApp:
         if self.saved_top_window and self.saved_top_window.alive:
             self._render_saved_top_window(self.saved_top_window.exchanges)
 
-    def _collect_rows_for_coins(
-        self,
-        coins: List[str],
-        selected_exchanges: List[str],
-        preferred_quote: str,
-    ) -> Dict[str, Dict[str, object]]:
-        rows: Dict[str, Dict[str, object]] = {
-            coin: {
-                "pair": "-",
-                "prices": {exchange_id: None for exchange_id in selected_exchanges},
-                "symbols": {exchange_id: "-" for exchange_id in selected_exchanges},
-                "links": {exchange_id: None for exchange_id in selected_exchanges},
-                "volumes": {exchange_id: None for exchange_id in selected_exchanges},
-                "asset_meta": {exchange_id: {} for exchange_id in selected_exchanges},
-                "spread": None,
-                "min_ex": None,
-                "max_ex": None,
-                "route": "N/A",
-                "tx": "NO",
-                "min_volume_usd": None,
-                "max_volume_usd": None,
-            }
-            for coin in coins
-        }
-
-        tasks = []
-        max_workers = min(24, max(1, len(selected_exchanges)))
-        with ThreadPoolExecutor(max_workers=max_workers) as pool:
-            for exchange_id in selected_exchanges:
-                if exchange_id not in self.exchange_clients:
-                    continue
-                tasks.append(
-                    pool.submit(
-                        self._fetch_prices_for_exchange,
-                        exchange_id,
-                        coins,
-                        preferred_quote,
-                    )
-                )
-
-            for future in as_completed(tasks):
-                exchange_id, exchange_rows = future.result()
-                for coin, (price, symbol, link, meta, volume_usd) in exchange_rows.items():
-                    row = rows[coin]
-                    row["prices"][exchange_id] = price
-                    row["symbols"][exchange_id] = symbol
-                    row["links"][exchange_id] = link
-                    row["volumes"][exchange_id] = volume_usd
-                    row["asset_meta"][exchange_id] = meta
-                    if symbol != "-" and row["pair"] == "-":
-                        row["pair"] = symbol
-
-        for coin in coins:
-            row = rows[coin]
-            valid_prices = [
-                (ex_id, row["prices"][ex_id])
-                for ex_id in selected_exchanges
-                if isinstance(row["prices"][ex_id], float)
-            ]
-            if len(valid_prices) < 2:
-                continue
-
-            min_ex, min_price = min(valid_prices, key=lambda x: x[1])
-            max_ex, max_price = max(valid_prices, key=lambda x: x[1])
-            if max_price <= min_price:
-                continue
-
-            route = self._find_transfer_route(
-                row["asset_meta"].get(min_ex, {}),
-                row["asset_meta"].get(max_ex, {}),
-            )
-            if route is None:
-                continue
-
-            spread = ((max_price - min_price) / min_price * 100.0) if min_price > 0 else None
-            if spread is None:
-                continue
-
-            row["min_ex"] = min_ex
-            row["max_ex"] = max_ex
-            row["spread"] = spread
-            row["route"] = route
-            row["tx"] = "GOOO" if route != "UNVERIFIED" else "YES"
-            row["min_volume_usd"] = row["volumes"].get(min_ex)
-            row["max_volume_usd"] = row["volumes"].get(max_ex)
-
-        return rows
-
-    def _find_transfer_route(self, source_meta: dict, target_meta: dict) -> Optional[str]:
-        source_code = str(source_meta.get("base_code", "")).upper().strip()
-        target_code = str(target_meta.get("base_code", "")).upper().strip()
-        if not source_code or source_code != target_code:
-            return None
-
-        source_networks = source_meta.get("networks") or []
-        target_networks = target_meta.get("networks") or []
-        if source_networks and target_networks:
-            for src in source_networks:
-                if src.get("withdraw") is False or src.get("active") is False:
-                    continue
-                src_key = src.get("network")
-                if not src_key:
-                    continue
-                for dst in target_networks:
-                    if dst.get("deposit") is False or dst.get("active") is False:
-                        continue
-                    if dst.get("network") != src_key:
-                        continue
-                    return str(src.get("display") or src_key)
-
-        if source_code == target_code and not source_networks and not target_networks:
-            return "UNVERIFIED"
-
-        return None
-
     def _update_saved_top_from_items(
         self,
         items: List[Tuple[str, Dict[str, object]]],
         exchanges: List[str],
+        silent: bool = False,
     ) -> None:
-        additions = [(coin, row) for coin, row in items if coin not in self.saved_top_excluded][:SAVED_BATCH_ADD]
+        additions = sorted(
+            [(coin, row) for coin, row in items if coin not in self.saved_top_excluded],
+            key=self._saved_top_rank,
+            reverse=True,
+        )[:SAVED_BATCH_ADD]
         if not additions:
-            self.root.after(0, lambda: self.log("В текущем batch нет валидных монет для сохраненного топа."))
+            if not silent:
+                self.root.after(0, lambda: self.log("В текущем batch нет валидных монет для сохраненного топа."))
             return
 
         added_now = 0
         for coin, row in additions:
             if coin in self.blacklist:
                 continue
-            existing = self.saved_top_memory.get(coin)
-            existing_spread = existing.get("spread") if isinstance(existing, dict) else None
-            new_spread = row.get("spread")
-            if existing is None:
-                self.saved_top_memory[coin] = row
+            if coin not in self.saved_top_memory:
                 added_now += 1
-            elif (
-                isinstance(new_spread, float)
-                and (not isinstance(existing_spread, float) or new_spread > existing_spread)
-            ):
+            # The latest row is kept: the ranking comes from the rolling stats,
+            # not from the best spread ever seen.
+            if row.get("spread") is not None:
                 self.saved_top_memory[coin] = row
 
         top15 = sorted(
             self.saved_top_memory.items(),
-            key=lambda x: x[1].get("spread") if x[1].get("spread") is not None else -1,
+            key=self._saved_top_rank,
             reverse=True,
         )[:SAVED_TOP_POOL_LIMIT]
         self.saved_top_memory = {coin: row for coin, row in top15}
 
         self.root.after(0, lambda: self._render_saved_top_window(exchanges))
+        if silent:
+            return
         self.root.after(
             0,
             lambda n=added_now, total=len(self.saved_top_memory): self.log(
@@ -1397,17 +1063,25 @@ class PriceTrackerApp:
             ),
         )
 
+    def _saved_top_rank(self, item: Tuple[str, Dict[str, object]]) -> Tuple[float, float]:
+        # Persistence-weighted score first: a spread seen once on one tick
+        # scores zero, one that holds for minutes at a steady level scores
+        # close to its average. The current spread only breaks ties.
+        coin, row = item
+        spread = row.get("spread")
+        return self.spread_stats.score(coin), spread if isinstance(spread, float) else -1.0
+
     def _saved_top_items(self) -> List[Tuple[str, Dict[str, object]]]:
         return sorted(
             [(coin, row) for coin, row in self.saved_top_memory.items() if coin not in self.saved_top_excluded],
-            key=lambda x: x[1].get("spread") if x[1].get("spread") is not None else -1,
+            key=self._saved_top_rank,
             reverse=True,
         )[:SAVED_TOP_LIMIT]
 
     def _saved_top_pool_items(self) -> List[Tuple[str, Dict[str, object]]]:
         return sorted(
             [(coin, row) for coin, row in self.saved_top_memory.items() if coin not in self.saved_top_excluded],
-            key=lambda x: x[1].get("spread") if x[1].get("spread") is not None else -1,
+            key=self._saved_top_rank,
             reverse=True,
         )[:SAVED_TOP_POOL_LIMIT]
 
@@ -1435,6 +1109,7 @@ class PriceTrackerApp:
         self,
         selected_exchanges: List[str],
         preferred_quote: str,
+        executable: bool = False,
     ) -> None:
         if self.saved_top_window is None or not self.saved_top_window.alive:
             return
@@ -1444,52 +1119,164 @@ class PriceTrackerApp:
         coins = [coin for coin, _ in self._saved_top_pool_items()]
 
         def worker() -> None:
-            rows = self._collect_rows_for_coins(
+            rows = self.scanner.collect_rows(
                 coins,
                 selected_exchanges,
                 preferred_quote,
+                executable=executable,
             )
-            for coin, row in rows.items():
-                if coin in self.saved_top_memory and row.get("spread") is not None:
-                    self.saved_top_memory[coin] = row
-            stale = [
-                coin for coin, row in self.saved_top_memory.items()
-                if coin in coins and row.get("spread") is None
-            ]
-            for coin in stale:
-                self.saved_top_memory.pop(coin, None)
-            self.root.after(0, lambda: self._render_saved_top_window(selected_exchanges))
-
-        threading.Thread(target=worker, daemon=True).start()
+            self.spread_stats.update_rows(rows.summaries(), self.scanner.quote_age)
+            self.root.after(0, lambda: self._apply_saved_window_rows(rows, coins, selected_exchanges))
+
+        self.scan_engine.submit_job(worker)
+
+    def _apply_saved_window_rows(
+        self,
+        rows: Dict[str, Dict[str, object]],
+        coins: List[str],
+        selected_exchanges: List[str],
+    ) -> None:
+        for coin, row in rows.items():
+            if coin in self.saved_top_memory and row.get("spread") is not None:
+                self.saved_top_memory[coin] = row
+        stale = [
+            coin for coin, row in self.saved_top_memory.items()
+            if coin in coins and row.get("spread") is None
+        ]
+        for coin in stale:
+            self.saved_top_memory.pop(coin, None)
+        self._render_saved_top_window(selected_exchanges)
 
     def refresh_prices_async(self) -> None:
         if self.is_loading_exchanges:
             self.log("Идет инициализация бирж, дождитесь завершения.")
             return
-        if self.is_refreshing:
-            self.log("Обновление уже в процессе.")
-            return
         mode = self.scan_mode_var.get().strip().upper()
-        if mode == "AUTO" and not self.bybit_universe_ready:
+        if mode == "STREAM":
+            self.start_stream()
+            return
+        if self.stream_render_job is not None:
+            self.stop_stream()
+        if mode in {"AUTO", "SNAPSHOT"} and not self.bybit_universe_ready:
             self.status_var.set("Ожидаю глобальный список монет...")
             self.log("Глобальный universe еще не готов.")
             return
 
+        seq = self.scan_engine.begin_scan()
+        if seq is None:
+            self.log("Предыдущие обновления еще идут, следующее поставлено в очередь.")
+            return
+        self._sync_scan_backend()
+
         if mode == "MANUAL":
             coins = self._parse_coin_list(self.coins_entry.get().strip())
+        elif mode == "SNAPSHOT":
+            coins = [coin for coin in self.bybit_universe if coin not in self.blacklist]
         else:
             coins = self._take_next_bybit_batch()
         if not coins:
+            self.scan_engine.cancel_scan()
             self.status_var.set("Список монет пуст.")
             self.log("Не удалось получить batch монет.")
             return
 
         selected_exchanges = self._selected_exchange_ids()
         if not selected_exchanges:
+            self.scan_engine.cancel_scan()
             self.status_var.set("Выберите минимум одну биржу.")
             self.log("Не выбраны биржи.")
             return
 
+        filter_settings = self._read_filter_settings()
+        executable, depth_check, trade_notional = self._read_execution_settings()
+
+        self.status_var.set("Обновление данных...")
+        self.log(f"Обновление ({mode}): скан batch={len(coins)}, бирж={len(selected_exchanges)}.")
+
+        preferred_quote = self.quote_var.get().strip().upper() or "USDT"
+        snapshot = mode == "SNAPSHOT"
+
+        def worker() -> None:
+            try:
+                rows = self.scanner.collect_rows(
+                    coins,
+                    selected_exchanges,
+                    preferred_quote,
+                    snapshot,
+                    executable,
+                )
+                summaries = rows.summaries()
+                if mode == "AUTO":
+                    self.universe_scheduler.observe(summaries)
+                self.spread_stats.update_rows(summaries, self.scanner.quote_age)
+                if self.spread_history is not None:
+                    self.spread_history.append(summaries)
+                filtered = self.scanner.apply_filters(rows, coins, *filter_settings)
+                if depth_check:
+                    filtered = self.scanner.apply_order_book_depth(filtered, trade_notional)
+            except Exception as exc:
+                self.root.after(0, lambda e=exc: self._on_scan_failed(e))
+                return
+            self.root.after(
+                0,
+                lambda: self._on_scan_collected(
+                    seq,
+                    filtered,
+                    selected_exchanges,
+                    preferred_quote,
+                    executable,
+                    filter_settings[0],
+                ),
+            )
+
+        self.scan_engine.submit_job(worker)
+
+    def _refresh_history_view_async(self, items: List[Tuple[str, Dict[str, object]]], min_spread: float) -> None:
+        # Kept off the scan worker: the table shows the previous summaries
+        # until these are in, and a refresh still running skips this one.
+        if self.spread_history is None or self.history_refreshing or not items:
+            return
+        self.history_refreshing = True
+        coins = [coin for coin, _row in items[:HISTORY_SUMMARY_LIMIT]]
+
+        def worker() -> None:
+            view = self._history_summaries(coins, min_spread)
+            self.root.after(0, lambda: self._apply_history_view(view))
+
+        self.scan_engine.submit_background(worker)
+
+    def _apply_history_view(self, view: Dict[str, str]) -> None:
+        self.history_refreshing = False
+        self.history_view = view
+        self.table.redraw()
+
+    def _history_summaries(self, coins: List[str], min_spread: float) -> Dict[str, str]:
+        # A sparkline of the last hour and how long the spread has held above
+        # the min-spread filter (or 2%).
+        if self.spread_history is None:
+            return {}
+        threshold = min_spread if min_spread > 0 else HISTORY_DEFAULT_THRESHOLD
+        summaries: Dict[str, str] = {}
+        try:
+            for coin in coins:
+                spark = render_sparkline(
+                    self.spread_history.sparkline(coin, SPARKLINE_WINDOW_SECONDS, SPARKLINE_BUCKETS)
+                )
+                above = self.spread_history.time_above(coin, threshold)
+                summaries[coin] = f"{spark} {self._format_duration(above)}".strip()
+        except Exception:
+            pass
+        return summaries
+
+    def _format_duration(self, seconds: Optional[float]) -> str:
+        if seconds is None:
+            return "-"
+        minutes = int(seconds // 60)
+        if minutes < 60:
+            return f"{minutes}м"
+        return f"{minutes // 60}ч{minutes % 60:02d}м"
+
+    def _read_filter_settings(self) -> Tuple[float, bool, str, bool, bool, float, bool]:
         min_spread = 0.0
         try:
             min_spread = float(self.min_spread_var.get().strip() or "0")
@@ -1499,6 +1286,7 @@ class PriceTrackerApp:
         sort_by_spread = bool(self.sort_by_spread_var.get())
         verified_only = bool(self.verified_only_var.get())
         good_volume_only = bool(self.good_volume_only_var.get())
+        net_only = bool(self.net_spread_var.get())
         top_n_raw = self.top_n_var.get().strip().upper()
 
         min_volume_usd = 1000.0
@@ -1507,208 +1295,137 @@ class PriceTrackerApp:
         except ValueError:
             min_volume_usd = 1000.0
 
-        self.is_refreshing = True
-        self.refresh_btn.configure(state=tk.DISABLED)
-        self.status_var.set("Обновление данных...")
-        self.log(f"Обновление ({mode}): скан batch={len(coins)}, бирж={len(selected_exchanges)}.")
-
-        preferred_quote = self.quote_var.get().strip().upper() or "USDT"
-
-        def worker() -> None:
-            rows = self._collect_rows_for_coins(
-                coins,
-                selected_exchanges,
-                preferred_quote,
-            )
-            filtered = self._apply_filters(
-                rows,
-                coins,
-                min_spread,
-                sort_by_spread,
-                top_n_raw,
-                verified_only,
-                good_volume_only,
-                min_volume_usd,
-            )
-            self._update_saved_top_from_items(filtered, selected_exchanges)
-            self.root.after(0, lambda: self._render_table(filtered, selected_exchanges))
-            self._refresh_saved_window_async(
-                selected_exchanges,
-                preferred_quote,
-            )
-
-        threading.Thread(target=worker, daemon=True).start()
+        return min_spread, sort_by_spread, top_n_raw, verified_only, good_volume_only, min_volume_usd, net_only
 
-    def _apply_filters(
+    def _read_execution_settings(self) -> Tuple[bool, bool, float]:
+        executable = bool(self.executable_spread_var.get())
+        depth_check = bool(self.depth_check_var.get())
+        trade_notional = DEFAULT_TRADE_NOTIONAL_USD
+        try:
+            trade_notional = float(self.trade_notional_var.get().strip() or "0")
+        except ValueError:
+            trade_notional = DEFAULT_TRADE_NOTIONAL_USD
+        if trade_notional <= 0:
+            trade_notional = DEFAULT_TRADE_NOTIONAL_USD
+        self.scanner.trade_notional_usd = trade_notional
+        return executable, depth_check, trade_notional
+
+    def _sync_scan_backend(self) -> None:
+        requested = self.backend_var.get().strip().upper()
+        backend = self.scanner.set_backend(requested)
+        if backend != requested:
+            self.backend_var.set(backend)
+
+    def _on_scan_collected(
         self,
-        rows: Dict[str, Dict[str, object]],
-        coins: List[str],
-        min_spread: float,
-        sort_by_spread: bool,
-        top_n_raw: str,
-        verified_only: bool,
-        good_volume_only: bool,
-        min_volume_usd: float,
-    ) -> List[Tuple[str, Dict[str, object]]]:
-        items: List[Tuple[str, Dict[str, object]]] = []
-        for coin in coins:
-            if coin in self.blacklist:
-                continue
-            row = rows[coin]
-            spread = row.get("spread")
-            if spread is None:
-                continue
-            if not isinstance(spread, float) or spread > 99:
-                continue
-            if spread < min_spread:
-                continue
-            if verified_only and row.get("tx") not in {"YES", "GOOO"}:
-                continue
-            if good_volume_only:
-                buy_volume = row.get("min_volume_usd")
-                sell_volume = row.get("max_volume_usd")
-                if not isinstance(buy_volume, float) or not isinstance(sell_volume, float):
-                    continue
-                if buy_volume < min_volume_usd or sell_volume < min_volume_usd:
-                    continue
-            items.append((coin, row))
-
-        if sort_by_spread:
-            items.sort(key=lambda x: x[1].get("spread") if x[1].get("spread") is not None else -1, reverse=True)
-
-        if top_n_raw != "ALL":
-            try:
-                n = int(top_n_raw)
-                if n > 0:
-                    items = items[:n]
-            except ValueError:
-                pass
-
-        return items
-
-    def _render_table(self, items: List[Tuple[str, Dict[str, object]]], selected_exchanges: List[str]) -> None:
-        for child in self.table_inner.winfo_children():
-            child.destroy()
-
-        headers = ["MONETA", "PAIR", "TX"] + [self.exchange_name_by_id[ex_id] for ex_id in selected_exchanges] + ["% RAZNICA"]
-
-        widths = [110, 130, 60] + [125 for _ in selected_exchanges] + [120]
-        for col, header in enumerate(headers):
-            lbl = tk.Label(
-                self.table_inner,
-                text=header,
-                bg="#1e293b",
-                fg="#9ab6ff",
-                font=("Consolas", 10, "bold"),
-                padx=6,
-                pady=6,
-                relief=tk.GROOVE,
-                borderwidth=1,
-                width=max(8, widths[col] // 10),
-            )
-            lbl.grid(row=0, column=col, sticky="nsew")
-
-        for row_idx, (coin, row_data) in enumerate(items, start=1):
-            spread = row_data.get("spread")
-            min_ex = row_data.get("min_ex")
-            max_ex = row_data.get("max_ex")
+        seq: int,
+        filtered: List[Tuple[str, Dict[str, object]]],
+        selected_exchanges: List[str],
+        preferred_quote: str,
+        executable: bool = False,
+        min_spread: float = 0.0,
+    ) -> None:
+        # Start the queued scan before rendering so the next batch is already
+        # being fetched while Tk draws this one.
+        if self.scan_engine.finish_scan():
+            self.refresh_prices_async()
+        self._update_saved_top_from_items(filtered, selected_exchanges)
+        if self.scan_engine.claim_render(seq):
+            self._render_table(filtered, selected_exchanges)
+            self._refresh_history_view_async(filtered, min_spread)
+        self._refresh_saved_window_async(
+            selected_exchanges,
+            preferred_quote,
+            executable,
+        )
 
-            coin_bg = "#111827" if row_idx % 2 else "#0f172a"
+    def _on_scan_failed(self, exc: Exception) -> None:
+        self.log(f"Ошибка обновления: {exc}")
+        if self.scan_engine.finish_scan():
+            self.refresh_prices_async()
 
-            tk.Label(
-                self.table_inner,
-                text=coin,
-                bg=coin_bg,
-                fg="#d7dde8",
-                font=("Consolas", 10, "bold"),
-                padx=6,
-                pady=5,
-                relief=tk.GROOVE,
-                borderwidth=1,
-            ).grid(row=row_idx, column=0, sticky="nsew")
-
-            pair_label = tk.Label(
-                self.table_inner,
-                text=str(row_data.get("pair", "-")),
-                bg=coin_bg,
-                fg="#bac7dd",
-                font=("Consolas", 10),
-                padx=6,
-                pady=5,
-                relief=tk.GROOVE,
-                borderwidth=1,
-                cursor="hand2" if row_data.get("min_ex") and row_data.get("max_ex") else "",
-            )
-            pair_label.grid(row=row_idx, column=1, sticky="nsew")
-            if row_data.get("min_ex") and row_data.get("max_ex"):
-                pair_label.bind("<Button-1>", lambda _e, row=row_data: self.open_pair_links(row))
-
-            tx_text = str(row_data.get("tx", "NO"))
-            tk.Label(
-                self.table_inner,
-                text=tx_text,
-                bg=coin_bg,
-                fg="#8dd6ff" if tx_text in {"GOOO", "YES"} else "#8fa1bf",
-                font=("Consolas", 9, "bold"),
-                padx=4,
-                pady=5,
-                relief=tk.GROOVE,
-                borderwidth=1,
-            ).grid(row=row_idx, column=2, sticky="nsew")
-
-            for c_off, exchange_id in enumerate(selected_exchanges, start=3):
-                price = row_data["prices"].get(exchange_id)
-                link = row_data["links"].get(exchange_id)
-
-                bg = coin_bg
-                fg = "#d7dde8"
-                if exchange_id == min_ex:
-                    bg = "#0f3d26"
-                    fg = "#9cffc7"
-                if exchange_id == max_ex:
-                    bg = "#4c1d1d"
-                    fg = "#ffb3b3"
-
-                label = tk.Label(
-                    self.table_inner,
-                    text=self._format_price(price),
-                    bg=bg,
-                    fg=fg,
-                    font=("Consolas", 10, "underline" if link and price is not None else "normal"),
-                    cursor="hand2" if link and price is not None else "",
-                    padx=6,
-                    pady=5,
-                    relief=tk.GROOVE,
-                    borderwidth=1,
-                )
-                label.grid(row=row_idx, column=c_off, sticky="nsew")
-
-                if link and price is not None:
-                    label.bind("<Button-1>", lambda _e, url=link: webbrowser.open_new_tab(url))
-
-            spread_text = "N/A" if spread is None else f"{spread:.2f}%"
-            spread_fg = "#8fa1bf" if spread is None else "#ffe08a"
-            tk.Label(
-                self.table_inner,
-                text=spread_text,
-                bg=coin_bg,
-                fg=spread_fg,
-                font=("Consolas", 10, "bold"),
-                padx=6,
-                pady=5,
-                relief=tk.GROOVE,
-                borderwidth=1,
-            ).grid(row=row_idx, column=len(headers) - 1, sticky="nsew")
-
-        for col in range(len(headers)):
-            self.table_inner.grid_columnconfigure(col, weight=1)
+    def _render_table(
+        self,
+        items: List[Tuple[str, Dict[str, object]]],
+        selected_exchanges: List[str],
+        silent: bool = False,
+    ) -> None:
+        started = time.perf_counter()
+        headers = ["MONETA", "PAIR", "TX"] + [self.exchange_name_by_id[ex_id] for ex_id in selected_exchanges] + ["% RAZNICA", "% NET", "ИСТОРИЯ 1ч"]
+        widths = [110, 130, 60] + [125 for _ in selected_exchanges] + [150, 90, 170]
+        exchanges = list(selected_exchanges)
+        self.table.set_columns(headers, widths)
+        self.table.set_items(
+            items,
+            lambda item, idx: self._table_row_cells(item, idx, exchanges, removable=False),
+        )
+        self.scanner.metrics.record_stage(STAGE_RENDER, time.perf_counter() - started)
 
         now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         self.status_var.set(f"Обновлено: {now} | Строк: {len(items)}")
-        self.log("Таблица цен обновлена.")
+        if not silent:
+            self.log("Таблица цен обновлена.")
 
-        self.is_refreshing = False
-        self.refresh_btn.configure(state=tk.NORMAL)
+    def _table_row_cells(
+        self,
+        item: Tuple[str, Dict[str, object]],
+        row_idx: int,
+        exchanges: List[str],
+        removable: bool,
+    ) -> List[Cell]:
+        coin, row_data = item
+        spread = row_data.get("spread")
+        min_ex = row_data.get("min_ex")
+        max_ex = row_data.get("max_ex")
+        coin_bg = "#0f172a" if row_idx % 2 else "#111827"
+
+        cells: List[Cell] = []
+        if removable:
+            cells.append(("x", "#ff8c8c", coin_bg, "bold", lambda c=coin: self.exclude_saved_top_coin(c)))
+        cells.append((coin, "#d7dde8", coin_bg, "bold", None))
+        pair_action = (lambda row=row_data: self.open_pair_links(row)) if min_ex and max_ex else None
+        cells.append((str(row_data.get("pair", "-")), "#bac7dd", coin_bg, "normal", pair_action))
+        tx_text = str(row_data.get("tx", "NO"))
+        cells.append((tx_text, "#8dd6ff" if tx_text in {"GOOO", "YES"} else "#8fa1bf", coin_bg, "small_bold", None))
+
+        for exchange_id in exchanges:
+            price = row_data["prices"].get(exchange_id)
+            if exchange_id == min_ex and row_data.get("buy_price") is not None:
+                price = row_data["buy_price"]
+            elif exchange_id == max_ex and row_data.get("sell_price") is not None:
+                price = row_data["sell_price"]
+            link = row_data["links"].get(exchange_id)
+            bg = coin_bg
+            fg = "#d7dde8"
+            if exchange_id == min_ex:
+                bg = "#0f3d26"
+                fg = "#9cffc7"
+            if exchange_id == max_ex:
+                bg = "#4c1d1d"
+                fg = "#ffb3b3"
+            clickable = bool(link) and price is not None
+            action = (lambda url=link: webbrowser.open_new_tab(url)) if clickable else None
+            cells.append((self._format_price(price), fg, bg, "link" if clickable else "normal", action))
+
+        spread_text = "N/A" if spread is None else f"{spread:.2f}%"
+        depth_spread = row_data.get("depth_spread")
+        if spread is not None and depth_spread is not None:
+            spread_text = f"{spread:.2f}% ({depth_spread:.2f}%)"
+        elif spread is not None and row_data.get("depth_status") == "THIN":
+            spread_text = f"{spread:.2f}% (мало)"
+        spread_fg = "#8fa1bf" if spread is None else "#ffe08a"
+        cells.append((spread_text, spread_fg, coin_bg, "bold", None))
+
+        net_spread = row_data.get("net_spread")
+        net_text = "N/A" if net_spread is None else f"{net_spread:.2f}%"
+        if net_spread is None:
+            net_fg = "#8fa1bf"
+        else:
+            net_fg = "#9cffc7" if net_spread > 0 else "#ff8c8c"
+        cells.append((net_text, net_fg, coin_bg, "bold", None))
+        if not removable:
+            cells.append((self.history_view.get(coin, ""), "#8fb4ff", coin_bg, "normal", None))
+        return cells
 
     def start_auto_refresh(self) -> None:
         interval = self._get_interval_seconds()
@@ -1727,6 +1444,142 @@ class PriceTrackerApp:
             self.root.after_cancel(self.auto_refresh_job)
             self.auto_refresh_job = None
             self.log("Автообновление выключено.")
+        if self.stream_render_job is not None:
+            self.stop_stream()
+
+    def start_stream(self) -> None:
+        mock_url = os.environ.get(STREAM_URL_ENV, "").strip() or None
+        if not stream_backend_available(mock_url):
+            self.status_var.set("Потоковый режим недоступен.")
+            self.log("STREAM недоступен: нет ccxt.pro (или aiohttp для тестового сервера).")
+            return
+
+        coins = self._parse_coin_list(self.coins_entry.get().strip())
+        if not coins:
+            self.status_var.set("Список монет пуст.")
+            self.log("STREAM: введите монеты для подписки.")
+            return
+
+        selected_exchanges = stream_supported_exchanges(self._selected_exchange_ids(), mock_url)
+        if len(selected_exchanges) < 2:
+            self.status_var.set("Для потока нужно минимум 2 биржи с WebSocket.")
+            self.log("STREAM: среди выбранных бирж меньше двух с поддержкой WebSocket.")
+            return
+
+        preferred_quote = self.quote_var.get().strip().upper() or "USDT"
+        executable, _depth_check, _trade_notional = self._read_execution_settings()
+        pricing = "EXEC" if executable else "LAST"
+        key = (tuple(coins), tuple(selected_exchanges), preferred_quote, pricing)
+        if self.stream_render_job is not None and key == self.stream_key:
+            # Auto refresh ticks land here: the live feed is already subscribed.
+            return
+        if self.stream_feed is None:
+            self.stream_feed = StreamFeed(
+                self._on_stream_quote,
+                mock_url=mock_url,
+                log=lambda message: self.root.after(0, lambda: self.log(message)),
+            )
+        with self.stream_lock:
+            self.stream_generation += 1
+            generation = self.stream_generation
+            self.stream_key = key
+        self.status_var.set("Подключение потоков...")
+        self.log(f"STREAM: монет {len(coins)}, бирж {len(selected_exchanges)}.")
+
+        def worker() -> None:
+            self.scanner.refresh_usd_rates(self.scanner.usd_quotes_in_use(preferred_quote), selected_exchanges)
+            subscriptions: Dict[str, List[str]] = {}
+            markets: Dict[str, Tuple[dict, Optional[dict]]] = {}
+            symbol_coin: Dict[Tuple[str, str], str] = {}
+            rows = {coin: self.scanner.new_row(selected_exchanges) for coin in coins}
+            for exchange_id in selected_exchanges:
+                if not self.scanner.ensure_exchange_markets(exchange_id):
+                    continue
+                symbol_by_coin, symbols = self.scanner.plan_exchange_symbols(exchange_id, coins, preferred_quote)
+                for coin, (_base_code, symbol) in symbol_by_coin.items():
+                    symbol_coin[(exchange_id, symbol)] = coin
+                    link, meta = self.scanner.symbol_cell(exchange_id, coin, symbol)
+                    self.scanner.merge_exchange_entry(rows[coin], exchange_id, (None, symbol, link, meta, None, None, None))
+                client = self.scanner.exchange_clients[exchange_id]
+                subscriptions[exchange_id] = symbols
+                markets[exchange_id] = (client.markets, getattr(client, "currencies", None) or None)
+
+            with self.stream_lock:
+                if generation != self.stream_generation:
+                    return
+                self.stream_rows = rows
+                self.stream_coins = list(coins)
+                self.stream_exchanges = list(selected_exchanges)
+                self.stream_symbol_coin = symbol_coin
+                self.stream_dirty = set()
+                self.stream_engine.reset(selected_exchanges, pricing)
+                # Queued under the lock, so it reaches the feed loop before
+                # any later stop.
+                self.stream_feed.start(subscriptions, markets)
+            count = sum(len(symbols) for symbols in subscriptions.values())
+            self.root.after(0, lambda: self.log(f"STREAM: подписок {count}."))
+
+        self.scan_engine.submit_job(worker)
+        if self.stream_render_job is None:
+            self.stream_render_job = self.root.after(STREAM_RENDER_INTERVAL_MS, self._stream_render_tick)
+
+    def stop_stream(self) -> None:
+        if self.stream_render_job is not None:
+            self.root.after_cancel(self.stream_render_job)
+            self.stream_render_job = None
+        with self.stream_lock:
+            self.stream_generation += 1
+            self.stream_key = None
+            if self.stream_feed is not None:
+                self.stream_feed.stop()
+        self.log("STREAM остановлен.")
+
+    def _on_stream_quote(self, exchange_id: str, symbol: str, ticker: dict) -> None:
+        with self.stream_lock:
+            coin = self.stream_symbol_coin.get((exchange_id, symbol))
+            row = self.stream_rows.get(coin) if coin else None
+            if row is None:
+                return
+            entry = self.scanner.exchange_rows_from_tickers(
+                exchange_id,
+                {coin: (coin, symbol)},
+                {symbol: ticker},
+            )[coin]
+            self.scanner.merge_exchange_entry(row, exchange_id, entry)
+            if self.stream_engine.pricing == "EXEC":
+                changed = self.stream_engine.update(coin, exchange_id, entry[6], entry[5])
+            else:
+                changed = self.stream_engine.update(coin, exchange_id, entry[0])
+            if changed:
+                self.scanner.compute_row_spread(
+                    row,
+                    self.stream_exchanges,
+                    self.stream_engine.best(coin),
+                    executable=self.stream_engine.pricing == "EXEC",
+                )
+                self.stream_dirty.add(coin)
+
+    def _stream_render_tick(self) -> None:
+        self.stream_render_job = self.root.after(STREAM_RENDER_INTERVAL_MS, self._stream_render_tick)
+        with self.stream_lock:
+            if not self.stream_dirty:
+                return
+            dirty = self.stream_dirty
+            self.stream_dirty = set()
+            coins = list(self.stream_coins)
+            exchanges = list(self.stream_exchanges)
+            rows = {coin: self.scanner.copy_row(row) for coin, row in self.stream_rows.items()}
+
+        # Only coins whose quotes moved count as new samples.
+        self.spread_stats.update_rows({coin: rows[coin] for coin in dirty if coin in rows}, self.scanner.quote_age)
+        if self.spread_history is not None:
+            self.spread_history.append(rows)
+
+        filter_settings = self._read_filter_settings()
+        filtered = self.scanner.apply_filters(rows, coins, *filter_settings)
+        self._update_saved_top_from_items(filtered, exchanges, silent=True)
+        self._render_table(filtered, exchanges, silent=True)
+        self._refresh_history_view_async(filtered, filter_settings[0])
 
     def _get_interval_seconds(self) -> Optional[int]:
         try:
@@ -1741,6 +1594,7 @@ class PriceTrackerApp:
 
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support()
     root = tk.Tk()
     root.withdraw()
     license_info = ensure_valid_license(root)
@@ -0,0 +1,239 @@
+import asyncio
+import threading
+import time
+from typing import TYPE_CHECKING, Dict, List, Tuple
+
+try:
+    import ccxt.async_support as ccxt_async
+except ImportError:
+    ccxt_async = None
+
+from scan_engine import CALL_FAILED, CIRCUIT_OPEN, SNAPSHOT_CHUNK_SIZE, batch_key
+
+if TYPE_CHECKING:
+    from scanner import ArbitrageScanner
+
+
+ASYNC_EXCHANGE_CONCURRENCY = 8
+
+
+def async_backend_available() -> bool:
+    return ccxt_async is not None
+
+
+def create_async_exchange_client(exchange_id: str):
+    client_cls = getattr(ccxt_async, exchange_id)
+    return client_cls({"enableRateLimit": True, "timeout": 15000})
+
+
+class AsyncScanBackend:
+    def __init__(self, scanner: "ArbitrageScanner") -> None:
+        if ccxt_async is None:
+            raise RuntimeError("ccxt.async_support недоступен")
+        self.scanner = scanner
+        self.clients: Dict[str, object] = {}
+        self.market_sources: Dict[str, object] = {}
+        self.semaphores: Dict[str, asyncio.Semaphore] = {}
+        # (exchange, coin batch) -> fetch that missed a cycle deadline; it
+        # keeps running on the loop and is collected by the next call for the
+        # same batch.
+        self.pending: Dict[Tuple[str, int], asyncio.Task] = {}
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self._run_loop, name="scan-asyncio", daemon=True)
+        self.thread.start()
+
+    def _run_loop(self) -> None:
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def collect(
+        self,
+        coins: List[str],
+        selected_exchanges: List[str],
+        preferred_quote: str,
+        snapshot: bool = False,
+    ) -> List[Tuple[str, Dict[str, tuple]]]:
+        future = asyncio.run_coroutine_threadsafe(
+            self._collect(coins, selected_exchanges, preferred_quote, snapshot),
+            self.loop,
+        )
+        return future.result()
+
+    async def _collect(
+        self,
+        coins: List[str],
+        selected_exchanges: List[str],
+        preferred_quote: str,
+        snapshot: bool,
+    ) -> List[Tuple[str, Dict[str, tuple]]]:
+        engine = self.scanner.scan_engine
+        collected: List[Tuple[str, Dict[str, tuple]]] = []
+        batch = batch_key(coins)
+        for key, task in list(self.pending.items()):
+            if task.done():
+                del self.pending[key]
+                if key[1] == batch and not task.cancelled() and task.exception() is None:
+                    collected.append((key[0], task.result()))
+
+        tasks: Dict[str, asyncio.Task] = {}
+        for exchange_id in selected_exchanges:
+            if exchange_id not in self.scanner.exchange_clients or (exchange_id, batch) in self.pending:
+                continue
+            if not engine.allow_exchange(exchange_id):
+                collected.append((exchange_id, self.scanner.empty_exchange_rows(coins)))
+                continue
+            tasks[exchange_id] = asyncio.ensure_future(
+                self._fetch_exchange(exchange_id, coins, preferred_quote, snapshot)
+            )
+
+        deadline = None if snapshot else engine.scan_deadline(selected_exchanges)
+        if tasks:
+            await asyncio.wait(tasks.values(), timeout=deadline)
+        late: List[str] = []
+        for exchange_id, task in tasks.items():
+            if not task.done():
+                self.pending[(exchange_id, batch)] = task
+                late.append(exchange_id)
+            elif task.cancelled() or task.exception() is not None:
+                collected.append((exchange_id, self.scanner.empty_exchange_rows(coins)))
+            else:
+                collected.append((exchange_id, task.result()))
+        self.scanner.log_late_exchanges(late, deadline)
+        return collected
+
+    def _client(self, exchange_id: str):
+        sync_client = self.scanner.exchange_clients[exchange_id]
+        client = self.clients.get(exchange_id)
+        if client is None:
+            client = self.scanner.async_client_factory(exchange_id)
+            self.clients[exchange_id] = client
+            self.semaphores[exchange_id] = asyncio.Semaphore(ASYNC_EXCHANGE_CONCURRENCY)
+        # Reuse the markets the sync client already loaded (or took from the
+        # disk cache) and follow it whenever those markets are reloaded.
+        if self.market_sources.get(exchange_id) is not sync_client.markets:
+            client.set_markets(sync_client.markets, getattr(sync_client, "currencies", None) or None)
+            self.market_sources[exchange_id] = sync_client.markets
+        return client
+
+    async def _call(self, exchange_id: str, method: str, *args):
+        async with self.semaphores[exchange_id]:
+            client = self.clients[exchange_id]
+            # Current limits for this request, like the sync clients get.
+            self.scanner.tune_exchange_client(exchange_id, client)
+            started = time.monotonic()
+            try:
+                result = await getattr(client, method)(*args)
+            except Exception as exc:
+                self.scanner.record_exchange_call(exchange_id, client, method, time.monotonic() - started, exc)
+                raise
+            self.scanner.record_exchange_call(exchange_id, client, method, time.monotonic() - started)
+            return result
+
+    async def _call_all(self, exchange_id: str, method: str, calls: List[tuple]) -> List[object]:
+        # Concurrent calls, results or exceptions in call order. Like the sync
+        # per-symbol loop, the rest of the batch is dropped (cancelled calls
+        # come back as CancelledError) once the venue's circuit opens.
+        engine = self.scanner.scan_engine
+        tasks = [asyncio.ensure_future(self._call(exchange_id, method, *args)) for args in calls]
+        for finished in asyncio.as_completed(tasks):
+            try:
+                await finished
+            except Exception:
+                pass
+            if engine.circuit_state(exchange_id) == CIRCUIT_OPEN:
+                for task in tasks:
+                    task.cancel()
+                break
+        return await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _fetch_exchange(
+        self,
+        exchange_id: str,
+        coins: List[str],
+        preferred_quote: str,
+        snapshot: bool,
+    ) -> Dict[str, tuple]:
+        result = self.scanner.empty_exchange_rows(coins)
+        ready = await asyncio.to_thread(self.scanner.ensure_exchange_markets, exchange_id)
+        if not ready:
+            return result
+
+        symbol_by_coin, symbols = self.scanner.plan_exchange_symbols(exchange_id, coins, preferred_quote)
+        if not symbols:
+            return result
+
+        client = self._client(exchange_id)
+        started = time.monotonic()
+        has_fetch_tickers = bool(client.has.get("fetchTickers"))
+        tickers_map: Dict[str, dict] = {}
+        missing_symbols = list(symbols)
+
+        if snapshot:
+            if has_fetch_tickers:
+                tickers_map = await self._pull_snapshot(exchange_id, symbols)
+            missing_symbols = []
+        elif has_fetch_tickers:
+            try:
+                batch = await self._call(exchange_id, "fetch_tickers", symbols)
+                if isinstance(batch, dict):
+                    tickers_map = dict(batch)
+                    missing_symbols = [s for s in symbols if s not in tickers_map]
+            except Exception:
+                missing_symbols = list(symbols)
+
+        await self._fetch_each(exchange_id, missing_symbols, tickers_map)
+
+        result.update(
+            self.scanner.exchange_rows_from_tickers(exchange_id, symbol_by_coin, tickers_map)
+        )
+        if not snapshot:
+            self.scanner.scan_engine.record_job(exchange_id, time.monotonic() - started)
+        return result
+
+    async def _pull_snapshot(self, exchange_id: str, symbols: List[str]) -> Dict[str, dict]:
+        tickers_map: Dict[str, dict] = {}
+        try:
+            batch = await self._call(exchange_id, "fetch_tickers")
+            if isinstance(batch, dict):
+                tickers_map = dict(batch)
+        except Exception:
+            tickers_map = {}
+
+        if not tickers_map:
+            chunks = [
+                symbols[start:start + SNAPSHOT_CHUNK_SIZE]
+                for start in range(0, len(symbols), SNAPSHOT_CHUNK_SIZE)
+            ]
+            batches = await self._call_all(exchange_id, "fetch_tickers", [(chunk,) for chunk in chunks])
+            for batch in batches:
+                if isinstance(batch, dict):
+                    tickers_map.update(batch)
+        return tickers_map
+
+    async def _fetch_each(self, exchange_id: str, symbols: List[str], tickers_map: Dict[str, dict]) -> None:
+        scanner = self.scanner
+        symbols = [symbol for symbol in symbols if not scanner.symbol_known_dead(exchange_id, symbol)]
+        if not symbols:
+            return
+        tickers = await self._call_all(exchange_id, "fetch_ticker", [(symbol,) for symbol in symbols])
+        for symbol, ticker in zip(symbols, tickers):
+            if isinstance(ticker, dict):
+                if scanner._extract_price(ticker) is None:
+                    scanner.mark_symbol_dead(exchange_id, symbol)
+                tickers_map[symbol] = ticker
+            elif isinstance(ticker, Exception) and scanner.call_error_kind(ticker) == CALL_FAILED:
+                scanner.mark_symbol_dead(exchange_id, symbol)
+
+    def close(self) -> None:
+        async def close_clients() -> None:
+            for client in list(self.clients.values()):
+                try:
+                    await client.close()
+                except Exception:
+                    pass
+
+        try:
+            asyncio.run_coroutine_threadsafe(close_clients(), self.loop).result(timeout=5)
+        except Exception:
+            pass
+        self.loop.call_soon_threadsafe(self.loop.stop)
@@ -0,0 +1,149 @@
+import argparse
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+from typing import Dict, List, Optional
+
+from fake_exchange import fake_coins, fake_exchange_factory, lognormal_latency
+from scanner import EXCHANGES, ArbitrageScanner
+
+
+# coins / exchanges: universe size; snapshot: one fetch_tickers per venue
+# instead of per-batch symbols; latency: median seconds per request;
+# venues: per-exchange FakeExchange overrides.
+SCENARIOS: Dict[str, dict] = {
+    "coins50": {"coins": 50, "exchanges": 8, "snapshot": False, "latency": 0.02},
+    "universe10k": {"coins": 10000, "exchanges": 8, "snapshot": True, "latency": 0.05, "listing_ratio": 0.4},
+    "exchanges21": {"coins": 500, "exchanges": 21, "snapshot": False, "latency": 0.02, "listing_ratio": 0.6},
+    "slow-venue": {
+        "coins": 200,
+        "exchanges": 21,
+        "snapshot": False,
+        "latency": 0.02,
+        "venues": {"htx": {"latency": lognormal_latency(6.0, 0.1)}},
+    },
+    "flaky-venue": {
+        "coins": 200,
+        "exchanges": 21,
+        "snapshot": False,
+        "latency": 0.02,
+        "venues": {"kucoin": {"error_rate": 0.5}},
+    },
+}
+FILTER_SETTINGS = (0.0, True, "50", False, False, 0.0, False)
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, int(round(pct / 100.0 * len(ordered) + 0.5)) - 1))
+    return ordered[rank]
+
+
+def run_scenario(name: str, cycles: int, seed: int, measure_memory: bool, verbose: bool) -> dict:
+    spec = SCENARIOS[name]
+    coins = fake_coins(spec["coins"])
+    exchanges = EXCHANGES[: spec["exchanges"]]
+    exchange_ids = [exchange_id for exchange_id, _ in exchanges]
+    venues = {
+        exchange_id: dict(options, latency=options.get("latency") or lognormal_latency(spec["latency"]))
+        for exchange_id, options in ((ex, spec.get("venues", {}).get(ex, {})) for ex in exchange_ids)
+    }
+    factory = fake_exchange_factory(
+        coins,
+        seed=seed,
+        overrides=venues,
+        listing_ratio=spec.get("listing_ratio", 1.0),
+    )
+
+    if measure_memory:
+        tracemalloc.start()
+    scanner = ArbitrageScanner(exchanges=exchanges, log=print if verbose else lambda _m: None, client_factory=factory)
+    cycle_times: List[float] = []
+    filter_times: List[float] = []
+    try:
+        scanner.init_exchanges()
+        # Warm-up: market loads and the first full matrix build are not cycles.
+        scanner.collect_rows(coins, exchange_ids, "USDT", spec["snapshot"], False)
+        requests_before = _request_count(scanner)
+        for _ in range(cycles):
+            started = time.perf_counter()
+            rows = scanner.collect_rows(coins, exchange_ids, "USDT", spec["snapshot"], False)
+            collected = time.perf_counter()
+            scanner.apply_filters(rows, coins, *FILTER_SETTINGS)
+            finished = time.perf_counter()
+            cycle_times.append(finished - started)
+            filter_times.append(finished - collected)
+        requests = _request_count(scanner) - requests_before
+        rows_count = len(rows) if cycles else 0
+    finally:
+        scanner.close()
+        peak = tracemalloc.get_traced_memory()[1] if measure_memory else None
+        if measure_memory:
+            tracemalloc.stop()
+
+    total = sum(cycle_times)
+    return {
+        "scenario": name,
+        "coins": len(coins),
+        "exchanges": len(exchange_ids),
+        "cycles": cycles,
+        "rows": rows_count,
+        "coins_per_second": len(coins) * cycles / total if total > 0 else 0.0,
+        "cycle_p50_ms": _percentile(cycle_times, 50) * 1000.0,
+        "cycle_p99_ms": _percentile(cycle_times, 99) * 1000.0,
+        "filter_p50_ms": _percentile(filter_times, 50) * 1000.0,
+        "requests_per_cycle": requests / cycles if cycles else 0.0,
+        "peak_memory_mb": None if peak is None else peak / (1024 * 1024),
+    }
+
+
+def _request_count(scanner: ArbitrageScanner) -> int:
+    return sum(sum(client.calls.values()) for client in scanner.exchange_clients.values())
+
+
+def _format_result(result: dict) -> str:
+    peak = result["peak_memory_mb"]
+    return (
+        f"{result['scenario']:<12} {result['coins']:>6} x {result['exchanges']:<3} "
+        f"cycles {result['cycles']:<3} rows {result['rows']:>6} "
+        f"{result['coins_per_second']:>10.0f} coins/s "
+        f"p50 {result['cycle_p50_ms']:>8.1f} ms p99 {result['cycle_p99_ms']:>8.1f} ms "
+        f"filter {result['filter_p50_ms']:>6.1f} ms "
+        f"req/cycle {result['requests_per_cycle']:>6.1f} "
+        f"peak {'N/A' if peak is None else f'{peak:.1f} MB'}"
+    )
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Offline scan benchmark on fake exchanges")
+    parser.add_argument("scenarios", nargs="*", help=f"Сценарии: {', '.join(SCENARIOS)} (по умолчанию все)")
+    parser.add_argument("--cycles", type=int, default=5, help="Замеряемых циклов на сценарий")
+    parser.add_argument("--seed", type=int, default=0, help="Seed цен, задержек и ошибок")
+    parser.add_argument("--no-memory", action="store_true", help="Не замерять пиковую память (tracemalloc)")
+    parser.add_argument("--json", action="store_true", help="Выводить результаты в формате JSON Lines")
+    parser.add_argument("--verbose", action="store_true", help="Показывать лог сканера")
+    args = parser.parse_args(argv)
+
+    names = args.scenarios or list(SCENARIOS)
+    unknown = [name for name in names if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"неизвестные сценарии: {', '.join(unknown)}")
+    workdir = os.getcwd()
+    # Market and universe caches are written to the working directory, so the
+    # run happens in a scratch one and never touches the real caches.
+    with tempfile.TemporaryDirectory(prefix="arbitraj-bench-") as scratch:
+        os.chdir(scratch)
+        try:
+            for name in names:
+                result = run_scenario(name, max(1, args.cycles), args.seed, not args.no_memory, args.verbose)
+                print(json.dumps(result) if args.json else _format_result(result), flush=True)
+        finally:
+            os.chdir(workdir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+import math
+import random
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional
+
+import ccxt
+
+
+# Seconds to wait before answering one request, drawn from the venue's rng.
+LatencyModel = Callable[[random.Random], float]
+
+MAJOR_COINS = ["BTC", "ETH", "SOL", "XRP", "BNB", "DOGE", "ADA", "TRX", "TON", "LINK"]
+
+
+def fixed_latency(seconds: float) -> LatencyModel:
+    return lambda _rng: seconds
+
+
+def lognormal_latency(median: float, sigma: float = 0.5) -> LatencyModel:
+    # Right-skewed like real API latency: most answers near the median, a
+    # long tail of slow ones.
+    return lambda rng: median * math.exp(rng.gauss(0.0, sigma))
+
+
+def fake_coins(count: int) -> List[str]:
+    coins = MAJOR_COINS[:count]
+    coins.extend(f"C{idx:05d}" for idx in range(count - len(coins)))
+    return coins
+
+
+class FakeExchange:
+    # Offline stand-in for a sync ccxt client: the same attributes and fetch
+    # methods the scanner uses, markets built from a coin list, tickers that
+    # random-walk around a per-coin reference price, and injectable latency
+    # and errors. Everything is seeded, so a run is reproducible.
+    def __init__(
+        self,
+        exchange_id: str,
+        coins: Iterable[str],
+        quotes: Iterable[str] = ("USDT",),
+        seed: int = 0,
+        latency: Optional[LatencyModel] = None,
+        error_rate: float = 0.0,
+        error_cls: type = ccxt.RequestTimeout,
+        listing_ratio: float = 1.0,
+        price_skew: float = 0.002,
+        volatility: float = 0.0005,
+        fetch_tickers: bool = True,
+        rate_limit: float = 0.0,
+        taker: float = 0.001,
+    ) -> None:
+        self.id = exchange_id
+        self.rateLimit = rate_limit
+        self.timeout = 15000
+        self.has = {"fetchTickers": fetch_tickers, "fetchOrderBooks": False, "fetchDepositWithdrawFees": False}
+        self.fees = {"trading": {"taker": taker}}
+        self.markets: Optional[dict] = None
+        self.currencies: Optional[dict] = None
+        self.latency = latency or fixed_latency(0.0)
+        self.error_rate = error_rate
+        self.error_cls = error_cls
+        self.volatility = volatility
+        self.rng = random.Random(f"{seed}:{exchange_id}")
+        self.rng_lock = threading.Lock()
+        # method -> number of requests, failed ones included
+        self.calls: Dict[str, int] = {}
+
+        self.listed = [coin for coin in coins if listing_ratio >= 1.0 or self.rng.random() < listing_ratio]
+        self.quotes = list(quotes)
+        self.prices: Dict[str, float] = {}
+        for coin in self.listed:
+            # The reference price depends on the coin only, so venues agree
+            # up to their skew and the scanner finds realistic spreads.
+            reference = random.Random(f"{seed}:{coin}").uniform(0.01, 1000.0)
+            for quote in self.quotes:
+                skew = 1.0 + self.rng.gauss(0.0, price_skew)
+                self.prices[f"{coin}/{quote}"] = reference * skew
+
+    def _request(self, method: str) -> None:
+        with self.rng_lock:
+            self.calls[method] = self.calls.get(method, 0) + 1
+            delay = max(0.0, self.latency(self.rng))
+            failed = self.error_rate > 0 and self.rng.random() < self.error_rate
+        if delay:
+            time.sleep(delay)
+        if failed:
+            raise self.error_cls(f"{self.id} {method}: injected failure")
+
+    def _build_markets(self) -> dict:
+        markets = {}
+        for symbol in self.prices:
+            base, quote = symbol.split("/")
+            markets[symbol] = {
+                "id": f"{base}{quote}",
+                "symbol": symbol,
+                "base": base,
+                "quote": quote,
+                "spot": True,
+                "type": "spot",
+                "active": True,
+                "taker": self.fees["trading"]["taker"],
+            }
+        return markets
+
+    def _build_currencies(self) -> dict:
+        currencies = {}
+        for coin in self.listed:
+            currencies[coin] = {
+                "code": coin,
+                "networks": {
+                    "ERC20": {"network": "ERC20", "deposit": True, "withdraw": True, "active": True, "fee": 1.0},
+                },
+            }
+        return currencies
+
+    def load_markets(self, reload: bool = False) -> dict:
+        if self.markets and not reload:
+            return self.markets
+        self._request("load_markets")
+        self.set_markets(self._build_markets(), self._build_currencies())
+        return self.markets
+
+    def set_markets(self, markets: dict, currencies: Optional[dict] = None) -> dict:
+        self.markets = dict(markets)
+        if currencies is not None:
+            self.currencies = currencies
+        return self.markets
+
+    def _ticker(self, symbol: str) -> dict:
+        with self.rng_lock:
+            price = self.prices[symbol] * (1.0 + self.rng.gauss(0.0, self.volatility))
+            self.prices[symbol] = price
+            half_spread = price * 0.0005
+            volume = self.rng.uniform(1_000.0, 5_000_000.0)
+        return {
+            "symbol": symbol,
+            "timestamp": int(time.time() * 1000),
+            "last": price,
+            "bid": price - half_spread,
+            "ask": price + half_spread,
+            "baseVolume": volume / price,
+            "quoteVolume": volume,
+        }
+
+    def fetch_ticker(self, symbol: str) -> dict:
+        self._request("fetch_ticker")
+        if symbol not in self.prices:
+            raise ccxt.BadSymbol(f"{self.id} does not have market symbol {symbol}")
+        return self._ticker(symbol)
+
+    def fetch_tickers(self, symbols: Optional[List[str]] = None) -> Dict[str, dict]:
+        if not self.has["fetchTickers"]:
+            raise ccxt.NotSupported(f"{self.id} fetchTickers() is not supported yet")
+        self._request("fetch_tickers")
+        wanted = self.prices if symbols is None else [symbol for symbol in symbols if symbol in self.prices]
+        return {symbol: self._ticker(symbol) for symbol in wanted}
+
+
+def fake_exchange_factory(
+    coins: List[str],
+    seed: int = 0,
+    overrides: Optional[Dict[str, dict]] = None,
+    **defaults,
+) -> Callable[[str], FakeExchange]:
+    # client_factory for ArbitrageScanner; overrides holds per-exchange
+    # FakeExchange arguments, e.g. a slow latency for one venue.
+    overrides = overrides or {}
+
+    def factory(exchange_id: str) -> FakeExchange:
+        options = dict(defaults)
+        options.update(overrides.get(exchange_id, {}))
+        return FakeExchange(exchange_id, coins, seed=seed, **options)
+
+    return factory
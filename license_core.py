@@ -0,0 +1,130 @@
+import base64
+import hashlib
+import json
+import platform
+import textwrap
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from cryptography.exceptions import InvalidSignature
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PublicKey
+
+
+LICENSE_FILE = Path("license.json")
+PUBLIC_KEY_FILE = Path("license_public_key.pem")
+
+
+def _b64url_encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def _b64url_decode(data: str) -> bytes:
+    padding = "=" * (-len(data) % 4)
+    return base64.urlsafe_b64decode(data + padding)
+
+
+def current_machine_id() -> str:
+    raw = "|".join(
+        [
+            platform.system(),
+            platform.release(),
+            platform.machine(),
+            platform.node(),
+            hex(uuid.getnode()),
+        ]
+    )
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:24].upper()
+
+
+def load_public_key() -> Optional[Ed25519PublicKey]:
+    if not PUBLIC_KEY_FILE.exists():
+        return None
+    data = PUBLIC_KEY_FILE.read_bytes()
+    key = serialization.load_pem_public_key(data)
+    if isinstance(key, Ed25519PublicKey):
+        return key
+    return None
+
+
+def load_saved_license_code() -> Optional[str]:
+    if not LICENSE_FILE.exists():
+        return None
+    try:
+        data = json.loads(LICENSE_FILE.read_text(encoding="utf-8"))
+    except Exception:
+        return None
+    code = str(data.get("license_code", "")).strip()
+    return code or None
+
+
+def save_license_code(code: str) -> None:
+    LICENSE_FILE.write_text(
+        json.dumps({"license_code": code.strip()}, ensure_ascii=False, indent=2),
+        encoding="utf-8",
+    )
+
+
+def delete_saved_license() -> None:
+    if LICENSE_FILE.exists():
+        LICENSE_FILE.unlink()
+
+
+def verify_license_code(code: str, machine_id: Optional[str] = None) -> Tuple[Optional[Dict[str, str]], Optional[str]]:
+    normalized = "".join(str(code or "").split())
+    if not normalized:
+        return None, "Пустой код лицензии."
+
+    try:
+        payload_b64, signature_b64 = normalized.split(".", 1)
+    except ValueError:
+        return None, "Неверный формат кода лицензии."
+
+    public_key = load_public_key()
+    if public_key is None:
+        return None, f"Не найден публичный ключ: {PUBLIC_KEY_FILE}"
+
+    try:
+        payload_bytes = _b64url_decode(payload_b64)
+        signature = _b64url_decode(signature_b64)
+        public_key.verify(signature, payload_bytes)
+    except (InvalidSignature, ValueError):
+        return None, "Подпись лицензии недействительна."
+
+    try:
+        payload = json.loads(payload_bytes.decode("utf-8"))
+    except Exception:
+        return None, "Поврежденные данные лицензии."
+
+    expires_at = str(payload.get("expires_at", "")).strip()
+    if not expires_at:
+        return None, "В лицензии нет даты истечения."
+
+    try:
+        expires = datetime.fromisoformat(expires_at.replace("Z", "+00:00"))
+    except ValueError:
+        return None, "Неверная дата истечения в лицензии."
+
+    now = datetime.now(timezone.utc)
+    if expires < now:
+        return None, f"Срок лицензии истек: {expires.strftime('%Y-%m-%d %H:%M UTC')}"
+
+    expected_machine = str(payload.get("machine_id", "")).strip().upper()
+    current_machine = (machine_id or current_machine_id()).upper()
+    if expected_machine and expected_machine != "*" and expected_machine != current_machine:
+        return None, "Лицензия выдана для другого компьютера."
+
+    return payload, None
+
+
+def format_license_summary(payload: Dict[str, str]) -> str:
+    customer = str(payload.get("customer", "UNKNOWN")).strip()
+    expires_at = str(payload.get("expires_at", "")).strip()
+    machine_id = str(payload.get("machine_id", "")).strip()
+    return textwrap.shorten(
+        f"{customer} | до {expires_at} | {machine_id}",
+        width=80,
+        placeholder="...",
+    )
@@ -7,7 +7,7 @@ from pathlib import Path
 from cryptography.hazmat.primitives import serialization
 from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PrivateKey
 
-from license_manager import PUBLIC_KEY_FILE, current_machine_id
+from license_core import PUBLIC_KEY_FILE, current_machine_id
 
 
 PRIVATE_KEY_FILE = Path("license_private_key.pem")
@@ -0,0 +1,63 @@
+import json
+import os
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+
+MARKET_CACHE_DIR = Path("market_cache")
+MARKET_CACHE_VERSION = 2
+MARKET_CACHE_TTL_SECONDS = 6 * 60 * 60
+
+
+def _cache_path(exchange_id: str) -> Path:
+    return MARKET_CACHE_DIR / f"{exchange_id}.json"
+
+
+def load_market_cache(exchange_id: str) -> Optional[dict]:
+    path = _cache_path(exchange_id)
+    if not path.exists():
+        return None
+    try:
+        data = json.loads(path.read_text(encoding="utf-8"))
+    except Exception:
+        return None
+    if not isinstance(data, dict) or data.get("version") != MARKET_CACHE_VERSION:
+        return None
+    if not isinstance(data.get("markets"), dict) or not data["markets"]:
+        return None
+    if not isinstance(data.get("currency_networks"), dict):
+        return None
+    return data
+
+
+def save_market_cache(
+    exchange_id: str,
+    markets: dict,
+    currencies: Optional[dict],
+    currency_networks: Dict[str, List[dict]],
+) -> None:
+    MARKET_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    payload = {
+        "version": MARKET_CACHE_VERSION,
+        "exchange_id": exchange_id,
+        "saved_at": time.time(),
+        "markets": markets,
+        "currencies": currencies or {},
+        "currency_networks": currency_networks,
+    }
+    path = _cache_path(exchange_id)
+    tmp_path = path.with_suffix(".tmp")
+    tmp_path.write_text(
+        json.dumps(payload, ensure_ascii=False, separators=(",", ":"), default=str),
+        encoding="utf-8",
+    )
+    os.replace(tmp_path, path)
+
+
+def is_market_cache_fresh(data: dict, ttl_seconds: float = MARKET_CACHE_TTL_SECONDS) -> bool:
+    try:
+        saved_at = float(data.get("saved_at", 0))
+    except (TypeError, ValueError):
+        return False
+    return time.time() - saved_at < ttl_seconds
@@ -0,0 +1,155 @@
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+
+METRICS_FILE = Path("scan_metrics.json")
+METRICS_EWMA_ALPHA = 0.2
+
+# Stage names recorded by the scanner and the window.
+STAGE_CYCLE = "cycle"
+STAGE_USD_RATES = "usd_rates"
+STAGE_FETCH = "fetch"
+STAGE_MERGE = "merge"
+STAGE_SPREAD = "spread"
+STAGE_FILTERS = "filters"
+STAGE_DEPTH = "depth"
+STAGE_RENDER = "render"
+
+
+class TimingStats:
+    __slots__ = ("count", "total", "last", "ewma", "max")
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.total = 0.0
+        self.last = 0.0
+        self.ewma = 0.0
+        self.max = 0.0
+
+    def add(self, elapsed: float) -> None:
+        self.ewma = elapsed if self.count == 0 else METRICS_EWMA_ALPHA * elapsed + (1.0 - METRICS_EWMA_ALPHA) * self.ewma
+        self.count += 1
+        self.total += elapsed
+        self.last = elapsed
+        if elapsed > self.max:
+            self.max = elapsed
+
+    def as_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "last_ms": round(self.last * 1000.0, 2),
+            "avg_ms": round(self.total / self.count * 1000.0, 2) if self.count else 0.0,
+            "ewma_ms": round(self.ewma * 1000.0, 2),
+            "max_ms": round(self.max * 1000.0, 2),
+        }
+
+
+class RequestStats:
+    __slots__ = ("timing", "errors", "bytes")
+
+    def __init__(self) -> None:
+        self.timing = TimingStats()
+        self.errors = 0
+        self.bytes = 0
+
+
+def _empty_exchange_entry() -> dict:
+    return {"calls": 0, "errors": 0, "bytes": 0, "latency_ewma_ms": 0.0, "methods": {}, "error_classes": {}}
+
+
+class ScanMetrics:
+    # Counters for the hot path: one lock and a few additions per request or
+    # stage, no allocation after the first call for a key. Readers take a
+    # snapshot dict, which is what the stats panel and the metrics file show.
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.started_at = time.time()
+        self.stages: Dict[str, TimingStats] = {}
+        # (exchange, method) -> request stats
+        self.requests: Dict[Tuple[str, str], RequestStats] = {}
+        # (exchange, exception class name) -> count
+        self.error_classes: Dict[Tuple[str, str], int] = {}
+        # exchange -> mean age of its fresh tickers per response, in seconds
+        self.quote_ages: Dict[str, TimingStats] = {}
+        # exchange -> tickers dropped as stale
+        self.stale_quotes: Dict[str, int] = {}
+
+    def record_stage(self, stage: str, elapsed: float) -> None:
+        with self.lock:
+            stats = self.stages.get(stage)
+            if stats is None:
+                stats = self.stages[stage] = TimingStats()
+            stats.add(elapsed)
+
+    def record_request(
+        self,
+        exchange_id: str,
+        method: str,
+        elapsed: float,
+        error_class: Optional[str] = None,
+        nbytes: int = 0,
+    ) -> None:
+        key = (exchange_id, method)
+        with self.lock:
+            stats = self.requests.get(key)
+            if stats is None:
+                stats = self.requests[key] = RequestStats()
+            stats.timing.add(elapsed)
+            stats.bytes += nbytes
+            if error_class is not None:
+                stats.errors += 1
+                error_key = (exchange_id, error_class)
+                self.error_classes[error_key] = self.error_classes.get(error_key, 0) + 1
+
+    def record_quote_ages(self, exchange_id: str, mean_age: Optional[float], stale: int) -> None:
+        with self.lock:
+            if mean_age is not None:
+                stats = self.quote_ages.get(exchange_id)
+                if stats is None:
+                    stats = self.quote_ages[exchange_id] = TimingStats()
+                stats.add(mean_age)
+            if stale:
+                self.stale_quotes[exchange_id] = self.stale_quotes.get(exchange_id, 0) + stale
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            stages = {stage: stats.as_dict() for stage, stats in self.stages.items()}
+            exchanges: Dict[str, dict] = {}
+            for (exchange_id, method), stats in self.requests.items():
+                entry = exchanges.setdefault(exchange_id, _empty_exchange_entry())
+                method_entry = stats.timing.as_dict()
+                method_entry["errors"] = stats.errors
+                method_entry["bytes"] = stats.bytes
+                entry["methods"][method] = method_entry
+                entry["calls"] += stats.timing.count
+                entry["errors"] += stats.errors
+                entry["bytes"] += stats.bytes
+            for (exchange_id, error_class), count in self.error_classes.items():
+                exchanges[exchange_id]["error_classes"][error_class] = count
+            for exchange_id in set(self.quote_ages) | set(self.stale_quotes):
+                entry = exchanges.setdefault(exchange_id, _empty_exchange_entry())
+                ages = self.quote_ages.get(exchange_id)
+                entry["quote_age_ewma_ms"] = ages.as_dict()["ewma_ms"] if ages is not None else None
+                entry["stale_quotes"] = self.stale_quotes.get(exchange_id, 0)
+        for entry in exchanges.values():
+            # Latency of the exchange as a whole, weighted by request count.
+            calls = entry["calls"] or 1
+            entry["latency_ewma_ms"] = round(
+                sum(method["ewma_ms"] * method["count"] for method in entry["methods"].values()) / calls, 2
+            )
+        return {
+            "updated_at": time.time(),
+            "uptime_seconds": round(time.time() - self.started_at, 1),
+            "stages": stages,
+            "exchanges": exchanges,
+        }
+
+
+def write_metrics_file(snapshot: dict, path: Path = METRICS_FILE) -> None:
+    tmp_path = path.with_suffix(".tmp")
+    tmp_path.write_text(json.dumps(snapshot, ensure_ascii=False, indent=2), encoding="utf-8")
+    os.replace(tmp_path, path)
@@ -0,0 +1,405 @@
+import heapq
+import math
+from array import array
+from typing import Dict, List, Optional, Set, Tuple
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+NAN = float("nan")
+TX_NO = 0
+TX_YES = 1
+TX_GOOO = 2
+TX_LABELS = {TX_NO: "NO", TX_YES: "YES", TX_GOOO: "GOOO"}
+# Asset meta of a cell without a quote; shared so it compares by identity.
+EMPTY_META: dict = {}
+
+# row index, buy column, buy price, sell column, sell price, spread %
+BestQuote = Tuple[int, int, float, int, float, float]
+
+
+def numpy_available() -> bool:
+    return np is not None
+
+
+def _float_or_nan(value: Optional[float]) -> float:
+    return value if isinstance(value, float) else NAN
+
+
+def _nan_to_none(value: float) -> Optional[float]:
+    return None if math.isnan(value) else float(value)
+
+
+class PriceMatrix:
+    # Coin x exchange quote columns in contiguous float64 storage (NumPy when
+    # installed, array('d') otherwise) with interned symbols. Per-coin results
+    # (best route, spread, tx) are kept as 1-D columns next to the quotes.
+    def __init__(self, exchanges: List[str], executable: bool = False) -> None:
+        self.exchanges = list(exchanges)
+        self.width = len(self.exchanges)
+        self.exchange_index = {exchange_id: idx for idx, exchange_id in enumerate(self.exchanges)}
+        self.executable = executable
+        self.coin_index: Dict[str, int] = {}
+        self.coins: List[str] = []
+        self.capacity = 0
+        self.symbol_ids: Dict[str, int] = {}
+        self.symbol_names: List[str] = []
+        self.dirty: Set[int] = set()
+        # Trade link and asset meta per row * width + col. The scanner hands
+        # out one object per exchange symbol, so they compare by identity.
+        self.links: List[Optional[str]] = []
+        self.metas: List[dict] = []
+
+        self.last = self._float_grid(0)
+        self.bid = self._float_grid(0)
+        self.ask = self._float_grid(0)
+        self.volume = self._float_grid(0)
+        self.symbols = self._int_grid(0)
+
+        self.spread = self._float_column(0)
+        self.net_spread = self._float_column(0)
+        self.buy_price = self._float_column(0)
+        self.sell_price = self._float_column(0)
+        self.withdraw_fee = self._float_column(0)
+        self.min_col = self._int_column(0)
+        self.max_col = self._int_column(0)
+        self.tx = self._int_column(0)
+        self.route: List[str] = []
+
+    def _float_grid(self, rows: int):
+        if np is not None:
+            return np.full((rows, self.width), np.nan)
+        return array("d", [NAN]) * (rows * self.width)
+
+    def _int_grid(self, rows: int):
+        if np is not None:
+            return np.full((rows, self.width), -1, dtype=np.int32)
+        return array("i", [-1]) * (rows * self.width)
+
+    def _float_column(self, rows: int):
+        if np is not None:
+            return np.full(rows, np.nan)
+        return array("d", [NAN]) * rows
+
+    def _int_column(self, rows: int):
+        if np is not None:
+            return np.full(rows, -1, dtype=np.int32)
+        return array("i", [-1]) * rows
+
+    def _grow(self, needed: int) -> None:
+        capacity = max(needed, self.capacity * 2, 256)
+        extra = capacity - self.capacity
+        if np is not None:
+            self.last = np.vstack([self.last, self._float_grid(extra)])
+            self.bid = np.vstack([self.bid, self._float_grid(extra)])
+            self.ask = np.vstack([self.ask, self._float_grid(extra)])
+            self.volume = np.vstack([self.volume, self._float_grid(extra)])
+            self.symbols = np.vstack([self.symbols, self._int_grid(extra)])
+            for name in ("spread", "net_spread", "buy_price", "sell_price", "withdraw_fee"):
+                setattr(self, name, np.concatenate([getattr(self, name), self._float_column(extra)]))
+            for name in ("min_col", "max_col", "tx"):
+                setattr(self, name, np.concatenate([getattr(self, name), self._int_column(extra)]))
+        else:
+            for name in ("last", "bid", "ask", "volume"):
+                getattr(self, name).extend(self._float_grid(extra))
+            self.symbols.extend(self._int_grid(extra))
+            for name in ("spread", "net_spread", "buy_price", "sell_price", "withdraw_fee"):
+                getattr(self, name).extend(self._float_column(extra))
+            for name in ("min_col", "max_col", "tx"):
+                getattr(self, name).extend(self._int_column(extra))
+        self.route.extend(["N/A"] * extra)
+        self.links.extend([None] * (extra * self.width))
+        self.metas.extend([EMPTY_META] * (extra * self.width))
+        self.capacity = capacity
+
+    def row_of(self, coin: str) -> int:
+        row = self.coin_index.get(coin)
+        if row is None:
+            row = len(self.coins)
+            if row >= self.capacity:
+                self._grow(row + 1)
+            self.coin_index[coin] = row
+            self.coins.append(coin)
+            self.tx[row] = TX_NO
+        return row
+
+    def _intern(self, symbol: str) -> int:
+        symbol_id = self.symbol_ids.get(symbol)
+        if symbol_id is None:
+            symbol_id = len(self.symbol_names)
+            self.symbol_ids[symbol] = symbol_id
+            self.symbol_names.append(symbol)
+        return symbol_id
+
+    def _get(self, grid, row: int, col: int):
+        if np is not None:
+            return grid[row, col]
+        return grid[row * self.width + col]
+
+    def _set(self, grid, row: int, col: int, value) -> None:
+        if np is not None:
+            grid[row, col] = value
+        else:
+            grid[row * self.width + col] = value
+
+    def set_quote(
+        self,
+        coin: str,
+        exchange_id: str,
+        last: Optional[float],
+        symbol: str,
+        link: Optional[str],
+        meta: dict,
+        volume_usd: Optional[float],
+        bid: Optional[float],
+        ask: Optional[float],
+    ) -> bool:
+        col = self.exchange_index.get(exchange_id)
+        if col is None:
+            return False
+        row = self.row_of(coin)
+        symbol_id = self._intern(symbol) if symbol and symbol != "-" else -1
+        values = (
+            (self.last, _float_or_nan(last)),
+            (self.bid, _float_or_nan(bid)),
+            (self.ask, _float_or_nan(ask)),
+            (self.volume, _float_or_nan(volume_usd)),
+        )
+        changed = self._get(self.symbols, row, col) != symbol_id
+        cell = row * self.width + col
+        if self.links[cell] is not link or self.metas[cell] is not meta:
+            changed = True
+            self.links[cell] = link
+            self.metas[cell] = meta
+        for grid, value in values:
+            current = self._get(grid, row, col)
+            # NaN != NaN, so compare "both missing" explicitly.
+            if current != value and not (math.isnan(current) and math.isnan(value)):
+                changed = True
+                self._set(grid, row, col, value)
+        if changed:
+            self._set(self.symbols, row, col, symbol_id)
+            self.dirty.add(row)
+        return changed
+
+    def take_dirty(self) -> List[int]:
+        dirty, self.dirty = self.dirty, set()
+        return sorted(dirty)
+
+    def best(self, rows: List[int]) -> List[BestQuote]:
+        # Cheapest buy and richest sell per row over venues quoting both
+        # sides; ties go to the first exchange in selection order.
+        if not rows or self.width < 2:
+            return []
+        buy_grid, sell_grid = (self.ask, self.bid) if self.executable else (self.last, self.last)
+        if np is not None:
+            return self._best_numpy(rows, buy_grid, sell_grid)
+        return self._best_python(rows, buy_grid, sell_grid)
+
+    def _best_numpy(self, rows: List[int], buy_grid, sell_grid) -> List[BestQuote]:
+        index = np.asarray(rows, dtype=np.int64)
+        buy = buy_grid[index]
+        sell = sell_grid[index]
+        valid = ~(np.isnan(buy) | np.isnan(sell))
+        enough = valid.sum(axis=1) >= 2
+        buy_masked = np.where(valid, buy, np.inf)
+        sell_masked = np.where(valid, sell, -np.inf)
+        min_col = buy_masked.argmin(axis=1)
+        max_col = sell_masked.argmax(axis=1)
+        positions = np.arange(len(rows))
+        min_price = buy_masked[positions, min_col]
+        max_price = sell_masked[positions, max_col]
+        found = enough & (max_price > min_price) & (min_price > 0)
+        spread = np.zeros(len(rows))
+        spread[found] = (max_price[found] - min_price[found]) / min_price[found] * 100.0
+        return [
+            (rows[pos], int(min_col[pos]), float(min_price[pos]), int(max_col[pos]), float(max_price[pos]), float(spread[pos]))
+            for pos in np.flatnonzero(found)
+        ]
+
+    def _best_python(self, rows: List[int], buy_grid, sell_grid) -> List[BestQuote]:
+        width = self.width
+        found: List[BestQuote] = []
+        for row in rows:
+            base = row * width
+            min_col = max_col = -1
+            min_price = max_price = 0.0
+            valid = 0
+            for col in range(width):
+                buy = buy_grid[base + col]
+                sell = sell_grid[base + col]
+                if math.isnan(buy) or math.isnan(sell):
+                    continue
+                valid += 1
+                if min_col < 0 or buy < min_price:
+                    min_col, min_price = col, buy
+                if max_col < 0 or sell > max_price:
+                    max_col, max_price = col, sell
+            if valid < 2 or max_price <= min_price or min_price <= 0:
+                continue
+            found.append((row, min_col, min_price, max_col, max_price, (max_price - min_price) / min_price * 100.0))
+        return found
+
+    def clear_result(self, row: int) -> None:
+        self.spread[row] = NAN
+        self.net_spread[row] = NAN
+        self.buy_price[row] = NAN
+        self.sell_price[row] = NAN
+        self.withdraw_fee[row] = NAN
+        self.min_col[row] = -1
+        self.max_col[row] = -1
+        self.tx[row] = TX_NO
+        self.route[row] = "N/A"
+
+    def set_result(
+        self,
+        best: BestQuote,
+        route: str,
+        withdraw_fee: Optional[float],
+        net_spread: Optional[float],
+    ) -> None:
+        row, min_col, min_price, max_col, max_price, spread = best
+        self.spread[row] = spread
+        self.net_spread[row] = _float_or_nan(net_spread)
+        self.buy_price[row] = min_price
+        self.sell_price[row] = max_price
+        self.withdraw_fee[row] = _float_or_nan(withdraw_fee)
+        self.min_col[row] = min_col
+        self.max_col[row] = max_col
+        self.tx[row] = TX_GOOO if route != "UNVERIFIED" else TX_YES
+        self.route[row] = route
+
+    def symbol_at(self, row: int, col: int) -> Optional[str]:
+        symbol_id = int(self._get(self.symbols, row, col))
+        return self.symbol_names[symbol_id] if symbol_id >= 0 else None
+
+    def cell_at(self, row: int, col: int) -> Tuple[Optional[str], dict]:
+        cell = row * self.width + col
+        return self.links[cell], self.metas[cell]
+
+    def quote_at(self, row: int, col: int) -> Tuple[Optional[float], Optional[float], Optional[float], Optional[float]]:
+        return (
+            _nan_to_none(self._get(self.last, row, col)),
+            _nan_to_none(self._get(self.bid, row, col)),
+            _nan_to_none(self._get(self.ask, row, col)),
+            _nan_to_none(self._get(self.volume, row, col)),
+        )
+
+    def result_at(self, row: int) -> Dict[str, object]:
+        min_col = int(self.min_col[row])
+        max_col = int(self.max_col[row])
+        if min_col < 0 or max_col < 0:
+            return {}
+        return {
+            "spread": float(self.spread[row]),
+            "net_spread": _nan_to_none(self.net_spread[row]),
+            "buy_price": float(self.buy_price[row]),
+            "sell_price": float(self.sell_price[row]),
+            "withdraw_fee": _nan_to_none(self.withdraw_fee[row]),
+            "min_ex": self.exchanges[min_col],
+            "max_ex": self.exchanges[max_col],
+            "min_volume_usd": _nan_to_none(self._get(self.volume, row, min_col)),
+            "max_volume_usd": _nan_to_none(self._get(self.volume, row, max_col)),
+            "route": self.route[row],
+            "tx": TX_LABELS[int(self.tx[row])],
+        }
+
+    def rank(
+        self,
+        rows: List[int],
+        min_spread: float,
+        net_only: bool = False,
+        verified_only: bool = False,
+        min_volume_usd: Optional[float] = None,
+        sort_desc: bool = True,
+        limit: Optional[int] = None,
+    ) -> List[int]:
+        # Filters rows on the result columns and returns them best first (or in
+        # input order); with a limit only the top rows are selected instead of
+        # sorting everything. Ties keep input order, like a stable sort.
+        if not rows:
+            return []
+        if np is not None:
+            return self._rank_numpy(rows, min_spread, net_only, verified_only, min_volume_usd, sort_desc, limit)
+        return self._rank_python(rows, min_spread, net_only, verified_only, min_volume_usd, sort_desc, limit)
+
+    def _rank_numpy(
+        self,
+        rows: List[int],
+        min_spread: float,
+        net_only: bool,
+        verified_only: bool,
+        min_volume_usd: Optional[float],
+        sort_desc: bool,
+        limit: Optional[int],
+    ) -> List[int]:
+        index = np.asarray(rows, dtype=np.int64)
+        spread = self.spread[index]
+        ranked = self.net_spread[index] if net_only else spread
+        # NaN compares false, so rows without a spread drop out here.
+        mask = (spread <= 99) & (ranked >= min_spread)
+        if verified_only:
+            mask &= self.tx[index] >= TX_YES
+        if min_volume_usd is not None:
+            buy_volume = self.volume[index, np.maximum(self.min_col[index], 0)]
+            sell_volume = self.volume[index, np.maximum(self.max_col[index], 0)]
+            mask &= (buy_volume >= min_volume_usd) & (sell_volume >= min_volume_usd)
+
+        kept = np.flatnonzero(mask)
+        if sort_desc:
+            values = ranked[kept]
+            if limit is not None and limit < len(kept):
+                kth = np.partition(values, len(values) - limit)[len(values) - limit]
+                candidates = np.flatnonzero(values >= kth)
+                order = candidates[np.argsort(-values[candidates], kind="stable")][:limit]
+            else:
+                order = np.argsort(-values, kind="stable")
+            kept = kept[order]
+        elif limit is not None:
+            kept = kept[:limit]
+        return [rows[pos] for pos in kept.tolist()]
+
+    def _rank_python(
+        self,
+        rows: List[int],
+        min_spread: float,
+        net_only: bool,
+        verified_only: bool,
+        min_volume_usd: Optional[float],
+        sort_desc: bool,
+        limit: Optional[int],
+    ) -> List[int]:
+        spreads = self.spread
+        ranked_column = self.net_spread if net_only else spreads
+        volume, width = self.volume, self.width
+        kept: List[int] = []
+        values: List[float] = []
+        for row in rows:
+            if not spreads[row] <= 99:
+                continue
+            ranked = ranked_column[row]
+            if not ranked >= min_spread:
+                continue
+            if verified_only and self.tx[row] < TX_YES:
+                continue
+            if min_volume_usd is not None:
+                base = row * width
+                if not (
+                    volume[base + self.min_col[row]] >= min_volume_usd
+                    and volume[base + self.max_col[row]] >= min_volume_usd
+                ):
+                    continue
+            kept.append(row)
+            values.append(ranked)
+
+        if sort_desc:
+            positions = range(len(kept))
+            if limit is not None and limit < len(kept):
+                order = heapq.nlargest(limit, positions, key=values.__getitem__)
+            else:
+                order = sorted(positions, key=values.__getitem__, reverse=True)
+            return [kept[pos] for pos in order]
+        return kept[:limit] if limit is not None else kept
@@ -0,0 +1,296 @@
+import json
+import struct
+import threading
+import time
+import zlib
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+import ccxt
+
+
+RECORD_VERSION = 1
+RECORD_HEADER = struct.Struct(">I")
+RECORDED_METHODS = ("load_markets", "fetch_tickers", "fetch_ticker")
+
+
+def _encode(record: dict) -> bytes:
+    payload = zlib.compress(json.dumps(record, ensure_ascii=False, separators=(",", ":"), default=str).encode("utf-8"))
+    return RECORD_HEADER.pack(len(payload)) + payload
+
+
+def read_records(path: Path) -> List[dict]:
+    # A record cut short by a crash ends the file; everything before it is kept.
+    records: List[dict] = []
+    with open(path, "rb") as f:
+        while True:
+            header = f.read(RECORD_HEADER.size)
+            if len(header) < RECORD_HEADER.size:
+                break
+            (size,) = RECORD_HEADER.unpack(header)
+            payload = f.read(size)
+            if len(payload) < size:
+                break
+            try:
+                records.append(json.loads(zlib.decompress(payload).decode("utf-8")))
+            except Exception:
+                break
+    return records
+
+
+class Recorder:
+    # Append-only file of length-prefixed, zlib-compressed JSON records, one
+    # per exchange response. Opened in append mode, so several sessions can
+    # be recorded into one file.
+    def __init__(self, path: Path) -> None:
+        self.path = Path(path)
+        self.lock = threading.Lock()
+        self.file = open(self.path, "ab")
+        self.started = time.time()
+        self.write({"kind": "session", "version": RECORD_VERSION, "time": self.started})
+
+    def write(self, record: dict) -> None:
+        data = _encode(record)
+        with self.lock:
+            if not self.file.closed:
+                self.file.write(data)
+
+    def record_client(self, exchange_id: str, client: ccxt.Exchange) -> None:
+        has = getattr(client, "has", {}) or {}
+        self.write(
+            {
+                "kind": "client",
+                "exchange": exchange_id,
+                "has": {"fetchTickers": bool(has.get("fetchTickers"))},
+                "rate_limit": getattr(client, "rateLimit", 0),
+                "fees": (getattr(client, "fees", None) or {}).get("trading") or {},
+            }
+        )
+
+    def record_call(
+        self,
+        exchange_id: str,
+        method: str,
+        args: list,
+        started: float,
+        elapsed: float,
+        result: object = None,
+        exc: Optional[Exception] = None,
+    ) -> None:
+        record = {
+            "kind": "call",
+            "exchange": exchange_id,
+            "method": method,
+            "args": args,
+            "time": round(started, 4),
+            "elapsed": round(elapsed, 4),
+        }
+        if exc is not None:
+            record["error"] = [type(exc).__name__, str(exc)]
+        else:
+            record["result"] = result
+        self.write(record)
+
+    def close(self) -> None:
+        with self.lock:
+            if not self.file.closed:
+                self.file.close()
+
+
+class RecordingExchange:
+    # Wraps a ccxt client and writes every load_markets, fetch_tickers and
+    # fetch_ticker response to the recorder. Everything else, including
+    # attribute writes such as rateLimit, goes straight to the client.
+    def __init__(self, exchange_id: str, client: ccxt.Exchange, recorder: Recorder) -> None:
+        object.__setattr__(self, "_exchange_id", exchange_id)
+        object.__setattr__(self, "_client", client)
+        object.__setattr__(self, "_recorder", recorder)
+        recorder.record_client(exchange_id, client)
+
+    def __getattr__(self, name: str):
+        return getattr(self._client, name)
+
+    def __setattr__(self, name: str, value) -> None:
+        setattr(self._client, name, value)
+
+    def _recorded(self, method: str, *args):
+        started = time.time()
+        try:
+            result = getattr(self._client, method)(*args)
+        except Exception as exc:
+            self._recorder.record_call(self._exchange_id, method, list(args), started, time.time() - started, exc=exc)
+            raise
+        elapsed = time.time() - started
+        if method == "load_markets":
+            # Currencies carry the networks and fees the route index needs.
+            saved = {"markets": result, "currencies": getattr(self._client, "currencies", None)}
+        else:
+            saved = result
+        self._recorder.record_call(self._exchange_id, method, list(args), started, elapsed, saved)
+        return result
+
+    def load_markets(self, reload: bool = False) -> dict:
+        if self._client.markets and not reload:
+            return self._client.markets
+        return self._recorded("load_markets", reload)
+
+    def set_markets(self, markets: dict, currencies: Optional[dict] = None) -> dict:
+        # Markets taken from market_cache are recorded too, so a recording
+        # never depends on the cache of the machine it was made on.
+        result = self._client.set_markets(markets, currencies)
+        self._recorder.record_call(
+            self._exchange_id,
+            "load_markets",
+            [False],
+            time.time(),
+            0.0,
+            {"markets": markets, "currencies": currencies},
+        )
+        return result
+
+    def fetch_tickers(self, symbols: Optional[List[str]] = None) -> Dict[str, dict]:
+        return self._recorded("fetch_tickers", symbols)
+
+    def fetch_ticker(self, symbol: str) -> dict:
+        return self._recorded("fetch_ticker", symbol)
+
+
+def recording_client_factory(
+    recorder: Recorder,
+    base_factory: Callable[[str], ccxt.Exchange],
+) -> Callable[[str], RecordingExchange]:
+    return lambda exchange_id: RecordingExchange(exchange_id, base_factory(exchange_id), recorder)
+
+
+def _args_key(args: list) -> str:
+    return json.dumps(args, separators=(",", ":"), sort_keys=True)
+
+
+class Replay:
+    # Recorded calls grouped per exchange. A call is answered with the next
+    # recording of the same method and arguments; when those run out the
+    # sequence starts over, so a replay can drive any number of cycles.
+    def __init__(self, path: Path, speed: float = 1.0) -> None:
+        self.path = Path(path)
+        # 1.0 replays each response after its recorded latency, 2.0 twice as
+        # fast, 0 as fast as possible.
+        self.speed = speed
+        self.clients: Dict[str, dict] = {}
+        self.calls: Dict[Tuple[str, str, str], List[dict]] = {}
+        self.by_method: Dict[Tuple[str, str], List[dict]] = {}
+        self.markets: Dict[str, dict] = {}
+        for record in read_records(self.path):
+            kind = record.get("kind")
+            if kind == "client":
+                self.clients.setdefault(record["exchange"], record)
+            elif kind == "call" and record.get("method") in RECORDED_METHODS:
+                exchange_id, method = record["exchange"], record["method"]
+                self.calls.setdefault((exchange_id, method, _args_key(record["args"])), []).append(record)
+                self.by_method.setdefault((exchange_id, method), []).append(record)
+                if method == "load_markets" and "result" in record and exchange_id not in self.markets:
+                    self.markets[exchange_id] = record["result"]
+        self.lock = threading.Lock()
+        self.cursors: Dict[Tuple, int] = {}
+
+    def exchange_ids(self) -> List[str]:
+        return sorted(self.clients)
+
+    def next_record(self, exchange_id: str, method: str, args: list) -> Optional[dict]:
+        exact = (exchange_id, method, _args_key(args))
+        key: Tuple = exact
+        records = self.calls.get(exact)
+        if not records and method == "fetch_tickers":
+            # Batches can differ between runs; any batch of the venue will do.
+            key = (exchange_id, method)
+            records = self.by_method.get(key)
+        if not records:
+            return None
+        with self.lock:
+            position = self.cursors.get(key, 0)
+            self.cursors[key] = position + 1
+        return records[position % len(records)]
+
+    def shift_ticker(self, ticker: dict, recorded_at: float) -> dict:
+        # Moved by the time since the response was recorded, so a quote is
+        # exactly as old at replay as it was when it arrived.
+        timestamp = ticker.get("timestamp")
+        if isinstance(timestamp, (int, float)):
+            ticker = dict(ticker)
+            ticker["timestamp"] = int(timestamp + (time.time() - recorded_at) * 1000)
+            ticker["datetime"] = ccxt.Exchange.iso8601(ticker["timestamp"])
+        return ticker
+
+
+class ReplayExchange:
+    # Stands in for a ccxt client and answers from a Replay.
+    def __init__(self, exchange_id: str, replay: Replay) -> None:
+        client = replay.clients.get(exchange_id, {})
+        self.id = exchange_id
+        self.replay = replay
+        self.rateLimit = client.get("rate_limit", 0)
+        self.timeout = 15000
+        self.has = {
+            "fetchTickers": bool(client.get("has", {}).get("fetchTickers")),
+            "fetchOrderBooks": False,
+            "fetchDepositWithdrawFees": False,
+        }
+        self.fees = {"trading": client.get("fees", {})}
+        self.markets: Optional[dict] = None
+        self.currencies: Optional[dict] = None
+
+    def _answer(self, method: str, args: list) -> dict:
+        record = self.replay.next_record(self.id, method, args)
+        if record is None:
+            # Not a network failure: an unrecorded call must not open the circuit.
+            error_cls = ccxt.BadSymbol if method == "fetch_ticker" else ccxt.ExchangeError
+            raise error_cls(f"{self.id} {method}: нет записи для воспроизведения")
+        if self.replay.speed > 0:
+            time.sleep(record.get("elapsed", 0.0) / self.replay.speed)
+        error = record.get("error")
+        if error:
+            error_cls = getattr(ccxt, str(error[0]), None)
+            if not isinstance(error_cls, type) or not issubclass(error_cls, Exception):
+                error_cls = ccxt.ExchangeError
+            raise error_cls(error[1])
+        return record
+
+    def load_markets(self, reload: bool = False) -> dict:
+        if self.markets and not reload:
+            return self.markets
+        recorded = self.replay.markets.get(self.id)
+        if recorded is None:
+            recorded = self._answer("load_markets", [reload]).get("result") or {}
+        return self.set_markets(recorded.get("markets") or {}, recorded.get("currencies"))
+
+    def set_markets(self, markets: dict, currencies: Optional[dict] = None) -> dict:
+        # Recorded markets win over the local market_cache, so the replay
+        # sees the venue exactly as it was recorded.
+        recorded = self.replay.markets.get(self.id)
+        if recorded is not None:
+            markets = recorded.get("markets") or markets
+            currencies = recorded.get("currencies") or currencies
+        self.markets = dict(markets)
+        if currencies is not None:
+            self.currencies = currencies
+        return self.markets
+
+    def fetch_tickers(self, symbols: Optional[List[str]] = None) -> Dict[str, dict]:
+        record = self._answer("fetch_tickers", [symbols])
+        tickers = record.get("result") or {}
+        if symbols is not None:
+            # Answered from a call with other symbols: keep what was asked.
+            tickers = {symbol: tickers[symbol] for symbol in symbols if symbol in tickers}
+        return {symbol: self.replay.shift_ticker(ticker, record["time"]) for symbol, ticker in tickers.items()}
+
+    def fetch_ticker(self, symbol: str) -> dict:
+        record = self._answer("fetch_ticker", [symbol])
+        return self.replay.shift_ticker(record.get("result") or {}, record["time"])
+
+
+def replay_client_factory(replay: Replay) -> Callable[[str], ReplayExchange]:
+    def factory(exchange_id: str) -> ReplayExchange:
+        if exchange_id not in replay.clients:
+            raise ccxt.ExchangeNotAvailable(f"нет в записи {replay.path.name}")
+        return ReplayExchange(exchange_id, replay)
+
+    return factory
@@ -0,0 +1,296 @@
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+
+SCAN_PIPELINE_DEPTH = 2
+SCAN_JOB_WORKERS = 4
+# Background maintenance (stale market cache reloads) runs one job at a time
+# on its own pool, so it never queues ahead of a scan.
+BACKGROUND_JOB_WORKERS = 1
+EXCHANGE_POOL_WORKERS = 2
+SNAPSHOT_CHUNK_SIZE = 200
+LATENCY_EWMA_ALPHA = 0.3
+SCAN_DEADLINE_FACTOR = 3.0
+SCAN_DEADLINE_MIN_SECONDS = 4.0
+SCAN_DEADLINE_MAX_SECONDS = 20.0
+RATE_LIMIT_BACKOFF = 1.5
+RATE_LIMIT_RECOVERY = 0.95
+RATE_LIMIT_MAX_FACTOR = 8.0
+EXCHANGE_TIMEOUT_MIN_MS = 5000
+EXCHANGE_TIMEOUT_MAX_MS = 15000
+EXCHANGE_TIMEOUT_FACTOR = 4.0
+CIRCUIT_FAILURE_THRESHOLD = 3
+CIRCUIT_COOLDOWN_SECONDS = 15.0
+CIRCUIT_COOLDOWN_MAX_SECONDS = 300.0
+
+CIRCUIT_CLOSED = "closed"
+CIRCUIT_OPEN = "open"
+CIRCUIT_HALF_OPEN = "half-open"
+
+# Error kinds passed to ScanEngine.record_call.
+CALL_RATE_LIMITED = "rate_limit"
+CALL_NETWORK_ERROR = "network"
+CALL_FAILED = "error"
+
+
+def _ewma(current: Optional[float], sample: float) -> float:
+    if current is None:
+        return sample
+    return LATENCY_EWMA_ALPHA * sample + (1.0 - LATENCY_EWMA_ALPHA) * current
+
+
+def batch_key(coins: List[str]) -> int:
+    # Identifies a coin batch, so late fetches are only merged into a scan of
+    # the same coins.
+    return hash(tuple(coins))
+
+
+class ExchangeHealth:
+    __slots__ = (
+        "latency",
+        "job_latency",
+        "error_rate",
+        "throttle",
+        "calls",
+        "state",
+        "failures",
+        "open_until",
+        "cooldown",
+        "probing",
+    )
+
+    def __init__(self) -> None:
+        # Single request and whole per-exchange fetch job, in seconds.
+        self.latency: Optional[float] = None
+        self.job_latency: Optional[float] = None
+        self.error_rate = 0.0
+        # Multiplier on the client's own rateLimit; grows on 429s, decays on success.
+        self.throttle = 1.0
+        self.calls = 0
+        # Circuit breaker: consecutive failures open it for a cooldown that
+        # doubles on every failed probe.
+        self.state = CIRCUIT_CLOSED
+        self.failures = 0
+        self.open_until = 0.0
+        self.cooldown = CIRCUIT_COOLDOWN_SECONDS
+        self.probing = False
+
+
+class ScanEngine:
+    # At most pipeline_depth scans run at once; extra refresh requests are
+    # coalesced into one pending scan that starts when a slot frees up.
+    def __init__(
+        self,
+        pipeline_depth: int = SCAN_PIPELINE_DEPTH,
+        job_workers: int = SCAN_JOB_WORKERS,
+        exchange_workers: int = EXCHANGE_POOL_WORKERS,
+    ) -> None:
+        self.pipeline_depth = max(1, pipeline_depth)
+        self.exchange_workers = max(1, exchange_workers)
+        self.job_pool = ThreadPoolExecutor(max_workers=job_workers, thread_name_prefix="scan-job")
+        self.background_pool = ThreadPoolExecutor(max_workers=BACKGROUND_JOB_WORKERS, thread_name_prefix="scan-background")
+        self.exchange_pools: Dict[str, ThreadPoolExecutor] = {}
+        self.lock = threading.Lock()
+        self.active_scans = 0
+        self.pending_scan = False
+        self.last_started_seq = 0
+        self.last_rendered_seq = 0
+        self.closed = False
+        self.health: Dict[str, ExchangeHealth] = {}
+        # Called with (exchange_id, new circuit state) outside the lock.
+        self.on_circuit_change: Optional[Callable[[str, str], None]] = None
+
+    def submit_job(self, fn: Callable, *args, **kwargs) -> Future:
+        return self.job_pool.submit(fn, *args, **kwargs)
+
+    def submit_background(self, fn: Callable, *args, **kwargs) -> Future:
+        return self.background_pool.submit(fn, *args, **kwargs)
+
+    def submit_exchange(self, exchange_id: str, fn: Callable, *args, **kwargs) -> Future:
+        return self._exchange_pool(exchange_id).submit(fn, *args, **kwargs)
+
+    def _exchange_pool(self, exchange_id: str) -> ThreadPoolExecutor:
+        with self.lock:
+            pool = self.exchange_pools.get(exchange_id)
+            if pool is None:
+                pool = ThreadPoolExecutor(
+                    max_workers=self.exchange_workers,
+                    thread_name_prefix=f"scan-{exchange_id}",
+                )
+                self.exchange_pools[exchange_id] = pool
+            return pool
+
+    def _health(self, exchange_id: str) -> ExchangeHealth:
+        health = self.health.get(exchange_id)
+        if health is None:
+            health = ExchangeHealth()
+            self.health[exchange_id] = health
+        return health
+
+    def record_call(self, exchange_id: str, elapsed: float, error: Optional[str] = None) -> ExchangeHealth:
+        changed: Optional[str] = None
+        with self.lock:
+            health = self._health(exchange_id)
+            health.calls += 1
+            if error != CALL_RATE_LIMITED:
+                # A timeout still tells how slow the venue is right now.
+                health.latency = _ewma(health.latency, elapsed)
+            failed = 1.0 if error else 0.0
+            health.error_rate = _ewma(health.error_rate, failed)
+
+            if error is None:
+                health.throttle = max(1.0, health.throttle * RATE_LIMIT_RECOVERY)
+                changed = self._close_circuit(health)
+            elif error == CALL_RATE_LIMITED:
+                health.throttle = min(RATE_LIMIT_MAX_FACTOR, health.throttle * RATE_LIMIT_BACKOFF)
+            elif error == CALL_NETWORK_ERROR:
+                # Exchange-level errors (bad symbol etc.) do not mean the venue
+                # is down; only network failures and timeouts count.
+                changed = self._trip_circuit(health)
+        if changed is not None and self.on_circuit_change is not None:
+            self.on_circuit_change(exchange_id, changed)
+        return health
+
+    def _close_circuit(self, health: ExchangeHealth) -> Optional[str]:
+        health.failures = 0
+        health.probing = False
+        health.cooldown = CIRCUIT_COOLDOWN_SECONDS
+        if health.state == CIRCUIT_CLOSED:
+            return None
+        health.state = CIRCUIT_CLOSED
+        return CIRCUIT_CLOSED
+
+    def _trip_circuit(self, health: ExchangeHealth) -> Optional[str]:
+        health.failures += 1
+        if health.state == CIRCUIT_HALF_OPEN:
+            health.cooldown = min(CIRCUIT_COOLDOWN_MAX_SECONDS, health.cooldown * 2)
+        elif health.state == CIRCUIT_OPEN or health.failures < CIRCUIT_FAILURE_THRESHOLD:
+            return None
+        health.state = CIRCUIT_OPEN
+        health.probing = False
+        health.open_until = time.monotonic() + health.cooldown
+        return CIRCUIT_OPEN
+
+    def allow_exchange(self, exchange_id: str) -> bool:
+        # Closed: always. Open: never until the cooldown ends, then the circuit
+        # goes half-open and exactly one fetch job is let through as a probe.
+        changed: Optional[str] = None
+        with self.lock:
+            health = self.health.get(exchange_id)
+            if health is None or health.state == CIRCUIT_CLOSED:
+                return True
+            if health.state == CIRCUIT_OPEN:
+                if time.monotonic() < health.open_until:
+                    return False
+                health.state = CIRCUIT_HALF_OPEN
+                health.probing = False
+                changed = CIRCUIT_HALF_OPEN
+            # A probe that never reached the exchange (nothing to fetch) must
+            # not block the circuit forever, so it expires after a cooldown.
+            allowed = not health.probing or time.monotonic() >= health.open_until
+            if allowed:
+                health.probing = True
+                health.open_until = time.monotonic() + health.cooldown
+        if changed is not None and self.on_circuit_change is not None:
+            self.on_circuit_change(exchange_id, changed)
+        return allowed
+
+    def circuit_state(self, exchange_id: str) -> str:
+        with self.lock:
+            health = self.health.get(exchange_id)
+            return CIRCUIT_CLOSED if health is None else health.state
+
+    def record_failure(self, exchange_id: str) -> None:
+        # A failure outside a timed request, e.g. a market load that raised.
+        with self.lock:
+            health = self._health(exchange_id)
+            health.error_rate = _ewma(health.error_rate, 1.0)
+            changed = self._trip_circuit(health)
+        if changed is not None and self.on_circuit_change is not None:
+            self.on_circuit_change(exchange_id, changed)
+
+    def record_job(self, exchange_id: str, elapsed: float) -> None:
+        with self.lock:
+            health = self._health(exchange_id)
+            health.job_latency = _ewma(health.job_latency, elapsed)
+
+    def client_limits(self, exchange_id: str, base_rate_limit: float) -> Tuple[float, int]:
+        # rateLimit (ms between requests) and timeout (ms) for the exchange's
+        # client, derived from what the venue has been doing lately.
+        with self.lock:
+            health = self.health.get(exchange_id)
+            if health is None:
+                return base_rate_limit, EXCHANGE_TIMEOUT_MAX_MS
+            timeout = EXCHANGE_TIMEOUT_MAX_MS
+            if health.latency is not None:
+                timeout = int(health.latency * 1000.0 * EXCHANGE_TIMEOUT_FACTOR)
+            timeout = min(EXCHANGE_TIMEOUT_MAX_MS, max(EXCHANGE_TIMEOUT_MIN_MS, timeout))
+            return base_rate_limit * health.throttle, timeout
+
+    def health_snapshot(self) -> Dict[str, dict]:
+        with self.lock:
+            return {
+                exchange_id: {
+                    "circuit": health.state,
+                    "throttle": round(health.throttle, 2),
+                    "error_rate": round(health.error_rate, 3),
+                    "job_latency_ms": None if health.job_latency is None else round(health.job_latency * 1000.0, 1),
+                }
+                for exchange_id, health in self.health.items()
+            }
+
+    def scan_deadline(self, exchange_ids: List[str]) -> float:
+        # Long enough for the typical venue to answer, so one stalled exchange
+        # no longer sets the cycle time; its data is merged when it arrives.
+        with self.lock:
+            latencies = sorted(
+                health.job_latency
+                for exchange_id, health in self.health.items()
+                if exchange_id in exchange_ids and health.job_latency is not None
+            )
+        if len(latencies) < 2:
+            return SCAN_DEADLINE_MAX_SECONDS
+        typical = latencies[len(latencies) // 2]
+        return min(SCAN_DEADLINE_MAX_SECONDS, max(SCAN_DEADLINE_MIN_SECONDS, typical * SCAN_DEADLINE_FACTOR))
+
+    def begin_scan(self) -> Optional[int]:
+        with self.lock:
+            if self.closed:
+                return None
+            if self.active_scans >= self.pipeline_depth:
+                self.pending_scan = True
+                return None
+            self.active_scans += 1
+            self.last_started_seq += 1
+            return self.last_started_seq
+
+    def finish_scan(self) -> bool:
+        with self.lock:
+            self.active_scans = max(0, self.active_scans - 1)
+            if self.pending_scan and not self.closed:
+                self.pending_scan = False
+                return True
+            return False
+
+    def cancel_scan(self) -> None:
+        with self.lock:
+            self.active_scans = max(0, self.active_scans - 1)
+
+    def claim_render(self, seq: int) -> bool:
+        # An older scan that finishes late must not overwrite a newer table.
+        with self.lock:
+            if seq < self.last_rendered_seq:
+                return False
+            self.last_rendered_seq = seq
+            return True
+
+    def shutdown(self) -> None:
+        with self.lock:
+            self.closed = True
+            pools = list(self.exchange_pools.values())
+        self.job_pool.shutdown(wait=False, cancel_futures=True)
+        self.background_pool.shutdown(wait=False, cancel_futures=True)
+        for pool in pools:
+            pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,1772 @@
+import heapq
+import threading
+import time
+from collections import deque
+from collections.abc import Mapping
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError, as_completed
+from typing import Callable, Deque, Dict, Iterator, List, Optional, Set, Tuple
+
+import ccxt
+import requests
+
+from async_scan import AsyncScanBackend, async_backend_available, create_async_exchange_client
+from market_cache import is_market_cache_fresh, load_market_cache, save_market_cache
+from metrics import (
+    STAGE_CYCLE,
+    STAGE_DEPTH,
+    STAGE_FETCH,
+    STAGE_FILTERS,
+    STAGE_MERGE,
+    STAGE_SPREAD,
+    STAGE_USD_RATES,
+    ScanMetrics,
+)
+from price_matrix import EMPTY_META, BestQuote, PriceMatrix
+from scan_engine import (
+    CALL_FAILED,
+    CALL_NETWORK_ERROR,
+    CALL_RATE_LIMITED,
+    CIRCUIT_HALF_OPEN,
+    CIRCUIT_OPEN,
+    SNAPSHOT_CHUNK_SIZE,
+    ScanEngine,
+    batch_key,
+)
+from shard_scan import ShardedScanBackend, process_backend_available
+from universe_cache import (
+    POPULAR_CACHE_TTL_SECONDS,
+    is_popular_cache_fresh,
+    is_universe_cache_fresh,
+    load_universe_cache,
+    save_universe_cache,
+)
+
+
+EXCHANGES: List[Tuple[str, str]] = [
+    ("binance", "Binance"),
+    ("bybit", "Bybit"),
+    ("coinbase", "Coinbase"),
+    ("okx", "OKX"),
+    ("kraken", "Kraken"),
+    ("gateio", "Gate.io"),
+    ("mexc", "MEXC"),
+    ("bitget", "Bitget"),
+    ("htx", "HTX"),
+    ("upbit", "Upbit"),
+    ("kucoin", "KuCoin"),
+    ("bingx", "BingX"),
+    ("cryptocom", "Crypto.com"),
+    ("bitmart", "BitMart"),
+    ("lbank", "LBank"),
+    ("whitebit", "WhiteBIT"),
+    ("poloniex", "Poloniex"),
+    ("bitstamp", "Bitstamp"),
+    ("coinex", "CoinEx"),
+    ("btse", "BTSE"),
+    ("bitfinex", "Bitfinex"),
+]
+
+FALLBACK_QUOTES = ["USDT", "USD", "USDC", "BTC"]
+USD_CONVERSION_QUOTES = ["USDT", "USD", "USDC"]
+POPULAR_START_COUNT = 500
+LONG_SCAN_LIMIT = 10000
+SCAN_BACKENDS = ["THREADS", "ASYNC", "PROCESSES"]
+ORDERBOOK_DEPTH_LIMIT = 20
+ORDERBOOK_CACHE_TTL_SECONDS = 10.0
+DEPTH_SHORTLIST_SIZE = 10
+DEFAULT_TRADE_NOTIONAL_USD = 1000.0
+DEAD_SYMBOL_TTL_SECONDS = 900.0
+USD_RATE_TTL_SECONDS = 60.0
+# Quotes older than this are treated as missing before any spread is built.
+STALE_TICKER_SECONDS = 300.0
+# Venue clock offset is learned from the last hour of responses and never
+# taken larger than this; anything beyond it counts as staleness.
+CLOCK_SKEW_WINDOW_SECONDS = 3600.0
+MAX_CLOCK_SKEW_SECONDS = 60.0
+NETWORK_ALIASES = {
+    "ERC20": "ETHEREUM",
+    "ETH": "ETHEREUM",
+    "ARBITRUMONE": "ARBITRUM",
+    "ARBONE": "ARBITRUM",
+    "ARBEVM": "ARBITRUM",
+    "BEP20": "BSC",
+    "BSC": "BSC",
+    "BSC(BEP20)": "BSC",
+    "TRC20": "TRON",
+    "TRX": "TRON",
+    "MATIC": "POLYGON",
+    "POLYGON": "POLYGON",
+    "SOL": "SOLANA",
+    "AVAXC": "AVALANCHE-C",
+    "AVAXC-CHAIN": "AVALANCHE-C",
+    "OPTIMISM": "OPTIMISM",
+    "OP": "OPTIMISM",
+}
+
+# price, symbol, link, asset meta, 24h volume in USD, best bid, best ask
+ExchangeEntry = Tuple[Optional[float], str, Optional[str], dict, Optional[float], Optional[float], Optional[float]]
+
+
+class MatrixRows(Mapping):
+    # Rows returned by collect_rows. A cycle only updates the price matrix;
+    # the nested row of a coin is built when it is first looked up (filtered
+    # rows, the saved window) and cached until its quotes change. Consumers
+    # that walk every coin take summaries() instead, and apply_filters ranks
+    # straight from the matrix columns.
+    def __init__(self, scanner: "ArbitrageScanner", matrix: PriceMatrix, coins: List[str]) -> None:
+        self.scanner = scanner
+        self.matrix = matrix
+        self.coins = list(dict.fromkeys(coins))
+        self.coin_set = set(self.coins)
+
+    def __getitem__(self, coin: str) -> Dict[str, object]:
+        if coin not in self.coin_set:
+            raise KeyError(coin)
+        return self.scanner.matrix_row(self.matrix, coin)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.coins)
+
+    def __len__(self) -> int:
+        return len(self.coins)
+
+    def summaries(self) -> Dict[str, Dict[str, object]]:
+        # coin -> spread, route and volume fields of its best pair ({} without one)
+        matrix = self.matrix
+        with self.scanner.spread_lock:
+            return {
+                coin: matrix.result_at(matrix.coin_index[coin]) if coin in matrix.coin_index else {}
+                for coin in self.coins
+            }
+
+
+def create_exchange_client(exchange_id: str) -> ccxt.Exchange:
+    client_cls = getattr(ccxt, exchange_id)
+    return client_cls({"enableRateLimit": True, "timeout": 15000})
+
+
+class ArbitrageScanner:
+    # Everything a scan needs without a GUI: exchange clients and metadata,
+    # the worker pools, incremental spreads, filters and the depth stage.
+    # The Tk app and scanner_cli.py are both thin consumers of this class.
+    def __init__(
+        self,
+        exchanges: Optional[List[Tuple[str, str]]] = None,
+        log: Optional[Callable[[str], None]] = None,
+        client_factory: Optional[Callable[[str], ccxt.Exchange]] = None,
+        async_client_factory: Optional[Callable[[str], object]] = None,
+    ) -> None:
+        self.exchanges = list(exchanges or EXCHANGES)
+        # Build the sync and async clients for an exchange id; benchmarks
+        # swap in fakes.
+        self.client_factory: Callable[[str], ccxt.Exchange] = client_factory or create_exchange_client
+        self.async_client_factory: Callable[[str], object] = async_client_factory or create_async_exchange_client
+        self.exchange_name_by_id = {exchange_id: name for exchange_id, name in self.exchanges}
+        self.log: Callable[[str], None] = log or print
+
+        self.exchange_clients: Dict[str, ccxt.Exchange] = {}
+        self.exchange_markets: Dict[str, set] = {}
+        # exchange -> base code -> quote -> spot symbol, rebuilt on every market load
+        self.exchange_symbol_index: Dict[str, Dict[str, Dict[str, str]]] = {}
+        self.exchange_locks: Dict[str, threading.Lock] = {}
+        self.exchange_market_locks: Dict[str, threading.Lock] = {}
+        self.exchange_available: Dict[str, bool] = {}
+        self.exchange_currency_networks: Dict[str, Dict[str, List[dict]]] = {}
+        self.base_rate_limits: Dict[str, float] = {}
+        # exchange -> coin -> (withdrawable networks as (key, display, fee) by fee, depositable keys)
+        self.exchange_route_networks: Dict[str, Dict[str, Tuple[List[Tuple[str, str, Optional[float]]], set]]] = {}
+        # (source exchange, target exchange) -> coin -> (route, withdrawal fee) or None
+        self.route_index: Dict[Tuple[str, str], Dict[str, Optional[Tuple[str, Optional[float]]]]] = {}
+        self.route_index_lock = threading.Lock()
+        self.market_cache_refreshing: Set[str] = set()
+        self.market_cache_lock = threading.Lock()
+        self.popular_ranking: List[str] = []
+        self.popular_ranking_saved_at = 0.0
+
+        self.scan_engine = ScanEngine()
+        self.metrics = ScanMetrics()
+        self.scan_engine.on_circuit_change = self._log_circuit_change
+        self.scan_backend = "THREADS"
+        # (exchange, coin batch) -> fetch that missed a cycle deadline; merged
+        # by the next collect_rows of the same batch.
+        self.pending_fetches: Dict[Tuple[str, int], Future] = {}
+        self.pending_lock = threading.Lock()
+        # (exchange, symbol) -> monotonic time until which fetch_ticker is skipped
+        self.dead_symbols: Dict[Tuple[str, str], float] = {}
+        self.async_backend: Optional[AsyncScanBackend] = None
+        self.process_backend: Optional[ShardedScanBackend] = None
+        self.price_matrix: Optional[PriceMatrix] = None
+        self.spread_lock = threading.Lock()
+        # Row dicts handed out by MatrixRows; dropped when a coin's quotes
+        # change and rebuilt on the next lookup, so emitted rows are never
+        # mutated.
+        self.spread_rows: Dict[str, Dict[str, object]] = {}
+        # exchange -> symbol -> (trade link, asset meta), built once per
+        # market load so unchanged cells are the same objects every cycle
+        self.symbol_cells: Dict[str, Dict[str, Tuple[Optional[str], dict]]] = {}
+        self.order_book_cache: Dict[Tuple[str, str], Tuple[float, dict]] = {}
+        self.order_book_lock = threading.Lock()
+        # quote -> (USD rate, monotonic time it was seen); shared by all
+        # exchanges and refreshed in bulk once per USD_RATE_TTL_SECONDS.
+        self.quote_usd_rates: Dict[str, Tuple[float, float]] = {}
+        # exchange -> coin -> age in seconds of the last ticker seen for it
+        self.quote_ages: Dict[str, Dict[str, float]] = {}
+        # exchange -> (monotonic time, lag ms) with increasing lags; the head
+        # is the smallest lag of the skew window.
+        self.clock_lags: Dict[str, Deque[Tuple[float, float]]] = {}
+        self.clock_lag_lock = threading.Lock()
+        self.usd_rate_lock = threading.Lock()
+        self.trade_notional_usd = DEFAULT_TRADE_NOTIONAL_USD
+        self.spread_notional = DEFAULT_TRADE_NOTIONAL_USD
+        self.blacklist: Set[str] = set()
+
+    def init_exchanges(self) -> int:
+        ok = 0
+        for exchange_id, exchange_name in self.exchanges:
+            try:
+                client = self.client_factory(exchange_id)
+                self.exchange_clients[exchange_id] = client
+                self.base_rate_limits[exchange_id] = float(getattr(client, "rateLimit", 0) or 0)
+                self.exchange_markets[exchange_id] = set()
+                self.exchange_locks[exchange_id] = threading.Lock()
+                self.exchange_market_locks[exchange_id] = threading.Lock()
+                self.exchange_available[exchange_id] = True
+                self.exchange_currency_networks[exchange_id] = {}
+                ok += 1
+                self.log(f"{exchange_name}: API клиент готов.")
+            except Exception as exc:
+                self.exchange_available[exchange_id] = False
+                self.log(f"{exchange_name}: недоступна ({exc}).")
+        return ok
+
+    def set_backend(self, backend: str) -> str:
+        if backend != "THREADS" and self.client_factory is not create_exchange_client and (
+            backend == "PROCESSES" or self.async_client_factory is create_async_exchange_client
+        ):
+            # PROCESSES (and ASYNC without its own factory) build real ccxt
+            # clients and would bypass a fake, recorded or replayed client.
+            self.log(f"{backend} недоступен с подменёнными клиентами бирж, используется THREADS.")
+            backend = "THREADS"
+        if backend == "ASYNC" and self.async_backend is None:
+            if not async_backend_available():
+                self.log("ASYNC недоступен (нет ccxt.async_support), используется THREADS.")
+                backend = "THREADS"
+            else:
+                self.async_backend = AsyncScanBackend(self)
+                self.log("Запущен asyncio-движок сканирования.")
+        if backend == "PROCESSES" and self.process_backend is None:
+            if not process_backend_available():
+                self.log("PROCESSES недоступен (одно ядро CPU), используется THREADS.")
+                backend = "THREADS"
+            else:
+                self.process_backend = ShardedScanBackend(self)
+                self.log(f"Запущено процессов сканирования: {len(self.process_backend.shards)}.")
+        self.scan_backend = backend
+        return backend
+
+    def close(self) -> None:
+        if self.async_backend is not None:
+            self.async_backend.close()
+        if self.process_backend is not None:
+            self.process_backend.close()
+        self.scan_engine.shutdown()
+
+    def cached_universe(self) -> Tuple[List[str], bool]:
+        # The universe saved by the last fetch_universe and whether it is
+        # still fresh for the exchanges initialized now.
+        cached = load_universe_cache()
+        if cached is None:
+            return [], False
+        coins = [str(coin) for coin in cached["coins"] if coin not in self.blacklist]
+        return coins, is_universe_cache_fresh(cached, list(self.exchange_clients))
+
+    def load_all_markets(self) -> Dict[str, List[str]]:
+        # Base codes per exchange; markets come from market_cache when fresh.
+        def worker(exchange_id: str) -> List[str]:
+            if not self.ensure_exchange_markets(exchange_id):
+                return []
+            return sorted(self.exchange_symbol_index.get(exchange_id, {}))
+
+        result: Dict[str, List[str]] = {}
+        exchange_ids = list(self.exchange_clients)
+        futures = {self.scan_engine.submit_exchange(ex_id, worker, ex_id): ex_id for ex_id in exchange_ids}
+        for future in as_completed(futures):
+            ex_id = futures[future]
+            try:
+                result[ex_id] = future.result()
+            except Exception as exc:
+                self.log(f"Ошибка universe {ex_id}: {exc}")
+        return result
+
+    def fetch_universe(self) -> List[str]:
+        coins = set()
+        exchange_ids = list(self.exchange_clients)
+        for base_codes in self.load_all_markets().values():
+            coins.update(base_codes)
+
+        global_universe = [coin for coin in sorted(coins) if coin not in self.blacklist][:LONG_SCAN_LIMIT]
+        popular = self._fetch_popular_symbols(global_universe)
+        popular_set = set(popular)
+        tail = [coin for coin in global_universe if coin not in popular_set]
+        universe = popular + tail
+        if global_universe:
+            try:
+                save_universe_cache(universe, exchange_ids, self.popular_ranking, self.popular_ranking_saved_at)
+            except Exception as exc:
+                self.log(f"Не удалось сохранить кэш universe ({exc}).")
+        return universe
+
+    def _load_popular_ranking(self) -> List[str]:
+        # CoinGecko market-cap order; reused from the universe cache for a day.
+        if self.popular_ranking and time.time() - self.popular_ranking_saved_at < POPULAR_CACHE_TTL_SECONDS:
+            return self.popular_ranking
+        cached = load_universe_cache()
+        if cached is not None and is_popular_cache_fresh(cached):
+            self.popular_ranking = [str(symbol) for symbol in cached["popular"]]
+            self.popular_ranking_saved_at = float(cached["popular_saved_at"])
+            return self.popular_ranking
+
+        ranking: List[str] = []
+        seen = set()
+        try:
+            for page in [1, 2]:
+                response = requests.get(
+                    "https://api.coingecko.com/api/v3/coins/markets",
+                    params={
+                        "vs_currency": "usd",
+                        "order": "market_cap_desc",
+                        "per_page": 250,
+                        "page": page,
+                        "sparkline": "false",
+                    },
+                    timeout=12,
+                )
+                response.raise_for_status()
+                for item in response.json():
+                    symbol = str(item.get("symbol", "")).upper().strip()
+                    if symbol and symbol not in seen:
+                        seen.add(symbol)
+                        ranking.append(symbol)
+        except Exception as exc:
+            self.log(f"Не удалось загрузить топ-500 популярных монет: {exc}")
+            return ranking
+
+        self.popular_ranking = ranking
+        self.popular_ranking_saved_at = time.time()
+        return ranking
+
+    def _fetch_popular_symbols(self, available_coins: List[str]) -> List[str]:
+        available_set = set(available_coins)
+        popular: List[str] = []
+        seen = set()
+        for symbol in self._load_popular_ranking():
+            if symbol in available_set and symbol not in seen:
+                seen.add(symbol)
+                popular.append(symbol)
+
+        if len(popular) < POPULAR_START_COUNT:
+            fallback = available_coins[:POPULAR_START_COUNT]
+            for coin in fallback:
+                if coin not in seen:
+                    popular.append(coin)
+        return popular[:POPULAR_START_COUNT]
+
+    def _normalize_network(self, value: Optional[str]) -> Optional[str]:
+        if not value:
+            return None
+        cleaned = "".join(ch for ch in str(value).upper() if ch.isalnum())
+        if not cleaned:
+            return None
+        return NETWORK_ALIASES.get(cleaned, cleaned)
+
+    def _build_exchange_metadata_index(self, exchange_id: str) -> None:
+        client = self.exchange_clients.get(exchange_id)
+        if client is None:
+            return
+
+        currencies = getattr(client, "currencies", {}) or {}
+        currency_networks: Dict[str, List[dict]] = {}
+        fee_overrides = self._fetch_withdraw_fees(client, currencies)
+
+        for code, currency in currencies.items():
+            base_code = str(code).upper().strip()
+            if not base_code:
+                continue
+
+            parsed_networks: List[dict] = []
+            networks = currency.get("networks") or {}
+            for network_name, network in networks.items():
+                info = network.get("info") or {}
+                normalized_network = self._normalize_network(
+                    network.get("network") or network_name or info.get("chain") or info.get("name")
+                )
+                fee = self._extract_float(network.get("fee"))
+                if fee is None:
+                    fee = fee_overrides.get((base_code, normalized_network))
+                parsed = {
+                    "network": normalized_network,
+                    "display": network.get("network") or network_name,
+                    "deposit": network.get("deposit"),
+                    "withdraw": network.get("withdraw"),
+                    "active": network.get("active"),
+                    "fee": fee,
+                }
+                parsed_networks.append(parsed)
+
+            if parsed_networks:
+                # Cheapest withdrawal first, networks with an unknown fee last.
+                parsed_networks.sort(key=lambda item: (item["fee"] is None, item["fee"] or 0.0))
+                currency_networks[base_code] = parsed_networks
+
+        self.exchange_currency_networks[exchange_id] = currency_networks
+        self._index_exchange_routes(exchange_id)
+
+    def _index_exchange_routes(self, exchange_id: str) -> None:
+        # Deposit/withdraw flags only change when metadata reloads, so they are
+        # filtered once here and route lookups involving this exchange are
+        # dropped from the pair index, as are its cached symbol cells.
+        self.symbol_cells.pop(exchange_id, None)
+        routes: Dict[str, Tuple[List[Tuple[str, str, Optional[float]]], set]] = {}
+        for base_code, networks in self.exchange_currency_networks.get(exchange_id, {}).items():
+            withdrawable: List[Tuple[str, str, Optional[float]]] = []
+            depositable = set()
+            for network in networks:
+                key = network.get("network")
+                if not key or network.get("active") is False:
+                    continue
+                if network.get("withdraw") is not False:
+                    withdrawable.append((key, str(network.get("display") or key), network.get("fee")))
+                if network.get("deposit") is not False:
+                    depositable.add(key)
+            routes[base_code] = (withdrawable, depositable)
+
+        with self.route_index_lock:
+            self.exchange_route_networks[exchange_id] = routes
+            for pair in [pair for pair in self.route_index if exchange_id in pair]:
+                del self.route_index[pair]
+
+    def _fetch_withdraw_fees(
+        self,
+        client: ccxt.Exchange,
+        currencies: dict,
+    ) -> Dict[Tuple[str, Optional[str]], float]:
+        # fetch_currencies leaves network fees empty on some exchanges; fill the
+        # gaps from fetch_deposit_withdraw_fees once per metadata load.
+        has_missing = any(
+            network.get("fee") is None
+            for currency in currencies.values()
+            for network in (currency.get("networks") or {}).values()
+        )
+        if not has_missing or not client.has.get("fetchDepositWithdrawFees"):
+            return {}
+        try:
+            fees = client.fetch_deposit_withdraw_fees()
+        except Exception:
+            return {}
+
+        overrides: Dict[Tuple[str, Optional[str]], float] = {}
+        for code, entry in (fees or {}).items():
+            base_code = str(code).upper().strip()
+            for network_name, network in (entry.get("networks") or {}).items():
+                fee = self._extract_float((network.get("withdraw") or {}).get("fee"))
+                if fee is not None:
+                    overrides[(base_code, self._normalize_network(network_name))] = fee
+        return overrides
+
+    def _set_exchange_markets(self, exchange_id: str, markets: dict) -> None:
+        # Only spot markets are indexed: a derivative keyed like a spot pair
+        # can never be picked for a transfer arbitrage. Active markets win
+        # over inactive duplicates.
+        index: Dict[str, Dict[str, str]] = {}
+        active: Dict[str, bool] = {}
+        for symbol, market in markets.items():
+            if not market.get("spot"):
+                continue
+            base = str(market.get("base") or "").upper().strip()
+            quote = str(market.get("quote") or "").upper().strip()
+            if not base or not quote:
+                continue
+            is_active = market.get("active") is not False
+            quotes = index.setdefault(base, {})
+            if quote in quotes and (active[quotes[quote]] or not is_active):
+                continue
+            quotes[quote] = str(market.get("symbol") or symbol)
+            active[quotes[quote]] = is_active
+        self.exchange_symbol_index[exchange_id] = index
+        self.exchange_markets[exchange_id] = set(markets.keys())
+
+    def spot_symbol(self, exchange_id: str, base_code: str, quote: str) -> Optional[str]:
+        return self.exchange_symbol_index.get(exchange_id, {}).get(base_code.upper(), {}).get(quote.upper())
+
+    def ensure_exchange_markets(self, exchange_id: str) -> bool:
+        if not self.exchange_available.get(exchange_id, False):
+            return False
+
+        if self.exchange_markets.get(exchange_id):
+            return True
+
+        lock = self.exchange_market_locks.get(exchange_id)
+        client = self.exchange_clients.get(exchange_id)
+        if lock is None or client is None:
+            return False
+
+        with lock:
+            if self.exchange_markets.get(exchange_id):
+                return True
+            if self._load_markets_from_cache(exchange_id, client):
+                return True
+            market_source = self._market_source()
+            if market_source is not None:
+                try:
+                    payload = market_source(exchange_id, False)
+                except Exception:
+                    return False
+                return payload is not None and self._install_markets(exchange_id, client, payload)
+            started = time.monotonic()
+            try:
+                markets = client.load_markets()
+            except Exception as exc:
+                # Counted by the circuit breaker; the venue is retried after
+                # its cooldown instead of being dropped for the session.
+                self.metrics.record_request(exchange_id, "load_markets", time.monotonic() - started, type(exc).__name__)
+                self.scan_engine.record_failure(exchange_id)
+                return False
+            self.metrics.record_request(exchange_id, "load_markets", time.monotonic() - started)
+            try:
+                self._set_exchange_markets(exchange_id, markets)
+                self._build_exchange_metadata_index(exchange_id)
+                self._store_market_cache(exchange_id, client)
+                return True
+            except Exception:
+                self.scan_engine.record_failure(exchange_id)
+                return False
+
+    def _market_source(self) -> Optional[Callable[[str, bool], Optional[dict]]]:
+        # Under PROCESSES the shards own the venue connections: markets missing
+        # from the disk cache, and stale ones, come from the exchange's shard
+        # as (exchange, reload) -> markets in the market-cache layout.
+        if self.scan_backend == "PROCESSES" and self.process_backend is not None:
+            return self.process_backend.shard_markets
+        return None
+
+    def _load_markets_from_cache(self, exchange_id: str, client: ccxt.Exchange) -> bool:
+        cached = load_market_cache(exchange_id)
+        if cached is None or not self._install_markets(exchange_id, client, cached):
+            return False
+        if not is_market_cache_fresh(cached):
+            self._refresh_market_cache_async(exchange_id)
+        return True
+
+    def _install_markets(self, exchange_id: str, client: ccxt.Exchange, payload: dict) -> bool:
+        try:
+            client.set_markets(payload["markets"], payload.get("currencies") or None)
+        except Exception:
+            return False
+        self._set_exchange_markets(exchange_id, client.markets)
+        self.exchange_currency_networks[exchange_id] = payload["currency_networks"]
+        self._index_exchange_routes(exchange_id)
+        return True
+
+    def market_payload(self, exchange_id: str) -> Optional[dict]:
+        # Loaded markets in the market-cache layout, for the coordinator.
+        client = self.exchange_clients.get(exchange_id)
+        if client is None or not self.exchange_markets.get(exchange_id):
+            return None
+        return {
+            "markets": client.markets,
+            "currencies": getattr(client, "currencies", None) or {},
+            "currency_networks": self.exchange_currency_networks.get(exchange_id, {}),
+        }
+
+    def reload_exchange_markets(self, exchange_id: str) -> bool:
+        client = self.exchange_clients.get(exchange_id)
+        lock = self.exchange_market_locks.get(exchange_id)
+        if client is None or lock is None:
+            return False
+        market_source = self._market_source()
+        with lock:
+            if market_source is not None:
+                payload = market_source(exchange_id, True)
+                return payload is not None and self._install_markets(exchange_id, client, payload)
+            started = time.monotonic()
+            markets = client.load_markets(reload=True)
+            self.metrics.record_request(exchange_id, "load_markets", time.monotonic() - started)
+            self._set_exchange_markets(exchange_id, markets)
+            self._build_exchange_metadata_index(exchange_id)
+        self._store_market_cache(exchange_id, client)
+        return True
+
+    def _store_market_cache(self, exchange_id: str, client: ccxt.Exchange) -> None:
+        try:
+            save_market_cache(
+                exchange_id,
+                client.markets,
+                getattr(client, "currencies", None),
+                self.exchange_currency_networks.get(exchange_id, {}),
+            )
+        except Exception as exc:
+            name = self.exchange_name_by_id.get(exchange_id, exchange_id)
+            self.log(f"{name}: не удалось сохранить кэш рынков ({exc}).")
+
+    def _refresh_market_cache_async(self, exchange_id: str) -> None:
+        with self.market_cache_lock:
+            if exchange_id in self.market_cache_refreshing:
+                return
+            self.market_cache_refreshing.add(exchange_id)
+
+        def worker() -> None:
+            try:
+                self.reload_exchange_markets(exchange_id)
+            except Exception:
+                pass
+            finally:
+                with self.market_cache_lock:
+                    self.market_cache_refreshing.discard(exchange_id)
+
+        self.scan_engine.submit_background(worker)
+
+    def _extract_price(self, ticker: Optional[dict]) -> Optional[float]:
+        if not ticker:
+            return None
+        value = ticker.get("last") or ticker.get("close") or ticker.get("bid")
+        try:
+            return float(value) if value else None
+        except (TypeError, ValueError):
+            return None
+
+    def _extract_float(self, value: object) -> Optional[float]:
+        try:
+            return float(value) if value is not None else None
+        except (TypeError, ValueError):
+            return None
+
+    def _extract_positive(self, value: object) -> Optional[float]:
+        number = self._extract_float(value)
+        return number if number is not None and number > 0 else None
+
+    def is_usd_quote(self, quote: str) -> bool:
+        return quote.upper() in {"USD", "USDT", "USDC", "FDUSD", "TUSD", "USDE", "DAI"}
+
+    def usd_conversion_symbols(self, quote: str) -> List[str]:
+        quote_upper = quote.upper()
+        return [f"{quote_upper}/{usd_quote}" for usd_quote in USD_CONVERSION_QUOTES]
+
+    def usd_rate(self, quote: str) -> Optional[float]:
+        # Never touches the network: rates come from refresh_usd_rates and from
+        # conversion tickers that arrive with regular batches.
+        quote_upper = quote.upper()
+        if self.is_usd_quote(quote_upper):
+            return 1.0
+        cached = self.quote_usd_rates.get(quote_upper)
+        return cached[0] if cached is not None else None
+
+    def store_usd_rate(self, quote: str, rate: float, stamp: Optional[float] = None) -> None:
+        if rate <= 0:
+            return
+        stamp = time.monotonic() if stamp is None else stamp
+        quote_upper = quote.upper()
+        with self.usd_rate_lock:
+            cached = self.quote_usd_rates.get(quote_upper)
+            if cached is None or cached[1] <= stamp:
+                self.quote_usd_rates[quote_upper] = (rate, stamp)
+
+    def usd_quotes_in_use(self, preferred_quote: str) -> List[str]:
+        quotes = [preferred_quote.upper()] + [quote for quote in FALLBACK_QUOTES if quote != preferred_quote.upper()]
+        return [quote for quote in quotes if not self.is_usd_quote(quote)]
+
+    def _learn_usd_rates(self, quotes: Set[str], tickers_map: Dict[str, dict]) -> None:
+        for quote in quotes:
+            for symbol in self.usd_conversion_symbols(quote):
+                price = self._extract_price(tickers_map.get(symbol))
+                if price is not None and price > 0:
+                    self.store_usd_rate(quote, price)
+                    break
+
+    def refresh_usd_rates(self, quotes: List[str], exchange_ids: List[str]) -> None:
+        # Called once per cycle before the exchanges are scanned: every stale
+        # non-USD quote is priced with one batched request on the first
+        # exchange that lists a conversion market for it.
+        now = time.monotonic()
+        stale = []
+        for quote in quotes:
+            quote_upper = quote.upper()
+            cached = self.quote_usd_rates.get(quote_upper)
+            if self.is_usd_quote(quote_upper) or quote_upper in stale:
+                continue
+            if cached is None or now - cached[1] >= USD_RATE_TTL_SECONDS:
+                stale.append(quote_upper)
+
+        for exchange_id in exchange_ids:
+            if not stale:
+                return
+            if self.scan_engine.circuit_state(exchange_id) == CIRCUIT_OPEN:
+                continue
+            if not self.ensure_exchange_markets(exchange_id):
+                continue
+            client = self.exchange_clients.get(exchange_id)
+            lock = self.exchange_locks.get(exchange_id)
+            if client is None or lock is None:
+                continue
+            wanted: List[str] = []
+            for quote in stale:
+                for usd_quote in USD_CONVERSION_QUOTES:
+                    symbol = self.spot_symbol(exchange_id, quote, usd_quote)
+                    if symbol is not None:
+                        wanted.append(symbol)
+                        break
+            if not wanted:
+                continue
+
+            tickers_map: Dict[str, dict] = {}
+            try:
+                if len(wanted) > 1 and client.has.get("fetchTickers"):
+                    tickers_map = self._exchange_call(exchange_id, client, lock, "fetch_tickers", wanted) or {}
+                else:
+                    for symbol in wanted:
+                        tickers_map[symbol] = self._exchange_call(exchange_id, client, lock, "fetch_ticker", symbol)
+            except Exception:
+                pass
+            self._learn_usd_rates(set(stale), tickers_map)
+            stale = [quote for quote in stale if self.quote_usd_rates.get(quote, (0.0, 0.0))[1] < now]
+
+    def _extract_volume_usd(
+        self,
+        symbol: str,
+        ticker: Optional[dict],
+        price: Optional[float],
+    ) -> Optional[float]:
+        if not ticker or not symbol:
+            return None
+
+        try:
+            _base, quote = symbol.split("/")
+        except ValueError:
+            return None
+
+        quote_volume = self._extract_float(ticker.get("quoteVolume"))
+        if quote_volume is None:
+            base_volume = self._extract_float(ticker.get("baseVolume"))
+            if base_volume is not None and price is not None:
+                quote_volume = base_volume * price
+        if quote_volume is None or quote_volume <= 0:
+            return None
+
+        multiplier = self.usd_rate(quote)
+        if multiplier is None or multiplier <= 0:
+            return None
+        return quote_volume * multiplier
+
+    def _resolve_symbol_candidates(
+        self,
+        exchange_id: str,
+        coin: str,
+        preferred_quote: str,
+    ) -> List[Tuple[str, str]]:
+        base_code = coin.strip().upper()
+        quotes = self.exchange_symbol_index.get(exchange_id, {}).get(base_code)
+        if not quotes:
+            return []
+        resolved: List[Tuple[str, str]] = []
+        for quote in [preferred_quote] + [q for q in FALLBACK_QUOTES if q != preferred_quote]:
+            symbol = quotes.get(quote)
+            if symbol is not None:
+                resolved.append((base_code, symbol))
+        return resolved
+
+    def asset_meta_for_symbol(self, exchange_id: str, base_code: str, symbol: str) -> dict:
+        networks = list(self.exchange_currency_networks.get(exchange_id, {}).get(base_code.upper(), []))
+        return {
+            "base_code": base_code.upper(),
+            "networks": networks,
+            "taker": self._taker_fee(exchange_id, symbol),
+        }
+
+    def symbol_cell(self, exchange_id: str, base_code: str, symbol: str) -> Tuple[Optional[str], dict]:
+        # The meta is shared by every row of the symbol and must not be mutated.
+        cells = self.symbol_cells.get(exchange_id)
+        if cells is None:
+            cells = self.symbol_cells[exchange_id] = {}
+        cell = cells.get(symbol)
+        if cell is None:
+            cell = cells[symbol] = (
+                self.build_exchange_link(exchange_id, symbol),
+                self.asset_meta_for_symbol(exchange_id, base_code, symbol),
+            )
+        return cell
+
+    def _taker_fee(self, exchange_id: str, symbol: str) -> Optional[float]:
+        client = self.exchange_clients.get(exchange_id)
+        if client is None:
+            return None
+        market = (getattr(client, "markets", None) or {}).get(symbol) or {}
+        taker = self._extract_float(market.get("taker"))
+        if taker is None:
+            trading = (getattr(client, "fees", None) or {}).get("trading") or {}
+            taker = self._extract_float(trading.get("taker"))
+        return taker
+
+    def _exchange_call(
+        self,
+        exchange_id: str,
+        client: ccxt.Exchange,
+        lock: threading.Lock,
+        method: str,
+        *args,
+    ):
+        # Every ticker/order book request goes through here so the scan engine
+        # sees its latency and errors and can retune the client's limits.
+        with lock:
+            started = time.monotonic()
+            try:
+                result = getattr(client, method)(*args)
+            except Exception as exc:
+                self.record_exchange_call(exchange_id, client, method, time.monotonic() - started, exc)
+                raise
+            self.record_exchange_call(exchange_id, client, method, time.monotonic() - started)
+        return result
+
+    def metrics_snapshot(self) -> dict:
+        # Request/stage counters plus what the scan engine knows per venue.
+        snapshot = self.metrics.snapshot()
+        for exchange_id, health in self.scan_engine.health_snapshot().items():
+            entry = snapshot["exchanges"].setdefault(exchange_id, {})
+            entry.update(health)
+        for exchange_id, entry in snapshot["exchanges"].items():
+            entry["name"] = self.exchange_name_by_id.get(exchange_id, exchange_id)
+            skew = self.clock_skew(exchange_id)
+            entry["clock_skew_ms"] = None if skew is None else round(skew * 1000.0, 1)
+        return snapshot
+
+    def record_exchange_call(
+        self,
+        exchange_id: str,
+        client,
+        method: str,
+        elapsed: float,
+        exc: Optional[Exception] = None,
+    ) -> None:
+        # Shared by the sync and async paths: health for the scan engine,
+        # counters for the metrics, then the client's limits are retuned.
+        error_kind = None if exc is None else self.call_error_kind(exc)
+        self.scan_engine.record_call(exchange_id, elapsed, error_kind)
+        response = getattr(client, "last_http_response", None) if exc is None else None
+        self.metrics.record_request(
+            exchange_id,
+            method,
+            elapsed,
+            None if exc is None else type(exc).__name__,
+            len(response) if isinstance(response, (str, bytes)) else 0,
+        )
+        self.tune_exchange_client(exchange_id, client)
+
+    def call_error_kind(self, exc: Exception) -> str:
+        if isinstance(exc, (ccxt.RateLimitExceeded, ccxt.DDoSProtection)):
+            return CALL_RATE_LIMITED
+        if isinstance(exc, ccxt.NetworkError):
+            return CALL_NETWORK_ERROR
+        return CALL_FAILED
+
+    def tune_exchange_client(self, exchange_id: str, client) -> None:
+        base_rate_limit = self.base_rate_limits.get(exchange_id)
+        if base_rate_limit is None:
+            return
+        rate_limit, timeout = self.scan_engine.client_limits(exchange_id, base_rate_limit)
+        client.rateLimit = rate_limit
+        client.timeout = timeout
+        # Async clients pace requests with a token bucket built from rateLimit.
+        throttler_config = getattr(getattr(client, "throttler", None), "config", None)
+        if isinstance(throttler_config, dict) and rate_limit > 0:
+            throttler_config["refillRate"] = 1.0 / rate_limit
+
+    def _pull_exchange_snapshot(
+        self,
+        exchange_id: str,
+        client: ccxt.Exchange,
+        lock: threading.Lock,
+        symbols: List[str],
+    ) -> Dict[str, dict]:
+        tickers_map: Dict[str, dict] = {}
+        try:
+            batch = self._exchange_call(exchange_id, client, lock, "fetch_tickers")
+            if isinstance(batch, dict):
+                tickers_map = batch
+        except Exception:
+            tickers_map = {}
+
+        if not tickers_map:
+            # Some venues reject an unfiltered fetchTickers, so ask for the
+            # resolved symbols in large chunks instead of one by one.
+            for start in range(0, len(symbols), SNAPSHOT_CHUNK_SIZE):
+                chunk = symbols[start:start + SNAPSHOT_CHUNK_SIZE]
+                try:
+                    batch = self._exchange_call(exchange_id, client, lock, "fetch_tickers", chunk)
+                    if isinstance(batch, dict):
+                        tickers_map.update(batch)
+                except Exception:
+                    continue
+        return tickers_map
+
+    def _fetch_prices_for_exchange(
+        self,
+        exchange_id: str,
+        coins: List[str],
+        preferred_quote: str,
+        snapshot: bool = False,
+    ) -> Tuple[str, Dict[str, ExchangeEntry]]:
+        result = self.empty_exchange_rows(coins)
+        if not self.ensure_exchange_markets(exchange_id):
+            return exchange_id, result
+
+        client = self.exchange_clients.get(exchange_id)
+        lock = self.exchange_locks.get(exchange_id)
+        if client is None or lock is None:
+            return exchange_id, result
+
+        symbol_by_coin, symbols = self.plan_exchange_symbols(exchange_id, coins, preferred_quote)
+        if not symbols:
+            return exchange_id, result
+
+        started = time.monotonic()
+        tickers_map: Dict[str, dict] = {}
+        has_fetch_tickers = bool(client.has.get("fetchTickers")) if hasattr(client, "has") else False
+        missing_symbols = list(symbols)
+
+        if snapshot:
+            if has_fetch_tickers:
+                tickers_map = dict(self._pull_exchange_snapshot(exchange_id, client, lock, symbols))
+            # A full pass never falls back to per-symbol requests: thousands of
+            # fetch_ticker calls would cost more than the rest of the pass.
+            missing_symbols = []
+        elif has_fetch_tickers:
+            try:
+                batch = self._exchange_call(exchange_id, client, lock, "fetch_tickers", symbols)
+                if isinstance(batch, dict):
+                    tickers_map = batch
+                    missing_symbols = [s for s in symbols if s not in tickers_map]
+            except Exception:
+                missing_symbols = list(symbols)
+
+        if missing_symbols:
+            for symbol in missing_symbols:
+                if self.scan_engine.circuit_state(exchange_id) == CIRCUIT_OPEN:
+                    break
+                if self.symbol_known_dead(exchange_id, symbol):
+                    continue
+                try:
+                    ticker = self._exchange_call(exchange_id, client, lock, "fetch_ticker", symbol)
+                except Exception as exc:
+                    if self.call_error_kind(exc) == CALL_FAILED:
+                        self.mark_symbol_dead(exchange_id, symbol)
+                    continue
+                if self._extract_price(ticker) is None:
+                    self.mark_symbol_dead(exchange_id, symbol)
+                tickers_map[symbol] = ticker
+
+        result.update(
+            self.exchange_rows_from_tickers(exchange_id, symbol_by_coin, tickers_map)
+        )
+        if not snapshot:
+            self.scan_engine.record_job(exchange_id, time.monotonic() - started)
+        return exchange_id, result
+
+    def symbol_known_dead(self, exchange_id: str, symbol: str) -> bool:
+        expires = self.dead_symbols.get((exchange_id, symbol))
+        if expires is None:
+            return False
+        if expires > time.monotonic():
+            return True
+        self.dead_symbols.pop((exchange_id, symbol), None)
+        return False
+
+    def mark_symbol_dead(self, exchange_id: str, symbol: str) -> None:
+        # The exchange answered but has no ticker for this symbol (delisted,
+        # halted, bad symbol): stop asking for it one by one for a while.
+        self.dead_symbols[(exchange_id, symbol)] = time.monotonic() + DEAD_SYMBOL_TTL_SECONDS
+
+    def empty_exchange_rows(
+        self,
+        coins: List[str],
+    ) -> Dict[str, ExchangeEntry]:
+        return {coin: (None, "-", None, EMPTY_META, None, None, None) for coin in coins}
+
+    def plan_exchange_symbols(
+        self,
+        exchange_id: str,
+        coins: List[str],
+        preferred_quote: str,
+    ) -> Tuple[Dict[str, Tuple[str, str]], List[str]]:
+        symbol_by_coin: Dict[str, Tuple[str, str]] = {}
+        symbols: List[str] = []
+        for coin in coins:
+            candidates = self._resolve_symbol_candidates(
+                exchange_id,
+                coin,
+                preferred_quote,
+            )
+            if candidates:
+                base_code, symbol = candidates[0]
+                symbol_by_coin[coin] = (base_code, symbol)
+                symbols.append(symbol)
+        return symbol_by_coin, symbols
+
+    def exchange_rows_from_tickers(
+        self,
+        exchange_id: str,
+        symbol_by_coin: Dict[str, Tuple[str, str]],
+        tickers_map: Dict[str, dict],
+    ) -> Dict[str, ExchangeEntry]:
+        quotes = {symbol.split("/")[-1].upper() for _base_code, symbol in symbol_by_coin.values()}
+        self._learn_usd_rates({quote for quote in quotes if not self.is_usd_quote(quote)}, tickers_map)
+        result: Dict[str, ExchangeEntry] = {}
+        reference = self._ticker_age_reference(exchange_id, tickers_map)
+        ages = self.quote_ages.setdefault(exchange_id, {})
+        fresh_ages: List[float] = []
+        stale = 0
+        for coin, (base_code, symbol) in symbol_by_coin.items():
+            ticker = tickers_map.get(symbol)
+            age = self._ticker_age(ticker, reference)
+            if age is not None:
+                ages[coin] = age
+                if age > STALE_TICKER_SECONDS:
+                    # A frozen last price would make a spread that is not there.
+                    stale += 1
+                    ticker = None
+                else:
+                    fresh_ages.append(age)
+            price = self._extract_price(ticker)
+            link, meta = self.symbol_cell(exchange_id, base_code, symbol)
+            volume_usd = self._extract_volume_usd(symbol, ticker, price)
+            bid = self._extract_positive(ticker.get("bid")) if ticker else None
+            ask = self._extract_positive(ticker.get("ask")) if ticker else None
+            result[coin] = (price, symbol, link, meta, volume_usd, bid, ask)
+        if fresh_ages or stale:
+            self.metrics.record_quote_ages(
+                exchange_id,
+                sum(fresh_ages) / len(fresh_ages) if fresh_ages else None,
+                stale,
+            )
+        return result
+
+    def _ticker_age_reference(self, exchange_id: str, tickers_map: Dict[str, dict]) -> Optional[float]:
+        # Local time moved onto the venue clock. The offset is the smallest lag
+        # between local time and the newest ticker of any response in the skew
+        # window: clock skew is constant, while a frozen feed or an illiquid
+        # symbol only adds lag, so the minimum follows the skew and not the
+        # staleness. The bound keeps a venue frozen from the first response
+        # from teaching its own lag as skew.
+        newest = None
+        for ticker in tickers_map.values():
+            timestamp = ticker.get("timestamp") if isinstance(ticker, dict) else None
+            if isinstance(timestamp, (int, float)) and (newest is None or timestamp > newest):
+                newest = timestamp
+        now_ms = time.time() * 1000.0
+        if newest is None:
+            return None
+        lag = now_ms - float(newest)
+        now = time.monotonic()
+        with self.clock_lag_lock:
+            lags = self.clock_lags.get(exchange_id)
+            if lags is None:
+                lags = self.clock_lags[exchange_id] = deque()
+            # Sliding-window minimum: a lag is dropped once a newer one is
+            # no larger, so every update is amortized O(1).
+            while lags and lags[-1][1] >= lag:
+                lags.pop()
+            lags.append((now, lag))
+            while lags[0][0] < now - CLOCK_SKEW_WINDOW_SECONDS:
+                lags.popleft()
+            skew = lags[0][1]
+        bound = MAX_CLOCK_SKEW_SECONDS * 1000.0
+        return now_ms - max(-bound, min(bound, skew))
+
+    def clock_skew(self, exchange_id: str) -> Optional[float]:
+        # Learned venue clock offset in seconds (positive: local clock ahead).
+        with self.clock_lag_lock:
+            lags = self.clock_lags.get(exchange_id)
+            return lags[0][1] / 1000.0 if lags else None
+
+    def _ticker_age(self, ticker: Optional[dict], reference: Optional[float]) -> Optional[float]:
+        if not ticker or reference is None:
+            return None
+        timestamp = ticker.get("timestamp")
+        if not isinstance(timestamp, (int, float)):
+            return None
+        return max(0.0, (reference - timestamp) / 1000.0)
+
+    def quote_age(self, exchange_id: str, coin: str) -> Optional[float]:
+        return self.quote_ages.get(exchange_id, {}).get(coin)
+
+    def build_exchange_link(self, exchange_id: str, symbol: str) -> Optional[str]:
+        try:
+            base, quote = symbol.split("/")
+        except ValueError:
+            return None
+
+        base_u, quote_u = base.upper(), quote.upper()
+        base_l, quote_l = base.lower(), quote.lower()
+
+        templates = {
+            "binance": f"https://www.binance.com/en/trade/{base_u}_{quote_u}",
+            "bybit": f"https://www.bybit.com/trade/spot/{base_u}/{quote_u}",
+            "coinbase": f"https://www.coinbase.com/advanced-trade/spot/{base_u}-{quote_u}",
+            "okx": f"https://www.okx.com/trade-spot/{base_l}-{quote_l}",
+            "kraken": f"https://pro.kraken.com/app/trade/{base_l}-{quote_l}",
+            "gateio": f"https://www.gate.io/trade/{base_u}_{quote_u}",
+            "mexc": f"https://www.mexc.com/exchange/{base_u}_{quote_u}",
+            "bitget": f"https://www.bitget.com/spot/{base_u}{quote_u}",
+            "htx": f"https://www.htx.com/trade/{base_l}_{quote_l}",
+            "upbit": f"https://upbit.com/exchange?code=CRIX.UPBIT.{quote_u}-{base_u}",
+            "kucoin": f"https://www.kucoin.com/trade/{base_u}-{quote_u}",
+            "bingx": f"https://bingx.com/en/spot/{base_u}{quote_u}/",
+            "cryptocom": f"https://crypto.com/exchange/trade/spot/{base_u}_{quote_u}",
+            "bitmart": f"https://www.bitmart.com/trade/en-US?symbol={base_u}_{quote_u}",
+            "lbank": f"https://www.lbank.com/trade/{base_l}_{quote_l}/",
+            "whitebit": f"https://whitebit.com/trade/{base_u}-{quote_u}",
+            "poloniex": f"https://poloniex.com/trade/{base_u}_{quote_u}/?type=spot",
+            "bitstamp": f"https://www.bitstamp.net/trade/{base_l}/{quote_l}/",
+            "coinex": f"https://www.coinex.com/exchange/{base_l}-{quote_l}",
+            "btse": f"https://www.btse.com/en/trading/{base_u}-{quote_u}",
+            "bitfinex": f"https://trading.bitfinex.com/t/{base_u}:{quote_u}?type=exchange",
+        }
+        return templates.get(exchange_id)
+
+    def collect_rows(
+        self,
+        coins: List[str],
+        selected_exchanges: List[str],
+        preferred_quote: str,
+        snapshot: bool = False,
+        executable: bool = False,
+    ) -> MatrixRows:
+        cycle_started = time.perf_counter()
+        with self.spread_lock:
+            matrix = self.price_matrix
+            if (
+                matrix is None
+                or matrix.exchanges != selected_exchanges
+                or matrix.executable != executable
+                or self.spread_notional != self.trade_notional_usd
+            ):
+                self.price_matrix = PriceMatrix(selected_exchanges, executable)
+                self.spread_notional = self.trade_notional_usd
+                self.spread_rows = {}
+
+        stage_started = time.perf_counter()
+        if self._market_source() is None:
+            # Under PROCESSES a shard prices the stale quotes with its own
+            # clients, see ShardedScanBackend.collect.
+            self.refresh_usd_rates(self.usd_quotes_in_use(preferred_quote), selected_exchanges)
+        fetch_started = time.perf_counter()
+        self.metrics.record_stage(STAGE_USD_RATES, fetch_started - stage_started)
+        merge_time = 0.0
+        for exchange_id, exchange_rows in self._fetch_exchange_results(
+            coins,
+            selected_exchanges,
+            preferred_quote,
+            snapshot,
+        ):
+            merge_started = time.perf_counter()
+            with self.spread_lock:
+                self._merge_exchange_rows(exchange_id, exchange_rows)
+            merge_time += time.perf_counter() - merge_started
+        stage_started = time.perf_counter()
+        self.metrics.record_stage(STAGE_FETCH, stage_started - fetch_started - merge_time)
+        self.metrics.record_stage(STAGE_MERGE, merge_time)
+
+        with self.spread_lock:
+            matrix = self.price_matrix
+            dirty = matrix.take_dirty()
+            for row_idx in dirty:
+                matrix.clear_result(row_idx)
+            for best in matrix.best(dirty):
+                self._resolve_matrix_route(matrix, best)
+            for row_idx in dirty:
+                self.spread_rows.pop(matrix.coins[row_idx], None)
+        rows = MatrixRows(self, matrix, coins)
+        finished = time.perf_counter()
+        self.metrics.record_stage(STAGE_SPREAD, finished - stage_started)
+        self.metrics.record_stage(STAGE_CYCLE, finished - cycle_started)
+        return rows
+
+    def _merge_exchange_rows(self, exchange_id: str, exchange_rows: Dict[str, ExchangeEntry]) -> None:
+        matrix = self.price_matrix
+        for coin, (price, symbol, link, meta, volume_usd, bid, ask) in exchange_rows.items():
+            matrix.set_quote(coin, exchange_id, price, symbol, link, meta, volume_usd, bid, ask)
+
+    def _resolve_matrix_route(self, matrix: PriceMatrix, best: BestQuote) -> None:
+        row_idx, min_col, min_price, max_col, _max_price, spread = best
+        min_ex = matrix.exchanges[min_col]
+        max_ex = matrix.exchanges[max_col]
+        buy_meta = matrix.cell_at(row_idx, min_col)[1]
+        sell_meta = matrix.cell_at(row_idx, max_col)[1]
+        source_code = str(buy_meta.get("base_code", "")).upper().strip()
+        target_code = str(sell_meta.get("base_code", "")).upper().strip()
+        if not source_code or source_code != target_code:
+            return
+        transfer = self._find_transfer_route(source_code, min_ex, max_ex)
+        if transfer is None:
+            return
+        route, withdraw_fee = transfer
+        net_spread = self._net_spread_value(
+            min_ex,
+            matrix.symbol_at(row_idx, min_col) or "-",
+            min_price,
+            (buy_meta.get("taker") or 0.0) + (sell_meta.get("taker") or 0.0),
+            spread,
+            withdraw_fee,
+        )
+        matrix.set_result(best, route, withdraw_fee, net_spread)
+
+    def matrix_row(self, matrix: PriceMatrix, coin: str) -> Dict[str, object]:
+        with self.spread_lock:
+            current = matrix is self.price_matrix
+            row = self.spread_rows.get(coin) if current else None
+            if row is None:
+                row_idx = matrix.coin_index.get(coin)
+                row = self.new_row(matrix.exchanges) if row_idx is None else self._materialize_row(matrix, row_idx)
+                if current:
+                    self.spread_rows[coin] = row
+            return row
+
+    def _materialize_row(self, matrix: PriceMatrix, row_idx: int) -> Dict[str, object]:
+        row = self.new_row(matrix.exchanges)
+        for col, exchange_id in enumerate(matrix.exchanges):
+            price, bid, ask, volume_usd = matrix.quote_at(row_idx, col)
+            link, meta = matrix.cell_at(row_idx, col)
+            symbol = matrix.symbol_at(row_idx, col) or "-"
+            self.merge_exchange_entry(row, exchange_id, (price, symbol, link, meta, volume_usd, bid, ask))
+        row.update(matrix.result_at(row_idx))
+        return row
+
+    def new_row(self, selected_exchanges: List[str]) -> Dict[str, object]:
+        return {
+            "pair": "-",
+            "prices": {exchange_id: None for exchange_id in selected_exchanges},
+            "symbols": {exchange_id: "-" for exchange_id in selected_exchanges},
+            "links": {exchange_id: None for exchange_id in selected_exchanges},
+            "volumes": {exchange_id: None for exchange_id in selected_exchanges},
+            "asset_meta": {exchange_id: {} for exchange_id in selected_exchanges},
+            "bids": {exchange_id: None for exchange_id in selected_exchanges},
+            "asks": {exchange_id: None for exchange_id in selected_exchanges},
+            "spread": None,
+            "min_ex": None,
+            "max_ex": None,
+            "buy_price": None,
+            "sell_price": None,
+            "depth_spread": None,
+            "depth_status": None,
+            "slippage": None,
+            "withdraw_fee": None,
+            "net_spread": None,
+            "route": "N/A",
+            "tx": "NO",
+            "min_volume_usd": None,
+            "max_volume_usd": None,
+        }
+
+    def merge_exchange_entry(
+        self,
+        row: Dict[str, object],
+        exchange_id: str,
+        entry: ExchangeEntry,
+    ) -> None:
+        price, symbol, link, meta, volume_usd, bid, ask = entry
+        row["prices"][exchange_id] = price
+        row["symbols"][exchange_id] = symbol
+        row["links"][exchange_id] = link
+        row["volumes"][exchange_id] = volume_usd
+        row["asset_meta"][exchange_id] = meta
+        row["bids"][exchange_id] = bid
+        row["asks"][exchange_id] = ask
+        if symbol != "-" and row["pair"] == "-":
+            row["pair"] = symbol
+
+    def _best_prices(
+        self,
+        row: Dict[str, object],
+        selected_exchanges: List[str],
+        executable: bool = False,
+    ) -> Optional[Tuple[str, float, str, float]]:
+        # Executable pricing buys at the ask and sells at the bid, and needs
+        # both sides quoted on a venue for it to take part.
+        buy_key, sell_key = ("asks", "bids") if executable else ("prices", "prices")
+        buy_prices = row[buy_key]
+        sell_prices = row[sell_key]
+        valid_exchanges = [
+            ex_id
+            for ex_id in selected_exchanges
+            if isinstance(buy_prices[ex_id], float) and isinstance(sell_prices[ex_id], float)
+        ]
+        if len(valid_exchanges) < 2:
+            return None
+
+        min_ex = min(valid_exchanges, key=lambda ex_id: buy_prices[ex_id])
+        max_ex = max(valid_exchanges, key=lambda ex_id: sell_prices[ex_id])
+        return min_ex, buy_prices[min_ex], max_ex, sell_prices[max_ex]
+
+    def compute_row_spread(
+        self,
+        row: Dict[str, object],
+        selected_exchanges: List[str],
+        best: Optional[Tuple[str, float, str, float]] = None,
+        executable: bool = False,
+    ) -> None:
+        row["spread"] = None
+        row["min_ex"] = None
+        row["max_ex"] = None
+        row["buy_price"] = None
+        row["sell_price"] = None
+        row["route"] = "N/A"
+        row["tx"] = "NO"
+        row["min_volume_usd"] = None
+        row["max_volume_usd"] = None
+        row["depth_spread"] = None
+        row["depth_status"] = None
+        row["slippage"] = None
+        row["withdraw_fee"] = None
+        row["net_spread"] = None
+
+        if best is None:
+            best = self._best_prices(row, selected_exchanges, executable)
+        if best is None:
+            return
+
+        min_ex, min_price, max_ex, max_price = best
+        if max_price <= min_price:
+            return
+
+        source_code = str(row["asset_meta"].get(min_ex, {}).get("base_code", "")).upper().strip()
+        target_code = str(row["asset_meta"].get(max_ex, {}).get("base_code", "")).upper().strip()
+        if not source_code or source_code != target_code:
+            return
+        transfer = self._find_transfer_route(source_code, min_ex, max_ex)
+        if transfer is None:
+            return
+        route, withdraw_fee = transfer
+
+        spread = ((max_price - min_price) / min_price * 100.0) if min_price > 0 else None
+        if spread is None:
+            return
+
+        row["min_ex"] = min_ex
+        row["max_ex"] = max_ex
+        row["buy_price"] = min_price
+        row["sell_price"] = max_price
+        row["spread"] = spread
+        row["route"] = route
+        row["tx"] = "GOOO" if route != "UNVERIFIED" else "YES"
+        row["min_volume_usd"] = row["volumes"].get(min_ex)
+        row["max_volume_usd"] = row["volumes"].get(max_ex)
+        row["withdraw_fee"] = withdraw_fee
+        row["net_spread"] = self._net_spread(row, min_ex, max_ex, spread, withdraw_fee)
+
+    def _net_spread(
+        self,
+        row: Dict[str, object],
+        min_ex: str,
+        max_ex: str,
+        spread: float,
+        withdraw_fee: Optional[float],
+    ) -> Optional[float]:
+        taker_buy = row["asset_meta"].get(min_ex, {}).get("taker") or 0.0
+        taker_sell = row["asset_meta"].get(max_ex, {}).get("taker") or 0.0
+        return self._net_spread_value(
+            min_ex,
+            str(row["symbols"].get(min_ex, "-")),
+            row.get("buy_price"),
+            taker_buy + taker_sell,
+            spread,
+            withdraw_fee,
+        )
+
+    def _net_spread_value(
+        self,
+        min_ex: str,
+        buy_symbol: str,
+        buy_price: Optional[float],
+        takers: float,
+        spread: float,
+        withdraw_fee: Optional[float],
+    ) -> Optional[float]:
+        # Gross spread minus both taker fees and the withdrawal fee spread over
+        # the configured trade size.
+        net = spread - takers * 100.0
+        if not withdraw_fee:
+            return net
+
+        quote = buy_symbol.split("/")[-1].upper()
+        rate = self.usd_rate(quote)
+        if rate is None or not isinstance(buy_price, float):
+            return None
+        return net - withdraw_fee * buy_price * rate / self.trade_notional_usd * 100.0
+
+    def _fetch_exchange_results(
+        self,
+        coins: List[str],
+        selected_exchanges: List[str],
+        preferred_quote: str,
+        snapshot: bool,
+    ) -> Iterator[Tuple[str, Dict[str, ExchangeEntry]]]:
+        if self.scan_backend == "ASYNC" and self.async_backend is not None:
+            yield from self.async_backend.collect(coins, selected_exchanges, preferred_quote, snapshot)
+            return
+        if self.scan_backend == "PROCESSES" and self.process_backend is not None:
+            yield from self.process_backend.collect(coins, selected_exchanges, preferred_quote, snapshot)
+            return
+
+        # Late results from fetches of this batch that missed an earlier
+        # deadline go first; finished ones of other batches are dropped.
+        batch = batch_key(coins)
+        late_results: List[Future] = []
+        with self.pending_lock:
+            for key, future in list(self.pending_fetches.items()):
+                if future.done():
+                    del self.pending_fetches[key]
+                    if key[1] == batch:
+                        late_results.append(future)
+            in_flight = {exchange_id for exchange_id, key_batch in self.pending_fetches if key_batch == batch}
+        for future in late_results:
+            try:
+                yield future.result()
+            except Exception:
+                continue
+
+        tasks: Dict[Future, str] = {}
+        for exchange_id in selected_exchanges:
+            if exchange_id not in self.exchange_clients or exchange_id in in_flight:
+                continue
+            if not self.scan_engine.allow_exchange(exchange_id):
+                yield exchange_id, self.empty_exchange_rows(coins)
+                continue
+            future = self.scan_engine.submit_exchange(
+                exchange_id,
+                self._fetch_prices_for_exchange,
+                exchange_id,
+                coins,
+                preferred_quote,
+                snapshot,
+            )
+            tasks[future] = exchange_id
+
+        # A full snapshot pass waits for every venue; regular cycles stop at
+        # the deadline and leave stragglers running for the next one.
+        deadline = None if snapshot else self.scan_engine.scan_deadline(selected_exchanges)
+        finished: Set[Future] = set()
+        try:
+            for future in as_completed(tasks, timeout=deadline):
+                finished.add(future)
+                yield future.result()
+        except FutureTimeoutError:
+            late: List[str] = []
+            for future, exchange_id in tasks.items():
+                if future in finished:
+                    continue
+                if future.done():
+                    yield future.result()
+                else:
+                    with self.pending_lock:
+                        self.pending_fetches[(exchange_id, batch)] = future
+                    late.append(exchange_id)
+            self.log_late_exchanges(late, deadline)
+
+    def _log_circuit_change(self, exchange_id: str, state: str) -> None:
+        name = self.exchange_name_by_id.get(exchange_id, exchange_id)
+        if state == CIRCUIT_OPEN:
+            self.log(f"{name}: временно отключена после ошибок сети, повторная проверка по таймеру.")
+        elif state == CIRCUIT_HALF_OPEN:
+            self.log(f"{name}: пробный запрос после паузы.")
+        else:
+            self.log(f"{name}: снова доступна.")
+
+    def log_late_exchanges(self, exchange_ids: List[str], deadline: Optional[float]) -> None:
+        if not exchange_ids or deadline is None:
+            return
+        names = ", ".join(self.exchange_name_by_id.get(exchange_id, exchange_id) for exchange_id in exchange_ids)
+        self.log(f"Не успели за {deadline:.1f} c: {names}. Данные подтянутся в следующем цикле.")
+
+    def _find_transfer_route(
+        self,
+        base_code: str,
+        source_ex: str,
+        target_ex: str,
+    ) -> Optional[Tuple[str, Optional[float]]]:
+        pair_routes = self.route_index.get((source_ex, target_ex))
+        if pair_routes is not None and base_code in pair_routes:
+            return pair_routes[base_code]
+
+        with self.route_index_lock:
+            source = self.exchange_route_networks.get(source_ex, {}).get(base_code)
+            target = self.exchange_route_networks.get(target_ex, {}).get(base_code)
+            route: Optional[Tuple[str, Optional[float]]] = None
+            if source is None and target is None:
+                route = ("UNVERIFIED", None)
+            elif source is not None and target is not None:
+                # Withdrawable networks are sorted by fee, so the first one the
+                # target accepts is the cheapest valid route.
+                depositable = target[1]
+                for key, display, fee in source[0]:
+                    if key in depositable:
+                        route = (display, fee)
+                        break
+            self.route_index.setdefault((source_ex, target_ex), {})[base_code] = route
+        return route
+
+    def apply_filters(
+        self,
+        rows: Dict[str, Dict[str, object]],
+        coins: List[str],
+        min_spread: float,
+        sort_by_spread: bool,
+        top_n_raw: str,
+        verified_only: bool,
+        good_volume_only: bool,
+        min_volume_usd: float,
+        net_only: bool = False,
+    ) -> List[Tuple[str, Dict[str, object]]]:
+        started = time.perf_counter()
+        items = self._apply_filters(
+            rows,
+            coins,
+            min_spread,
+            sort_by_spread,
+            top_n_raw,
+            verified_only,
+            good_volume_only,
+            min_volume_usd,
+            net_only,
+        )
+        self.metrics.record_stage(STAGE_FILTERS, time.perf_counter() - started)
+        return items
+
+    def _apply_filters(
+        self,
+        rows: Dict[str, Dict[str, object]],
+        coins: List[str],
+        min_spread: float,
+        sort_by_spread: bool,
+        top_n_raw: str,
+        verified_only: bool,
+        good_volume_only: bool,
+        min_volume_usd: float,
+        net_only: bool,
+    ) -> List[Tuple[str, Dict[str, object]]]:
+        limit = self._parse_top_n(top_n_raw)
+        matrix = rows.matrix if isinstance(rows, MatrixRows) else None
+        if matrix is not None:
+            with self.spread_lock:
+                row_indices = [
+                    matrix.coin_index[coin]
+                    for coin in coins
+                    if coin not in self.blacklist and coin in matrix.coin_index
+                ]
+                ranked_rows = matrix.rank(
+                    row_indices,
+                    min_spread,
+                    net_only,
+                    verified_only,
+                    min_volume_usd if good_volume_only else None,
+                    sort_by_spread,
+                    limit,
+                )
+                ranked = [matrix.coins[row_idx] for row_idx in ranked_rows]
+            # Nested rows are built outside the lock and only for ranked coins.
+            return [(coin, rows[coin]) for coin in ranked]
+
+        spread_key = "net_spread" if net_only else "spread"
+        items: List[Tuple[str, Dict[str, object]]] = []
+        for coin in coins:
+            if coin in self.blacklist:
+                continue
+            row = rows[coin]
+            # Written as "not >=" so NaN drops out, as in PriceMatrix.rank.
+            spread = row.get("spread")
+            if not isinstance(spread, float) or not spread <= 99:
+                continue
+            ranked = row.get(spread_key)
+            if not isinstance(ranked, float) or not ranked >= min_spread:
+                continue
+            if verified_only and row.get("tx") not in {"YES", "GOOO"}:
+                continue
+            if good_volume_only:
+                buy_volume = row.get("min_volume_usd")
+                sell_volume = row.get("max_volume_usd")
+                if not isinstance(buy_volume, float) or not isinstance(sell_volume, float):
+                    continue
+                if not (buy_volume >= min_volume_usd and sell_volume >= min_volume_usd):
+                    continue
+            items.append((coin, row))
+
+        if sort_by_spread:
+            if limit is not None and limit < len(items):
+                return heapq.nlargest(limit, items, key=lambda x: x[1][spread_key])
+            items.sort(key=lambda x: x[1][spread_key], reverse=True)
+        return items[:limit] if limit is not None else items
+
+    def _parse_top_n(self, top_n_raw: str) -> Optional[int]:
+        if top_n_raw == "ALL":
+            return None
+        try:
+            n = int(top_n_raw)
+        except ValueError:
+            return None
+        return n if n > 0 else None
+
+    def apply_order_book_depth(
+        self,
+        items: List[Tuple[str, Dict[str, object]]],
+        notional_usd: float,
+    ) -> List[Tuple[str, Dict[str, object]]]:
+        started = time.perf_counter()
+        items = self._apply_order_book_depth(items, notional_usd)
+        self.metrics.record_stage(STAGE_DEPTH, time.perf_counter() - started)
+        return items
+
+    def _apply_order_book_depth(
+        self,
+        items: List[Tuple[str, Dict[str, object]]],
+        notional_usd: float,
+    ) -> List[Tuple[str, Dict[str, object]]]:
+        # Only the shortlist pays for order books: one batched request per
+        # exchange, with books reused for ORDERBOOK_CACHE_TTL_SECONDS.
+        shortlist = [
+            (idx, coin, row)
+            for idx, (coin, row) in enumerate(items[:DEPTH_SHORTLIST_SIZE])
+            if row.get("min_ex") and row.get("max_ex")
+        ]
+        wanted: Dict[str, List[str]] = {}
+        for _idx, _coin, row in shortlist:
+            for exchange_id in (row["min_ex"], row["max_ex"]):
+                symbol = row["symbols"].get(exchange_id)
+                if symbol and symbol != "-" and symbol not in wanted.setdefault(exchange_id, []):
+                    wanted[exchange_id].append(symbol)
+
+        books: Dict[Tuple[str, str], dict] = {}
+        tasks = {
+            self.scan_engine.submit_exchange(exchange_id, self._fetch_order_books, exchange_id, symbols): exchange_id
+            for exchange_id, symbols in wanted.items()
+        }
+        for future in as_completed(tasks):
+            try:
+                books.update(future.result())
+            except Exception:
+                continue
+
+        result = list(items)
+        for idx, coin, row in shortlist:
+            depth = self._depth_fill(row, books, notional_usd)
+            if depth is None:
+                continue
+            row = self.copy_row(row)
+            row.update(depth)
+            result[idx] = (coin, row)
+        return result
+
+    def _fetch_order_books(self, exchange_id: str, symbols: List[str]) -> Dict[Tuple[str, str], dict]:
+        now = time.monotonic()
+        books: Dict[Tuple[str, str], dict] = {}
+        missing: List[str] = []
+        with self.order_book_lock:
+            for symbol in symbols:
+                cached = self.order_book_cache.get((exchange_id, symbol))
+                if cached is not None and now - cached[0] < ORDERBOOK_CACHE_TTL_SECONDS:
+                    books[(exchange_id, symbol)] = cached[1]
+                else:
+                    missing.append(symbol)
+        if not missing:
+            return books
+
+        client = self.exchange_clients.get(exchange_id)
+        lock = self.exchange_locks.get(exchange_id)
+        if client is None or lock is None:
+            return books
+
+        fetched: Dict[str, dict] = {}
+        if client.has.get("fetchOrderBooks"):
+            try:
+                batch = self._exchange_call(exchange_id, client, lock, "fetch_order_books", missing, ORDERBOOK_DEPTH_LIMIT)
+                if isinstance(batch, dict):
+                    fetched.update({symbol: book for symbol, book in batch.items() if symbol in missing})
+            except Exception:
+                fetched = {}
+        for symbol in missing:
+            if symbol in fetched:
+                continue
+            try:
+                fetched[symbol] = self._exchange_call(
+                    exchange_id, client, lock, "fetch_order_book", symbol, ORDERBOOK_DEPTH_LIMIT
+                )
+            except Exception:
+                continue
+
+        stamp = time.monotonic()
+        with self.order_book_lock:
+            for symbol, book in fetched.items():
+                if isinstance(book, dict):
+                    self.order_book_cache[(exchange_id, symbol)] = (stamp, book)
+                    books[(exchange_id, symbol)] = book
+        return books
+
+    def _depth_fill(
+        self,
+        row: Dict[str, object],
+        books: Dict[Tuple[str, str], dict],
+        notional_usd: float,
+    ) -> Optional[Dict[str, object]]:
+        min_ex = str(row["min_ex"])
+        max_ex = str(row["max_ex"])
+        buy_symbol = str(row["symbols"].get(min_ex, "-"))
+        sell_symbol = str(row["symbols"].get(max_ex, "-"))
+        buy_book = books.get((min_ex, buy_symbol))
+        sell_book = books.get((max_ex, sell_symbol))
+        if not buy_book or not sell_book:
+            return None
+        asks = buy_book.get("asks") or []
+        bids = sell_book.get("bids") or []
+        if not asks or not bids:
+            return None
+
+        buy_usd = self.usd_rate(buy_symbol.split("/")[-1])
+        sell_usd = self.usd_rate(sell_symbol.split("/")[-1])
+        best_ask = self._extract_positive(asks[0][0])
+        best_bid = self._extract_positive(bids[0][0])
+        if buy_usd is None or sell_usd is None or best_ask is None or best_bid is None:
+            return None
+
+        amount = notional_usd / (best_ask * buy_usd)
+        buy_fill = self._walk_book(asks, amount)
+        sell_fill = self._walk_book(bids, amount)
+        if buy_fill is None or sell_fill is None:
+            return {"depth_spread": None, "depth_status": "THIN", "slippage": None}
+
+        buy_cost = buy_fill * buy_usd
+        sell_proceeds = sell_fill * sell_usd
+        slippage = ((buy_fill - best_ask) / best_ask + (best_bid - sell_fill) / best_bid) * 100.0
+        return {
+            "depth_spread": (sell_proceeds - buy_cost) / buy_cost * 100.0,
+            "depth_status": "OK",
+            "slippage": slippage,
+        }
+
+    def _walk_book(self, levels: List[list], amount: float) -> Optional[float]:
+        remaining = amount
+        cost = 0.0
+        for level in levels:
+            if len(level) < 2:
+                continue
+            price = self._extract_positive(level[0])
+            size = self._extract_positive(level[1])
+            if price is None or size is None:
+                continue
+            take = min(remaining, size)
+            cost += take * price
+            remaining -= take
+            if remaining <= amount * 1e-9:
+                return cost / amount
+        return None
+
+    def copy_row(self, row: Dict[str, object]) -> Dict[str, object]:
+        copied = dict(row)
+        for key, value in row.items():
+            if isinstance(value, dict):
+                copied[key] = dict(value)
+        return copied
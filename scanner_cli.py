@@ -0,0 +1,243 @@
+import argparse
+import json
+import multiprocessing
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from license_core import format_license_summary, load_saved_license_code, verify_license_code
+from metrics import write_metrics_file
+from record_replay import Recorder, Replay, recording_client_factory, replay_client_factory
+from scanner import (
+    DEFAULT_TRADE_NOTIONAL_USD,
+    EXCHANGES,
+    POPULAR_START_COUNT,
+    SCAN_BACKENDS,
+    ArbitrageScanner,
+    create_exchange_client,
+)
+from spread_history import SpreadHistory
+from universe_cache import load_scan_state, save_scan_state
+from universe_scheduler import UniverseScheduler
+
+
+CLI_SCAN_MODES = ["AUTO", "MANUAL", "SNAPSHOT"]
+DEFAULT_BATCH_SIZE = 50
+
+
+def _parse_list(value: str) -> List[str]:
+    items: List[str] = []
+    for part in value.replace(";", ",").replace(" ", ",").split(","):
+        item = part.strip()
+        if item and item not in items:
+            items.append(item)
+    return items
+
+
+def _require_license() -> Dict[str, str]:
+    code = load_saved_license_code()
+    if not code:
+        raise SystemExit("Лицензия не найдена. Активируй приложение или положи license.json рядом со скриптом.")
+    payload, error = verify_license_code(code)
+    if payload is None:
+        raise SystemExit(f"Лицензия недействительна: {error}")
+    return payload
+
+
+def _log_to_stderr(message: str) -> None:
+    timestamp = datetime.now().strftime("%H:%M:%S")
+    print(f"[{timestamp}] {message}", file=sys.stderr, flush=True)
+
+
+def _row_record(coin: str, row: Dict[str, object]) -> dict:
+    min_ex = row.get("min_ex")
+    max_ex = row.get("max_ex")
+    return {
+        "coin": coin,
+        "pair": row.get("pair"),
+        "buy_exchange": min_ex,
+        "sell_exchange": max_ex,
+        "buy_price": row.get("buy_price"),
+        "sell_price": row.get("sell_price"),
+        "spread": row.get("spread"),
+        "net_spread": row.get("net_spread"),
+        "depth_spread": row.get("depth_spread"),
+        "route": row.get("route"),
+        "tx": row.get("tx"),
+        "buy_volume_usd": row.get("min_volume_usd"),
+        "sell_volume_usd": row.get("max_volume_usd"),
+    }
+
+
+def _format_number(value: Optional[float], suffix: str = "") -> str:
+    return "N/A" if value is None else f"{value:.2f}{suffix}"
+
+
+def _print_items(items: List[Tuple[str, Dict[str, object]]], as_json: bool) -> None:
+    stamp = datetime.now().replace(microsecond=0).isoformat()
+    if as_json:
+        for coin, row in items:
+            record = _row_record(coin, row)
+            record["time"] = stamp
+            print(json.dumps(record, ensure_ascii=False), flush=True)
+        return
+
+    print(f"--- {stamp} | строк: {len(items)}")
+    for coin, row in items:
+        print(
+            f"{coin:<10} {str(row.get('min_ex')):>10} -> {str(row.get('max_ex')):<10} "
+            f"{_format_number(row.get('spread'), '%'):>8} net {_format_number(row.get('net_spread'), '%'):>8} "
+            f"{row.get('tx')}/{row.get('route')}"
+        )
+    sys.stdout.flush()
+
+
+def run(args: argparse.Namespace) -> None:
+    exchanges = EXCHANGES
+    if args.exchanges:
+        wanted = {item.lower() for item in _parse_list(args.exchanges)}
+        exchanges = [(exchange_id, name) for exchange_id, name in EXCHANGES if exchange_id in wanted]
+        if not exchanges:
+            raise SystemExit("Ни одна из указанных бирж не поддерживается.")
+
+    client_factory = None
+    recorder: Optional[Recorder] = None
+    if args.replay:
+        replay = Replay(Path(args.replay), args.replay_speed)
+        client_factory = replay_client_factory(replay)
+        if not args.exchanges:
+            exchanges = [(exchange_id, name) for exchange_id, name in EXCHANGES if exchange_id in replay.clients]
+    elif args.record:
+        recorder = Recorder(Path(args.record))
+        client_factory = recording_client_factory(recorder, create_exchange_client)
+
+    history = SpreadHistory(Path(args.history)) if args.history else None
+    scanner = ArbitrageScanner(
+        exchanges=exchanges,
+        log=_log_to_stderr if not args.quiet else lambda _m: None,
+        client_factory=client_factory,
+    )
+    scanner.blacklist = {coin.upper() for coin in _parse_list(args.blacklist)}
+    scanner.trade_notional_usd = args.notional
+    scanner.set_backend(args.backend)
+    scheduler: Optional[UniverseScheduler] = None
+    try:
+        ok = scanner.init_exchanges()
+        if ok < 2:
+            raise SystemExit("Нужно минимум 2 доступные биржи.")
+        selected = [exchange_id for exchange_id, _ in exchanges if scanner.exchange_available.get(exchange_id)]
+
+        mode = args.mode
+        coins = [coin.upper() for coin in _parse_list(args.coins)]
+        if mode in {"AUTO", "SNAPSHOT"}:
+            universe, fresh = scanner.cached_universe()
+            if fresh:
+                scanner.load_all_markets()
+            else:
+                universe = scanner.fetch_universe()
+            if not universe:
+                raise SystemExit("Не удалось загрузить universe монет.")
+            scanner.log(f"Universe: {len(universe)} монет.")
+            if mode == "AUTO":
+                scheduler = UniverseScheduler(scanner, POPULAR_START_COUNT)
+                scheduler.set_universe(universe)
+                scheduler.set_exchanges(selected)
+                state = load_scan_state()
+                if state is not None:
+                    scheduler.restore_state(state)
+            if mode == "SNAPSHOT":
+                coins = universe
+        elif not coins:
+            raise SystemExit("Для MANUAL укажи --coins.")
+
+        filter_settings = (
+            args.min_spread,
+            True,
+            str(args.top) if args.top > 0 else "ALL",
+            args.verified_only,
+            args.good_volume,
+            args.min_volume_k * 1000.0,
+            args.net,
+        )
+        cycle = 0
+        while True:
+            started = time.monotonic()
+            batch = scheduler.next_batch(max(1, args.batch), scanner.blacklist) if scheduler is not None else coins
+            rows = scanner.collect_rows(batch, selected, args.quote, mode == "SNAPSHOT", args.executable)
+            summaries = rows.summaries()
+            if scheduler is not None:
+                scheduler.observe(summaries)
+            if history is not None:
+                history.append(summaries)
+            items = scanner.apply_filters(rows, batch, *filter_settings)
+            if args.depth:
+                items = scanner.apply_order_book_depth(items, args.notional)
+            _print_items(items, args.json)
+            if args.metrics:
+                write_metrics_file(scanner.metrics_snapshot(), Path(args.metrics))
+
+            cycle += 1
+            if args.interval <= 0 or (args.cycles and cycle >= args.cycles):
+                break
+            time.sleep(max(0.0, args.interval - (time.monotonic() - started)))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if scheduler is not None:
+            try:
+                save_scan_state(scheduler.export_state())
+            except Exception as exc:
+                scanner.log(f"Не удалось сохранить позицию сканирования: {exc}")
+        scanner.close()
+        if recorder is not None:
+            recorder.close()
+        if history is not None:
+            history.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Headless arbitrage scanner (без GUI)")
+    parser.add_argument("--mode", choices=CLI_SCAN_MODES, default="MANUAL", help="Режим сканирования")
+    parser.add_argument("--coins", default="", help="Монеты для MANUAL, через запятую")
+    parser.add_argument("--exchanges", default="", help="ID бирж через запятую (по умолчанию все)")
+    parser.add_argument("--quote", default="USDT", help="Предпочтительная котируемая валюта")
+    parser.add_argument("--backend", choices=SCAN_BACKENDS, default="THREADS", help="Движок сканирования (PROCESSES — по процессу на группу бирж)")
+    parser.add_argument("--batch", type=int, default=DEFAULT_BATCH_SIZE, help="Размер пакета монет в AUTO")
+    parser.add_argument("--interval", type=float, default=0, help="Секунд между циклами (0 = один проход)")
+    parser.add_argument("--cycles", type=int, default=0, help="Остановиться после N циклов (0 = бесконечно)")
+    parser.add_argument("--top", type=int, default=50, help="Сколько строк выводить (0 = все)")
+    parser.add_argument("--min-spread", type=float, default=0.0, help="Мин. %% разницы")
+    parser.add_argument("--min-volume-k", type=float, default=1.0, help="Мин. объём в тыс.$ для --good-volume")
+    parser.add_argument("--verified-only", action="store_true", help="Только проверенные (YES/GOOO)")
+    parser.add_argument("--good-volume", action="store_true", help="Только с хорошим объёмом на обеих биржах")
+    parser.add_argument("--net", action="store_true", help="Фильтр и сортировка по чистому спреду")
+    parser.add_argument("--executable", action="store_true", help="Исполнимый спред (ask/bid)")
+    parser.add_argument("--depth", action="store_true", help="Проверять глубину стакана для лучших строк")
+    parser.add_argument("--notional", type=float, default=DEFAULT_TRADE_NOTIONAL_USD, help="Сумма сделки в $")
+    parser.add_argument("--blacklist", default="", help="Исключить монеты, через запятую")
+    parser.add_argument("--json", action="store_true", help="Выводить строки в формате JSON Lines")
+    parser.add_argument("--quiet", action="store_true", help="Не писать лог в stderr")
+    parser.add_argument("--record", default="", help="Записывать ответы бирж в файл")
+    parser.add_argument("--replay", default="", help="Воспроизводить ответы бирж из записи вместо сети")
+    parser.add_argument("--replay-speed", type=float, default=1.0, help="Скорость воспроизведения (0 = без задержек)")
+    parser.add_argument("--history", default="", help="Писать спреды каждого цикла в SQLite-файл истории")
+    parser.add_argument("--metrics", default="", help="JSON-файл метрик, перезаписывается после каждого цикла")
+    args = parser.parse_args()
+
+    if args.notional <= 0:
+        parser.error("--notional должен быть больше 0")
+    if args.record and args.replay:
+        parser.error("--record и --replay нельзя использовать вместе")
+    if args.replay_speed < 0:
+        parser.error("--replay-speed не может быть отрицательным")
+    license_info = _require_license()
+    if not args.quiet:
+        _log_to_stderr(format_license_summary(license_info))
+    run(args)
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    main()
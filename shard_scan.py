@@ -0,0 +1,170 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from typing import TYPE_CHECKING, Dict, Iterator, List, Optional, Tuple
+
+if TYPE_CHECKING:
+    from scanner import ArbitrageScanner, ExchangeEntry
+
+
+PROCESS_SHARD_LIMIT = 4
+
+# coin, base code, price, symbol, 24h volume in USD, best bid, best ask
+CompactEntry = Tuple[str, str, Optional[float], str, Optional[float], Optional[float], Optional[float]]
+# exchange, compact rows, quote -> (USD rate, age in seconds) known to the worker
+ShardResult = Tuple[str, List[CompactEntry], Dict[str, Tuple[float, float]]]
+
+_worker_scanner: Optional["ArbitrageScanner"] = None
+
+
+def process_backend_available() -> bool:
+    return (os.cpu_count() or 1) > 1
+
+
+def _usd_rates_with_age(scanner: "ArbitrageScanner") -> Dict[str, Tuple[float, float]]:
+    now = time.monotonic()
+    return {quote: (rate, now - stamp) for quote, (rate, stamp) in list(scanner.quote_usd_rates.items())}
+
+
+def shard_exchanges(exchanges: List[Tuple[str, str]], count: int) -> List[List[Tuple[str, str]]]:
+    shards: List[List[Tuple[str, str]]] = [[] for _ in range(max(1, count))]
+    for idx, exchange in enumerate(exchanges):
+        shards[idx % len(shards)].append(exchange)
+    return [shard for shard in shards if shard]
+
+
+def _init_worker(exchanges: List[Tuple[str, str]]) -> None:
+    global _worker_scanner
+    from scanner import ArbitrageScanner
+
+    _worker_scanner = ArbitrageScanner(exchanges=exchanges, log=lambda _message: None)
+    _worker_scanner.init_exchanges()
+
+
+def _scan_shard(
+    exchange_ids: List[str],
+    coins: List[str],
+    preferred_quote: str,
+    snapshot: bool,
+    usd_rates: Dict[str, Tuple[float, float]],
+    refresh_usd: bool,
+) -> List[ShardResult]:
+    # Runs inside the worker process: ticker parsing and row building stay
+    # here, only flat tuples travel back to the coordinator.
+    scanner = _worker_scanner
+    now = time.monotonic()
+    # Rates travel with their age, monotonic clocks differ between processes.
+    for quote, (rate, age) in usd_rates.items():
+        scanner.store_usd_rate(quote, rate, now - age)
+    if refresh_usd:
+        scanner.refresh_usd_rates(scanner.usd_quotes_in_use(preferred_quote), exchange_ids)
+    results: List[ShardResult] = []
+    for exchange_id, rows in scanner._fetch_exchange_results(coins, exchange_ids, preferred_quote, snapshot):
+        compact: List[CompactEntry] = []
+        for coin, (price, symbol, _link, meta, volume_usd, bid, ask) in rows.items():
+            if symbol == "-":
+                continue
+            compact.append((coin, str(meta.get("base_code", coin)), price, symbol, volume_usd, bid, ask))
+        results.append((exchange_id, compact, _usd_rates_with_age(scanner)))
+    return results
+
+
+def _shard_markets(exchange_id: str, reload: bool) -> Optional[dict]:
+    # Runs inside the worker process, for a coordinator without the markets.
+    scanner = _worker_scanner
+    if reload:
+        scanner.reload_exchange_markets(exchange_id)
+    if not scanner.ensure_exchange_markets(exchange_id):
+        return None
+    return scanner.market_payload(exchange_id)
+
+
+class ShardedScanBackend:
+    # Each shard is a single-process pool that owns the ccxt clients of its
+    # exchanges, so an exchange's rate limit is still tracked in one place.
+    def __init__(self, scanner: "ArbitrageScanner", shard_count: Optional[int] = None) -> None:
+        count = shard_count or min(PROCESS_SHARD_LIMIT, os.cpu_count() or 1, len(scanner.exchanges))
+        self.scanner = scanner
+        self.shards = shard_exchanges(scanner.exchanges, count)
+        self.shard_by_exchange = {
+            exchange_id: idx for idx, shard in enumerate(self.shards) for exchange_id, _name in shard
+        }
+        self.pools = [self._new_pool(shard) for shard in self.shards]
+
+    def _new_pool(self, shard: List[Tuple[str, str]]) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(max_workers=1, initializer=_init_worker, initargs=(shard,))
+
+    def collect(
+        self,
+        coins: List[str],
+        selected_exchanges: List[str],
+        preferred_quote: str,
+        snapshot: bool = False,
+    ) -> Iterator[Tuple[str, Dict[str, "ExchangeEntry"]]]:
+        requested: Dict[int, List[str]] = {}
+        for exchange_id in selected_exchanges:
+            idx = self.shard_by_exchange.get(exchange_id)
+            if idx is not None and exchange_id in self.scanner.exchange_clients:
+                requested.setdefault(idx, []).append(exchange_id)
+
+        usd_rates = _usd_rates_with_age(self.scanner)
+        # Stale USD rates are refreshed by the shard of the first selected
+        # exchange only, and reach the others with the next cycle's rates.
+        usd_shard = next(iter(requested), None)
+        futures = {
+            self.pools[idx].submit(
+                _scan_shard,
+                exchange_ids,
+                coins,
+                preferred_quote,
+                snapshot,
+                usd_rates,
+                idx == usd_shard,
+            ): idx
+            for idx, exchange_ids in requested.items()
+        }
+        for future in as_completed(futures):
+            idx = futures[future]
+            try:
+                shard_results = future.result()
+            except Exception as exc:
+                if isinstance(exc, BrokenProcessPool):
+                    self.pools[idx] = self._new_pool(self.shards[idx])
+                self.scanner.log(f"Шард {idx + 1}: ошибка процесса ({exc}).")
+                for exchange_id in requested[idx]:
+                    yield exchange_id, self.scanner.empty_exchange_rows(coins)
+                continue
+            for exchange_id, compact, rates in shard_results:
+                yield exchange_id, self._expand(exchange_id, coins, compact, rates)
+
+    def _expand(
+        self,
+        exchange_id: str,
+        coins: List[str],
+        compact: List[CompactEntry],
+        rates: Dict[str, Tuple[float, float]],
+    ) -> Dict[str, "ExchangeEntry"]:
+        scanner = self.scanner
+        now = time.monotonic()
+        for quote, (rate, age) in rates.items():
+            scanner.store_usd_rate(quote, rate, now - age)
+        rows = scanner.empty_exchange_rows(coins)
+        if compact:
+            # Links and network metadata are rebuilt locally; the markets come
+            # from the disk cache the worker has written, or from the shard.
+            scanner.ensure_exchange_markets(exchange_id)
+        for coin, base_code, price, symbol, volume_usd, bid, ask in compact:
+            link, meta = scanner.symbol_cell(exchange_id, base_code, symbol)
+            rows[coin] = (price, symbol, link, meta, volume_usd, bid, ask)
+        return rows
+
+    def shard_markets(self, exchange_id: str, reload: bool = False) -> Optional[dict]:
+        idx = self.shard_by_exchange.get(exchange_id)
+        if idx is None:
+            return None
+        return self.pools[idx].submit(_shard_markets, exchange_id, reload).result()
+
+    def close(self) -> None:
+        for pool in self.pools:
+            pool.shutdown(wait=False, cancel_futures=True)
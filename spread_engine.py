@@ -0,0 +1,84 @@
+import heapq
+from typing import Dict, List, Optional, Tuple
+
+
+class CoinBook:
+    __slots__ = ("prices", "min_heap", "max_heap")
+
+    def __init__(self) -> None:
+        # exchange -> (buy price, sell price); both are the last price unless
+        # the engine runs on top-of-book asks/bids.
+        self.prices: Dict[str, Tuple[float, float]] = {}
+        self.min_heap: List[Tuple[float, int, str]] = []
+        self.max_heap: List[Tuple[float, int, str]] = []
+
+
+class SpreadEngine:
+    # Per-coin best-bid/best-ask heaps with lazy deletion. Ties are broken by
+    # the exchange's position in the selection, matching min()/max() over the
+    # selected exchanges in order.
+    def __init__(self) -> None:
+        self.exchanges: Tuple[str, ...] = ()
+        self.pricing = "LAST"
+        self.order: Dict[str, int] = {}
+        self.books: Dict[str, CoinBook] = {}
+
+    def reset(self, exchanges: List[str], pricing: str = "LAST") -> None:
+        # Drops every book, also when the selection is unchanged: a new
+        # subscription starts from scratch.
+        self.exchanges = tuple(exchanges)
+        self.pricing = pricing
+        self.order = {exchange_id: idx for idx, exchange_id in enumerate(self.exchanges)}
+        self.books = {}
+
+    def update(
+        self,
+        coin: str,
+        exchange_id: str,
+        buy_price: Optional[float],
+        sell_price: Optional[float] = None,
+    ) -> bool:
+        position = self.order.get(exchange_id)
+        if position is None:
+            return False
+        book = self.books.get(coin)
+        if book is None:
+            book = CoinBook()
+            self.books[coin] = book
+
+        if sell_price is None:
+            sell_price = buy_price
+        if not isinstance(buy_price, float) or not isinstance(sell_price, float):
+            if exchange_id not in book.prices:
+                return False
+            del book.prices[exchange_id]
+        else:
+            if book.prices.get(exchange_id) == (buy_price, sell_price):
+                return False
+            book.prices[exchange_id] = (buy_price, sell_price)
+            heapq.heappush(book.min_heap, (buy_price, position, exchange_id))
+            heapq.heappush(book.max_heap, (-sell_price, position, exchange_id))
+            if len(book.min_heap) > 4 * len(self.order):
+                self._compact(book)
+        return True
+
+    def best(self, coin: str) -> Optional[Tuple[str, float, str, float]]:
+        book = self.books.get(coin)
+        if book is None or len(book.prices) < 2:
+            return None
+        min_heap, max_heap, prices = book.min_heap, book.max_heap, book.prices
+        while min_heap and prices.get(min_heap[0][2], (None, None))[0] != min_heap[0][0]:
+            heapq.heappop(min_heap)
+        while max_heap and prices.get(max_heap[0][2], (None, None))[1] != -max_heap[0][0]:
+            heapq.heappop(max_heap)
+        if not min_heap or not max_heap:
+            return None
+        min_price, _min_pos, min_ex = min_heap[0]
+        neg_max_price, _max_pos, max_ex = max_heap[0]
+        return min_ex, min_price, max_ex, -neg_max_price
+
+    def _compact(self, book: CoinBook) -> None:
+        book.min_heap = [(buy, self.order[ex_id], ex_id) for ex_id, (buy, _sell) in book.prices.items()]
+        book.max_heap = [(-sell, self.order[ex_id], ex_id) for ex_id, (_buy, sell) in book.prices.items()]
+        heapq.heapify(book.min_heap)
+        heapq.heapify(book.max_heap)
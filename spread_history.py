@@ -0,0 +1,188 @@
+import queue
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+
+HISTORY_DB_FILE = Path("spread_history.sqlite3")
+HISTORY_RETENTION_SECONDS = 7 * 24 * 60 * 60
+HISTORY_PRUNE_INTERVAL_SECONDS = 60 * 60
+# Cycles waiting for the writer; beyond this new cycles are dropped, the
+# scan never waits for the disk.
+HISTORY_QUEUE_LIMIT = 256
+# time_above looks back at most this far, and samples further apart than the
+# gap do not make one streak: the coin went unscanned or lost its spread.
+HISTORY_STREAK_WINDOW_SECONDS = 24 * 60 * 60
+HISTORY_STREAK_GAP_SECONDS = 15 * 60
+SPARKLINE_CHARS = "▁▂▃▄▅▆▇█"
+
+SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS spreads (
+        ts REAL NOT NULL,
+        coin TEXT NOT NULL,
+        buy_ex TEXT,
+        sell_ex TEXT,
+        spread REAL NOT NULL,
+        net_spread REAL,
+        buy_volume_usd REAL,
+        sell_volume_usd REAL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS spreads_coin_ts ON spreads (coin, ts)",
+    "CREATE INDEX IF NOT EXISTS spreads_ts ON spreads (ts)",
+]
+INSERT_SQL = "INSERT INTO spreads VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+
+# ts, coin, buy exchange, sell exchange, spread, net spread, buy volume, sell volume
+HistoryRecord = Tuple[float, str, Optional[str], Optional[str], float, Optional[float], Optional[float], Optional[float]]
+
+
+def _float_or_none(value: object) -> Optional[float]:
+    return value if isinstance(value, float) else None
+
+
+def render_sparkline(values: List[Optional[float]]) -> str:
+    known = [value for value in values if value is not None]
+    if not known:
+        return ""
+    low, high = min(known), max(known)
+    scale = (len(SPARKLINE_CHARS) - 1) / (high - low) if high > low else 0.0
+    return "".join(
+        " " if value is None else SPARKLINE_CHARS[int((value - low) * scale)]
+        for value in values
+    )
+
+
+class SpreadHistory:
+    # Every cycle's spreads in SQLite. append() only queues the rows; one
+    # writer thread inserts everything queued in a single transaction, so
+    # the scan thread never touches the disk. Readers use their own
+    # per-thread connections (WAL lets them run next to the writer).
+    def __init__(self, path: Path = HISTORY_DB_FILE) -> None:
+        self.path = Path(path)
+        self.queue: "queue.Queue[Optional[List[HistoryRecord]]]" = queue.Queue(maxsize=HISTORY_QUEUE_LIMIT)
+        self.dropped = 0
+        self.local = threading.local()
+        connection = self._connect()
+        with connection:
+            for statement in SCHEMA:
+                connection.execute(statement)
+        connection.close()
+        self.writer = threading.Thread(target=self._write_loop, name="spread-history", daemon=True)
+        self.writer.start()
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.path, timeout=10)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        return connection
+
+    def append(self, rows: Dict[str, Dict[str, object]], stamp: Optional[float] = None) -> None:
+        stamp = time.time() if stamp is None else stamp
+        records: List[HistoryRecord] = []
+        for coin, row in rows.items():
+            spread = row.get("spread")
+            if not isinstance(spread, float) or spread > 99:
+                continue
+            records.append(
+                (
+                    stamp,
+                    coin,
+                    row.get("min_ex"),
+                    row.get("max_ex"),
+                    spread,
+                    _float_or_none(row.get("net_spread")),
+                    _float_or_none(row.get("min_volume_usd")),
+                    _float_or_none(row.get("max_volume_usd")),
+                )
+            )
+        if not records:
+            return
+        try:
+            self.queue.put_nowait(records)
+        except queue.Full:
+            self.dropped += 1
+
+    def _write_loop(self) -> None:
+        connection = self._connect()
+        pruned_at = 0.0
+        running = True
+        while running:
+            batch = self.queue.get()
+            if batch is None:
+                break
+            records = list(batch)
+            # Whatever queued up meanwhile goes into the same transaction.
+            while True:
+                try:
+                    more = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                if more is None:
+                    running = False
+                    break
+                records.extend(more)
+            try:
+                with connection:
+                    connection.executemany(INSERT_SQL, records)
+                    if time.time() - pruned_at >= HISTORY_PRUNE_INTERVAL_SECONDS:
+                        pruned_at = time.time()
+                        connection.execute("DELETE FROM spreads WHERE ts < ?", (pruned_at - HISTORY_RETENTION_SECONDS,))
+            except sqlite3.Error:
+                self.dropped += 1
+        connection.close()
+
+    def close(self) -> None:
+        self.queue.put(None)
+        self.writer.join(timeout=5)
+
+    def _reader(self) -> sqlite3.Connection:
+        connection = getattr(self.local, "connection", None)
+        if connection is None:
+            connection = self._connect()
+            self.local.connection = connection
+        return connection
+
+    def time_above(self, coin: str, threshold: float, now: Optional[float] = None) -> Optional[float]:
+        # Seconds the coin's spread has stayed at or above threshold up to its
+        # latest sample; None when the latest sample is below it. Walks the
+        # samples newest first and stops at the first one that ends the streak.
+        now = time.time() if now is None else now
+        first = last = None
+        for ts, spread in self._reader().execute(
+            "SELECT ts, spread FROM spreads WHERE coin = ? AND ts >= ? ORDER BY ts DESC",
+            (coin, now - HISTORY_STREAK_WINDOW_SECONDS),
+        ):
+            if spread < threshold or (first is not None and first - ts > HISTORY_STREAK_GAP_SECONDS):
+                break
+            if last is None:
+                last = ts
+            first = ts
+        if last is None:
+            return None
+        return last - first
+
+    def sparkline(self, coin: str, window_seconds: float, buckets: int) -> List[Optional[float]]:
+        # Best spread per time bucket over the last window_seconds.
+        now = time.time()
+        start = now - window_seconds
+        width = window_seconds / buckets
+        values: List[Optional[float]] = [None] * buckets
+        for bucket, spread in self._reader().execute(
+            "SELECT CAST((ts - ?) / ? AS INTEGER) AS bucket, MAX(spread) FROM spreads "
+            "WHERE coin = ? AND ts >= ? GROUP BY bucket",
+            (start, width, coin, start),
+        ):
+            if 0 <= bucket < buckets:
+                values[bucket] = spread
+        return values
+
+    def history(self, coin: str, start: float, end: Optional[float] = None) -> List[HistoryRecord]:
+        end = time.time() if end is None else end
+        return self._reader().execute(
+            "SELECT * FROM spreads WHERE coin = ? AND ts >= ? AND ts <= ? ORDER BY ts",
+            (coin, start, end),
+        ).fetchall()
@@ -0,0 +1,112 @@
+import math
+import threading
+import time
+from typing import Callable, Dict, Optional, Tuple
+
+
+# Time constant of the EWMA: a sample's weight depends on the time since the
+# previous one, so a STREAM tick every second and an AUTO cycle every few
+# minutes average over the same span.
+SPREAD_STATS_TAU_SECONDS = 120.0
+# A coin observed this long scores half its EWMA spread, twice as long two
+# thirds, and so on; a single observation scores zero.
+PERSISTENCE_HALF_SECONDS = 300.0
+# Longer without an observation ends the streak (AUTO revisits a coin only
+# every few batches, so this is generous).
+STREAK_GAP_SECONDS = 900.0
+# Relative volatility is taken against at least this spread, in %.
+VOLATILITY_SPREAD_FLOOR = 0.5
+STATS_PRUNE_INTERVAL_SECONDS = 300.0
+
+
+class CoinSpreadStats:
+    __slots__ = ("pair", "ewma", "variance", "samples", "streak_start", "last_seen", "ages")
+
+    def __init__(self, pair: Tuple[object, object], spread: float, now: float) -> None:
+        # (buy exchange, sell exchange) the streak belongs to
+        self.pair = pair
+        self.ewma = spread
+        self.variance = 0.0
+        self.samples = 1
+        self.streak_start = now
+        self.last_seen = now
+        # Ticker age in seconds of each leg of the latest best pair.
+        self.ages: Dict[str, float] = {}
+
+    def update(self, pair: Tuple[object, object], spread: float, now: float) -> None:
+        if pair != self.pair or now - self.last_seen > STREAK_GAP_SECONDS:
+            self.__init__(pair, spread, now)
+            return
+        # Incremental time-weighted EWMA and EW variance, O(1) per sample.
+        alpha = 1.0 - math.exp(-max(0.0, now - self.last_seen) / SPREAD_STATS_TAU_SECONDS)
+        delta = spread - self.ewma
+        self.ewma += alpha * delta
+        self.variance = (1.0 - alpha) * (self.variance + alpha * delta * delta)
+        self.samples += 1
+        self.last_seen = now
+
+    @property
+    def duration(self) -> float:
+        return self.last_seen - self.streak_start
+
+    @property
+    def volatility(self) -> float:
+        return math.sqrt(self.variance)
+
+    def score(self, now: float) -> float:
+        if now - self.last_seen > STREAK_GAP_SECONDS:
+            return 0.0
+        persistence = self.duration / (self.duration + PERSISTENCE_HALF_SECONDS)
+        relative_volatility = self.volatility / max(abs(self.ewma), VOLATILITY_SPREAD_FLOOR)
+        return self.ewma * persistence / (1.0 + relative_volatility)
+
+
+class SpreadStatsBook:
+    # Rolling per-coin spread statistics fed with every cycle's rows. A streak
+    # belongs to one buy/sell exchange pair: when the best pair changes or
+    # disappears the coin starts over, so a spread has to hold on the same
+    # route before it ranks.
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.stats: Dict[str, CoinSpreadStats] = {}
+        self.pruned_at = time.time()
+
+    def update_rows(
+        self,
+        rows: Dict[str, Dict[str, object]],
+        quote_age: Optional[Callable[[str, str], Optional[float]]] = None,
+        now: Optional[float] = None,
+    ) -> None:
+        now = time.time() if now is None else now
+        with self.lock:
+            for coin, row in rows.items():
+                spread = row.get("spread")
+                if not isinstance(spread, float) or spread > 99:
+                    self.stats.pop(coin, None)
+                    continue
+                pair = (row.get("min_ex"), row.get("max_ex"))
+                item = self.stats.get(coin)
+                if item is None:
+                    item = self.stats[coin] = CoinSpreadStats(pair, spread, now)
+                else:
+                    item.update(pair, spread, now)
+                if quote_age is not None:
+                    ages: Dict[str, float] = {}
+                    for exchange_id in (row.get("min_ex"), row.get("max_ex")):
+                        age = quote_age(exchange_id, coin) if isinstance(exchange_id, str) else None
+                        if age is not None:
+                            ages[exchange_id] = age
+                    item.ages = ages
+            if now - self.pruned_at >= STATS_PRUNE_INTERVAL_SECONDS:
+                self.pruned_at = now
+                for coin in [coin for coin, item in self.stats.items() if now - item.last_seen > STREAK_GAP_SECONDS]:
+                    del self.stats[coin]
+
+    def score(self, coin: str, now: Optional[float] = None) -> float:
+        with self.lock:
+            item = self.stats.get(coin)
+            return 0.0 if item is None else item.score(time.time() if now is None else now)
+
+    def get(self, coin: str) -> Optional[CoinSpreadStats]:
+        with self.lock:
+            return self.stats.get(coin)
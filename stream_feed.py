@@ -0,0 +1,252 @@
+import asyncio
+import json
+import threading
+from concurrent.futures import Future
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+import ccxt
+
+try:
+    import ccxt.pro as ccxt_pro
+except ImportError:
+    ccxt_pro = None
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+
+STREAM_RETRY_SECONDS = 3.0
+STREAM_CLOSE_TIMEOUT_SECONDS = 2.0
+STREAM_PRICE_FIELDS = ("bid", "ask", "last", "close")
+STREAM_QUOTE_FIELDS = STREAM_PRICE_FIELDS + ("bidVolume", "askVolume", "baseVolume", "quoteVolume", "timestamp")
+
+
+def stream_backend_available(mock_url: Optional[str] = None) -> bool:
+    if mock_url:
+        return aiohttp is not None
+    return ccxt_pro is not None
+
+
+def stream_supported_exchanges(exchange_ids: List[str], mock_url: Optional[str] = None) -> List[str]:
+    if mock_url:
+        return list(exchange_ids)
+    if ccxt_pro is None:
+        return []
+    supported = set(getattr(ccxt_pro, "exchanges", []))
+    return [exchange_id for exchange_id in exchange_ids if exchange_id in supported]
+
+
+class MockProExchange:
+    # ccxt.pro-shaped client for ws_mock_server.py: the mock goes through the
+    # same watch loops, retries and reconnects as a real venue. One
+    # connection carries one subscription, as the mock server expects.
+    def __init__(self, exchange_id: str, url: str) -> None:
+        self.id = exchange_id
+        self.url = url
+        self.has = {"watchTickers": True, "watchTicker": False, "watchBidsAsks": False}
+        self.markets: Optional[dict] = None
+        self.currencies: Optional[dict] = None
+        self.session = None
+        self.ws = None
+        self.symbols: List[str] = []
+        self.receive_lock: Optional[asyncio.Lock] = None
+
+    def set_markets(self, markets: dict, currencies: Optional[dict] = None) -> dict:
+        self.markets = markets
+        self.currencies = currencies
+        return markets
+
+    async def _connect(self, symbols: List[str]) -> None:
+        wanted = sorted(set(symbols))
+        if self.ws is not None and not self.ws.closed and wanted == self.symbols:
+            return
+        await self._disconnect()
+        if self.session is None or self.session.closed:
+            self.session = aiohttp.ClientSession()
+        try:
+            self.ws = await self.session.ws_connect(self.url)
+            await self.ws.send_json({"op": "subscribe", "exchange": self.id, "symbols": wanted})
+        except (aiohttp.ClientError, OSError) as exc:
+            await self._disconnect()
+            raise ccxt.NetworkError(f"{self.id}: {exc}") from exc
+        self.symbols = wanted
+
+    async def _disconnect(self) -> None:
+        ws, self.ws = self.ws, None
+        self.symbols = []
+        if ws is not None and not ws.closed:
+            try:
+                await asyncio.wait_for(ws.close(), STREAM_CLOSE_TIMEOUT_SECONDS)
+            except (asyncio.TimeoutError, aiohttp.ClientError, OSError):
+                pass
+
+    async def watch_tickers(self, symbols: Optional[List[str]] = None) -> Dict[str, dict]:
+        if self.receive_lock is None:
+            self.receive_lock = asyncio.Lock()
+        async with self.receive_lock:
+            await self._connect(list(symbols or []))
+            while True:
+                message = await self.ws.receive()
+                if message.type != aiohttp.WSMsgType.TEXT:
+                    # The caller retries, which reconnects.
+                    await self._disconnect()
+                    raise ccxt.NetworkError(f"{self.id}: соединение с тестовым сервером закрыто")
+                data = json.loads(message.data)
+                symbol = str(data.get("symbol", ""))
+                if symbol in self.symbols:
+                    return {symbol: data}
+
+    async def close(self) -> None:
+        await self._disconnect()
+        if self.session is not None and not self.session.closed:
+            await self.session.close()
+        self.session = None
+
+
+class StreamFeed:
+    # Keeps the latest quote per (exchange, symbol) and calls on_quote from the
+    # feed thread whenever a price field actually changes.
+    def __init__(
+        self,
+        on_quote: Callable[[str, str, dict], None],
+        mock_url: Optional[str] = None,
+        log: Optional[Callable[[str], None]] = None,
+    ) -> None:
+        self.on_quote = on_quote
+        self.mock_url = mock_url
+        # Called from the feed thread.
+        self.log: Callable[[str], None] = log or print
+        self.quotes: Dict[str, Dict[str, dict]] = {}
+        self.lock = threading.Lock()
+        self.tasks: List[asyncio.Task] = []
+        self.clients: Dict[str, object] = {}
+        self.loop = asyncio.new_event_loop()
+        # Restarts run one at a time in the order they were requested, so a
+        # stop can never overtake an earlier start or the other way round.
+        self.restart_lock = asyncio.Lock()
+        self.thread = threading.Thread(target=self._run_loop, name="stream-feed", daemon=True)
+        self.thread.start()
+
+    def _run_loop(self) -> None:
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def start(
+        self,
+        subscriptions: Dict[str, List[str]],
+        markets: Dict[str, Tuple[dict, Optional[dict]]],
+    ) -> Future:
+        # Queued on the feed loop and returned at once.
+        return asyncio.run_coroutine_threadsafe(self._restart(subscriptions, markets), self.loop)
+
+    def stop(self) -> Future:
+        return asyncio.run_coroutine_threadsafe(self._restart({}, {}), self.loop)
+
+    def close(self) -> None:
+        try:
+            self.stop().result(timeout=5)
+        except Exception:
+            pass
+        self.loop.call_soon_threadsafe(self.loop.stop)
+
+    def quote(self, exchange_id: str, symbol: str) -> Optional[dict]:
+        with self.lock:
+            quote = self.quotes.get(exchange_id, {}).get(symbol)
+            return dict(quote) if quote else None
+
+    def publish(self, exchange_id: str, symbol: str, update: dict) -> None:
+        with self.lock:
+            quote = self.quotes.setdefault(exchange_id, {}).setdefault(symbol, {"symbol": symbol})
+            changed = False
+            for field in STREAM_QUOTE_FIELDS:
+                value = update.get(field)
+                if value is None or quote.get(field) == value:
+                    continue
+                quote[field] = value
+                if field in STREAM_PRICE_FIELDS:
+                    changed = True
+            current = dict(quote)
+        if changed:
+            self.on_quote(exchange_id, symbol, current)
+
+    async def _restart(
+        self,
+        subscriptions: Dict[str, List[str]],
+        markets: Dict[str, Tuple[dict, Optional[dict]]],
+    ) -> None:
+        async with self.restart_lock:
+            await self._resubscribe(subscriptions, markets)
+
+    async def _resubscribe(
+        self,
+        subscriptions: Dict[str, List[str]],
+        markets: Dict[str, Tuple[dict, Optional[dict]]],
+    ) -> None:
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
+        for client in list(self.clients.values()):
+            try:
+                await client.close()
+            except Exception:
+                pass
+        self.clients = {}
+        with self.lock:
+            self.quotes = {}
+
+        for exchange_id, symbols in subscriptions.items():
+            if not symbols:
+                continue
+            if self.mock_url:
+                client = MockProExchange(exchange_id, self.mock_url)
+            elif ccxt_pro is None or not hasattr(ccxt_pro, exchange_id):
+                continue
+            else:
+                client = getattr(ccxt_pro, exchange_id)({"enableRateLimit": True, "timeout": 15000})
+            exchange_markets, currencies = markets.get(exchange_id, ({}, None))
+            if exchange_markets:
+                client.set_markets(exchange_markets, currencies)
+            self.clients[exchange_id] = client
+            self.tasks.extend(self._watch_tasks(exchange_id, client, symbols))
+
+    def _watch_tasks(self, exchange_id: str, client, symbols: List[str]) -> List[asyncio.Task]:
+        has = getattr(client, "has", {}) or {}
+        watches: List[Callable[[], Awaitable[Optional[Dict[str, dict]]]]] = []
+        if has.get("watchTickers"):
+            watches.append(lambda: client.watch_tickers(symbols))
+        elif has.get("watchTicker"):
+            for symbol in symbols:
+                watches.append(lambda symbol=symbol: self._watch_one(client, symbol))
+        if has.get("watchBidsAsks"):
+            watches.append(lambda: client.watch_bids_asks(symbols))
+        return [self.loop.create_task(self._watch(exchange_id, watch)) for watch in watches]
+
+    async def _watch_one(self, client, symbol: str) -> Dict[str, dict]:
+        return {symbol: await client.watch_ticker(symbol) or {}}
+
+    async def _watch(
+        self,
+        exchange_id: str,
+        watch: Callable[[], Awaitable[Optional[Dict[str, dict]]]],
+    ) -> None:
+        # Retries forever; the first failure and every change of error are
+        # logged, and so is the recovery, so a dead feed does not go silent.
+        last_error: Optional[str] = None
+        while True:
+            try:
+                quotes = await watch()
+                for symbol, quote in (quotes or {}).items():
+                    self.publish(exchange_id, symbol, quote)
+            except Exception as exc:
+                error = f"{type(exc).__name__}: {exc}"
+                if error != last_error:
+                    self.log(f"STREAM {exchange_id}: ошибка потока ({error}), повтор через {STREAM_RETRY_SECONDS:g} с.")
+                last_error = error
+                await asyncio.sleep(STREAM_RETRY_SECONDS)
+                continue
+            if last_error is not None:
+                self.log(f"STREAM {exchange_id}: поток восстановлен.")
+                last_error = None
@@ -0,0 +1,94 @@
+import itertools
+import math
+
+import pytest
+
+import price_matrix
+from price_matrix import EMPTY_META, PriceMatrix
+from scanner import ArbitrageScanner, MatrixRows
+
+
+EXCHANGES = ["binance", "okx", "kraken"]
+NAN = float("nan")
+
+# coin -> (spread, net spread, route, buy volume, sell volume); None: no best pair
+CASES = {
+    "AAA": (2.5, 1.0, "TRC20", 50000.0, 60000.0),
+    "BBB": (2.5, 2.0, "UNVERIFIED", 500.0, 60000.0),
+    "CCC": (2.5, None, "ERC20", 50000.0, None),
+    "DDD": (150.0, 149.0, "TRC20", 50000.0, 60000.0),
+    "EEE": (99.0, 98.0, "TRC20", 50000.0, 60000.0),
+    "FFF": (NAN, NAN, "TRC20", 50000.0, 60000.0),
+    "GGG": (0.7, -0.3, "UNVERIFIED", 2000.0, 2000.0),
+    "HHH": (4.1, 2.0, "BEP20", NAN, 60000.0),
+    "III": None,
+    "JJJ": (0.0, -1.0, "TRC20", 50000.0, 60000.0),
+    "KKK": (4.1, 2.0, "TRC20", 50000.0, 60000.0),
+    "LLL": (2.5, 1.0, "TRC20", 1000.0, 1000.0),
+}
+COINS = list(CASES) + ["ZZZ"]
+
+
+@pytest.fixture(params=["numpy", "array"])
+def backend(request, monkeypatch):
+    if request.param == "numpy":
+        if price_matrix.np is None:
+            pytest.skip("numpy is not installed")
+    else:
+        monkeypatch.setattr(price_matrix, "np", None)
+    return request.param
+
+
+def _build_matrix() -> PriceMatrix:
+    matrix = PriceMatrix(EXCHANGES)
+    for coin, case in CASES.items():
+        row = matrix.row_of(coin)
+        if case is None:
+            matrix.set_quote(coin, "binance", 1.0, f"{coin}/USDT", None, EMPTY_META, 1000.0, None, None)
+            continue
+        spread, net_spread, route, buy_volume, sell_volume = case
+        matrix.set_quote(coin, "binance", 1.0, f"{coin}/USDT", None, EMPTY_META, buy_volume, None, None)
+        matrix.set_quote(coin, "okx", 1.1, f"{coin}/USDT", None, EMPTY_META, sell_volume, None, None)
+        matrix.set_result((row, 0, 1.0, 1, 1.1, spread), route, None, net_spread)
+    return matrix
+
+
+def _filter_settings():
+    for min_spread, sort_by_spread, top_n, verified_only, good_volume_only, net_only in itertools.product(
+        (-5.0, 0.0, 2.5),
+        (True, False),
+        ("ALL", "1", "2", "3", "50"),
+        (False, True),
+        (False, True),
+        (False, True),
+    ):
+        yield (min_spread, sort_by_spread, top_n, verified_only, good_volume_only, 1000.0, net_only)
+
+
+def test_matrix_filters_match_row_filters(backend):
+    scanner = ArbitrageScanner(exchanges=[], log=lambda _message: None)
+    scanner.blacklist = {"KKK"}
+    matrix = _build_matrix()
+    matrix_rows = MatrixRows(scanner, matrix, COINS)
+    plain_rows = {coin: scanner.matrix_row(matrix, coin) for coin in COINS}
+    assert math.isnan(plain_rows["FFF"]["spread"])
+    assert plain_rows["III"]["spread"] is None
+
+    for settings in _filter_settings():
+        fast = [coin for coin, _row in scanner.apply_filters(matrix_rows, COINS, *settings)]
+        fallback = [coin for coin, _row in scanner.apply_filters(plain_rows, COINS, *settings)]
+        assert fast == fallback, settings
+
+
+def test_ties_keep_input_order(backend):
+    scanner = ArbitrageScanner(exchanges=[], log=lambda _message: None)
+    matrix = _build_matrix()
+    rows = MatrixRows(scanner, matrix, COINS)
+    settings = (0.0, True, "ALL", False, False, 0.0, False)
+    # 99% is still a spread, 150% and NaN are not; equal spreads keep the
+    # order of the coin list, with and without a top-N limit.
+    assert [coin for coin, _row in scanner.apply_filters(rows, COINS, *settings)] == [
+        "EEE", "HHH", "KKK", "AAA", "BBB", "CCC", "LLL", "GGG", "JJJ",
+    ]
+    top = [coin for coin, _row in scanner.apply_filters(rows, COINS, 0.0, True, "4", False, False, 0.0, False)]
+    assert top == ["EEE", "HHH", "KKK", "AAA"]
@@ -0,0 +1,94 @@
+import asyncio
+import json
+import threading
+import time
+
+import pytest
+
+pytest.importorskip("aiohttp")
+
+from aiohttp import web
+
+import stream_feed
+from stream_feed import StreamFeed
+from ws_mock_server import create_app
+
+
+SCRIPT = [
+    {"exchange": "binance", "symbol": "BTC/USDT", "bid": 100.0, "ask": 100.2, "last": 100.1},
+    {"exchange": "okx", "symbol": "BTC/USDT", "bid": 101.0, "ask": 101.3, "last": 101.2},
+    {"exchange": "okx", "symbol": "ETH/USDT", "bid": 10.0, "ask": 10.1, "last": 10.05, "delay": 0.05},
+]
+
+
+@pytest.fixture
+def mock_url(tmp_path):
+    script = tmp_path / "quotes.jsonl"
+    script.write_text("\n".join(json.dumps(event) for event in SCRIPT), encoding="utf-8")
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    runner = web.AppRunner(create_app(script=script))
+
+    async def start() -> int:
+        await runner.setup()
+        await web.TCPSite(runner, "127.0.0.1", 0).start()
+        return runner.addresses[0][1]
+
+    port = asyncio.run_coroutine_threadsafe(start(), loop).result(timeout=5)
+    yield f"ws://127.0.0.1:{port}/ws"
+    asyncio.run_coroutine_threadsafe(runner.cleanup(), loop).result(timeout=5)
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join(timeout=5)
+
+
+def _wait_for(condition, timeout: float = 5.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return condition()
+
+
+def test_feed_publishes_mock_quotes(mock_url):
+    received = []
+    feed = StreamFeed(
+        lambda exchange_id, symbol, _quote: received.append((exchange_id, symbol)),
+        mock_url=mock_url,
+        log=lambda _message: None,
+    )
+    try:
+        feed.start({"binance": ["BTC/USDT"], "okx": ["BTC/USDT", "ETH/USDT"]}, {}).result(timeout=5)
+        assert _wait_for(lambda: len(set(received)) == 3)
+
+        binance = feed.quote("binance", "BTC/USDT")
+        assert (binance["bid"], binance["ask"], binance["last"]) == (100.0, 100.2, 100.1)
+        okx = feed.quote("okx", "ETH/USDT")
+        assert (okx["bid"], okx["ask"], okx["last"]) == (10.0, 10.1, 10.05)
+        assert isinstance(okx["timestamp"], int)
+
+        # The server closes after the script and the feed reconnects, but
+        # replayed quotes do not change and are not published again.
+        time.sleep(0.3)
+        assert sorted(received) == sorted(set(received))
+
+        feed.stop().result(timeout=5)
+        assert feed.quote("binance", "BTC/USDT") is None
+    finally:
+        feed.close()
+
+
+def test_feed_logs_first_failure_once(monkeypatch):
+    monkeypatch.setattr(stream_feed, "STREAM_RETRY_SECONDS", 0.01)
+    messages = []
+    # Nothing listens on port 9 of the loopback interface.
+    feed = StreamFeed(lambda *_args: None, mock_url="ws://127.0.0.1:9/ws", log=messages.append)
+    try:
+        feed.start({"binance": ["BTC/USDT"]}, {}).result(timeout=5)
+        assert _wait_for(lambda: messages)
+        time.sleep(0.2)
+        assert len(messages) == 1
+        assert messages[0].startswith("STREAM binance: ошибка потока (NetworkError")
+    finally:
+        feed.close()
@@ -0,0 +1,99 @@
+import json
+import os
+import time
+from pathlib import Path
+from typing import List, Optional
+
+
+UNIVERSE_CACHE_FILE = Path("universe_cache.json")
+UNIVERSE_CACHE_VERSION = 1
+UNIVERSE_CACHE_TTL_SECONDS = 6 * 60 * 60
+POPULAR_CACHE_TTL_SECONDS = 24 * 60 * 60
+SCAN_STATE_FILE = Path("scan_state.json")
+SCAN_STATE_VERSION = 1
+SCAN_STATE_TTL_SECONDS = 7 * 24 * 60 * 60
+
+
+def _read_json(path: Path, version: int) -> Optional[dict]:
+    if not path.exists():
+        return None
+    try:
+        data = json.loads(path.read_text(encoding="utf-8"))
+    except Exception:
+        return None
+    if not isinstance(data, dict) or data.get("version") != version:
+        return None
+    return data
+
+
+def _write_json(path: Path, payload: dict) -> None:
+    tmp_path = path.with_suffix(".tmp")
+    tmp_path.write_text(json.dumps(payload, ensure_ascii=False, separators=(",", ":")), encoding="utf-8")
+    os.replace(tmp_path, path)
+
+
+def _is_fresh(saved_at: object, ttl_seconds: float) -> bool:
+    try:
+        return time.time() - float(saved_at) < ttl_seconds
+    except (TypeError, ValueError):
+        return False
+
+
+def load_universe_cache() -> Optional[dict]:
+    data = _read_json(UNIVERSE_CACHE_FILE, UNIVERSE_CACHE_VERSION)
+    if data is None or not isinstance(data.get("coins"), list) or not data["coins"]:
+        return None
+    if not isinstance(data.get("popular"), list) or not isinstance(data.get("exchanges"), list):
+        return None
+    return data
+
+
+def save_universe_cache(
+    coins: List[str],
+    exchanges: List[str],
+    popular: List[str],
+    popular_saved_at: float,
+) -> None:
+    _write_json(
+        UNIVERSE_CACHE_FILE,
+        {
+            "version": UNIVERSE_CACHE_VERSION,
+            "saved_at": time.time(),
+            "exchanges": sorted(exchanges),
+            "coins": coins,
+            # Raw market-cap ranking, kept apart so it outlives the universe.
+            "popular": popular,
+            "popular_saved_at": popular_saved_at,
+        },
+    )
+
+
+def is_universe_cache_fresh(data: dict, exchanges: List[str], ttl_seconds: float = UNIVERSE_CACHE_TTL_SECONDS) -> bool:
+    # A universe built from another set of exchanges is usable but stale.
+    if data.get("exchanges") != sorted(exchanges):
+        return False
+    return _is_fresh(data.get("saved_at"), ttl_seconds)
+
+
+def is_popular_cache_fresh(data: dict, ttl_seconds: float = POPULAR_CACHE_TTL_SECONDS) -> bool:
+    return bool(data.get("popular")) and _is_fresh(data.get("popular_saved_at"), ttl_seconds)
+
+
+def load_scan_state(ttl_seconds: float = SCAN_STATE_TTL_SECONDS) -> Optional[dict]:
+    data = _read_json(SCAN_STATE_FILE, SCAN_STATE_VERSION)
+    if data is None or not isinstance(data.get("scheduler"), dict):
+        return None
+    if not _is_fresh(data.get("saved_at"), ttl_seconds):
+        return None
+    return data["scheduler"]
+
+
+def save_scan_state(state: dict) -> None:
+    _write_json(
+        SCAN_STATE_FILE,
+        {
+            "version": SCAN_STATE_VERSION,
+            "saved_at": time.time(),
+            "scheduler": state,
+        },
+    )
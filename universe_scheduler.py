@@ -0,0 +1,176 @@
+import heapq
+import math
+import threading
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Set, Tuple
+
+if TYPE_CHECKING:
+    from scanner import ArbitrageScanner
+
+
+POPULAR_PRIOR = 2.0
+TAIL_PRIOR = 1.0
+SPREAD_WEIGHT = 1.0
+SPREAD_CAP = 20.0
+VOLUME_WEIGHT = 0.5
+SPREAD_EWMA_ALPHA = 0.5
+
+
+class CoinStats:
+    __slots__ = ("prior", "listings", "spread", "volume_usd", "last_tick", "scans")
+
+    def __init__(self, prior: float) -> None:
+        self.prior = prior
+        self.listings = 0
+        # EWMA of the best gross spread seen for the coin, in %.
+        self.spread = 0.0
+        # Thinner leg of the best pair, in USD.
+        self.volume_usd = 0.0
+        self.last_tick = 0
+        self.scans = 0
+
+
+class UniverseScheduler:
+    # Picks AUTO batches by priority instead of walking the universe in order.
+    # A coin's priority grows with its recent spread, its liquidity and its
+    # popularity, and is multiplied by the number of batches since it was last
+    # scanned, so cold coins still come around, just less often. Coins listed
+    # on fewer than two of the selected exchanges are never scheduled.
+    def __init__(self, scanner: "ArbitrageScanner", popular_count: int = 0) -> None:
+        self.scanner = scanner
+        self.popular_count = popular_count
+        self.coins: List[str] = []
+        self.stats: Dict[str, CoinStats] = {}
+        self.exchange_ids: Tuple[str, ...] = ()
+        # Selected exchanges with their listing counts, to notice markets
+        # that load after the universe was set.
+        self.listing_key: Tuple[Tuple[str, int], ...] = ()
+        self.eligible: List[str] = []
+        self.tick = 0
+        self.cycle_count = 0
+        self.pass_seen: Set[str] = set()
+        self.lock = threading.Lock()
+
+    def set_universe(self, coins: List[str]) -> None:
+        with self.lock:
+            self._set_universe(coins)
+
+    def _set_universe(self, coins: List[str]) -> None:
+        stats: Dict[str, CoinStats] = {}
+        for idx, coin in enumerate(coins):
+            previous = self.stats.get(coin)
+            if previous is None:
+                previous = CoinStats(POPULAR_PRIOR if idx < self.popular_count else TAIL_PRIOR)
+            stats[coin] = previous
+        self.coins = list(coins)
+        self.stats = stats
+        self.pass_seen &= set(coins)
+        self._refresh_listings()
+
+    def set_exchanges(self, exchange_ids: Iterable[str]) -> None:
+        selected = tuple(exchange_ids)
+        with self.lock:
+            if selected != self.exchange_ids or self._listing_key(selected) != self.listing_key:
+                self.exchange_ids = selected
+                self._refresh_listings()
+
+    def _listing_key(self, exchange_ids: Tuple[str, ...]) -> Tuple[Tuple[str, int], ...]:
+        index = self.scanner.exchange_symbol_index
+        return tuple((exchange_id, len(index.get(exchange_id, {}))) for exchange_id in exchange_ids)
+
+    def _refresh_listings(self) -> None:
+        self.listing_key = self._listing_key(self.exchange_ids)
+        counts: Dict[str, int] = {}
+        for exchange_id in self.exchange_ids:
+            for base_code in self.scanner.exchange_symbol_index.get(exchange_id, {}):
+                counts[base_code] = counts.get(base_code, 0) + 1
+        self.eligible = []
+        for coin in self.coins:
+            listings = counts.get(coin, 0)
+            self.stats[coin].listings = listings
+            if listings >= 2:
+                self.eligible.append(coin)
+
+    def next_batch(self, size: int, blacklist: Optional[Set[str]] = None) -> List[str]:
+        with self.lock:
+            return self._next_batch(size, blacklist or set())
+
+    def _next_batch(self, size: int, blacklist: Set[str]) -> List[str]:
+        candidates = [coin for coin in self.eligible if coin not in blacklist]
+        if not candidates:
+            return []
+        self.tick += 1
+        tick = self.tick
+        stats = self.stats
+
+        def score(coin: str) -> float:
+            item = stats[coin]
+            return self.priority(item) * (tick - item.last_tick)
+
+        # nlargest keeps universe order for equal scores, so a fresh
+        # universe starts with the popular coins exactly like before.
+        batch = heapq.nlargest(min(size, len(candidates)), candidates, key=score)
+        for coin in batch:
+            stats[coin].last_tick = tick
+
+        self.pass_seen.update(batch)
+        if len(self.pass_seen) >= len(candidates) and self.pass_seen.issuperset(candidates):
+            self.cycle_count += 1
+            self.pass_seen = set()
+        return batch
+
+    def export_state(self) -> dict:
+        # Plain JSON data: the pass position and what was learned per coin.
+        with self.lock:
+            return {
+                "tick": self.tick,
+                "cycle_count": self.cycle_count,
+                "pass_seen": sorted(self.pass_seen),
+                "stats": {
+                    coin: [item.spread, item.volume_usd, item.last_tick, item.scans]
+                    for coin, item in self.stats.items()
+                    if item.scans or item.last_tick
+                },
+            }
+
+    def restore_state(self, state: dict) -> None:
+        # Applied on top of the current universe; coins that left it are dropped.
+        with self.lock:
+            try:
+                self.tick = max(self.tick, int(state.get("tick", 0)))
+                self.cycle_count = int(state.get("cycle_count", 0))
+                self.pass_seen = {coin for coin in state.get("pass_seen", []) if coin in self.stats}
+                for coin, values in (state.get("stats") or {}).items():
+                    item = self.stats.get(coin)
+                    if item is None:
+                        continue
+                    spread, volume_usd, last_tick, scans = values
+                    item.spread = float(spread)
+                    item.volume_usd = float(volume_usd)
+                    item.last_tick = min(int(last_tick), self.tick)
+                    item.scans = int(scans)
+            except (TypeError, ValueError):
+                return
+
+    def priority(self, item: CoinStats) -> float:
+        spread = min(item.spread, SPREAD_CAP)
+        liquidity = math.log10(1.0 + item.volume_usd / 1000.0)
+        return item.prior + SPREAD_WEIGHT * spread + VOLUME_WEIGHT * liquidity
+
+    def observe(self, rows: Dict[str, Dict[str, object]]) -> None:
+        with self.lock:
+            self._observe(rows)
+
+    def _observe(self, rows: Dict[str, Dict[str, object]]) -> None:
+        for coin, row in rows.items():
+            item = self.stats.get(coin)
+            if item is None:
+                continue
+            spread = row.get("spread")
+            sample = spread if isinstance(spread, float) and spread <= 99 else 0.0
+            item.spread = sample if item.scans == 0 else (
+                SPREAD_EWMA_ALPHA * sample + (1.0 - SPREAD_EWMA_ALPHA) * item.spread
+            )
+            volumes = [row.get("min_volume_usd"), row.get("max_volume_usd")]
+            if all(isinstance(volume, float) for volume in volumes):
+                item.volume_usd = min(volumes)
+            item.scans += 1
@@ -0,0 +1,232 @@
+import tkinter as tk
+from tkinter import ttk
+from typing import Callable, List, Optional, Sequence, Tuple
+
+
+ROW_HEIGHT = 26
+HEADER_HEIGHT = 30
+GRID_COLOR = "#1f2a3d"
+HEADER_BG = "#1e293b"
+HEADER_FG = "#9ab6ff"
+FONTS = {
+    "normal": ("Consolas", 10),
+    "bold": ("Consolas", 10, "bold"),
+    "small_bold": ("Consolas", 9, "bold"),
+    "link": ("Consolas", 10, "underline"),
+}
+
+# text, fg, bg, font key, click action
+Cell = Tuple[str, str, str, str, Optional[Callable[[], None]]]
+
+
+class VirtualTable:
+    # Canvas-drawn grid: only the visible rows own canvas items, the slots are
+    # reused while scrolling and a cell is reconfigured only when its text or
+    # colors actually change.
+    def __init__(self, parent: tk.Widget, bg: str = "#111827") -> None:
+        self.bg = bg
+        self.frame = tk.Frame(parent, bg=bg, bd=1, relief=tk.FLAT)
+        self.header = tk.Canvas(self.frame, height=HEADER_HEIGHT, bg=bg, highlightthickness=0)
+        self.body = tk.Canvas(self.frame, bg=bg, highlightthickness=0)
+        self.scroll_y = ttk.Scrollbar(self.frame, orient=tk.VERTICAL, command=self._yview)
+        self.scroll_x = ttk.Scrollbar(self.frame, orient=tk.HORIZONTAL, command=self._xview)
+        self.body.configure(yscrollcommand=self._on_yscroll, xscrollcommand=self.scroll_x.set)
+
+        self.header.grid(row=0, column=0, sticky="ew")
+        self.body.grid(row=1, column=0, sticky="nsew")
+        self.scroll_y.grid(row=1, column=1, sticky="ns")
+        self.scroll_x.grid(row=2, column=0, sticky="ew")
+        self.frame.grid_rowconfigure(1, weight=1)
+        self.frame.grid_columnconfigure(0, weight=1)
+
+        self.headers: List[str] = []
+        self.widths: List[int] = []
+        self.offsets: List[int] = []
+        self.items: Sequence[object] = []
+        self.cell_builder: Callable[[object, int], List[Cell]] = lambda _item, _idx: []
+        self.slots: List[List[Tuple[int, int]]] = []
+        self.slot_rows: List[Optional[int]] = []
+        self.slot_visible: List[bool] = []
+        self.slot_state: List[List[Optional[Tuple[str, str, str, str]]]] = []
+        self.slot_actions: List[List[Optional[Callable[[], None]]]] = []
+        self.refresh_job: Optional[str] = None
+
+        self.body.bind("<Configure>", lambda _e: self._schedule_refresh())
+        self.body.bind("<Button-1>", self._on_click)
+        self.body.bind("<Motion>", self._on_motion)
+        self.body.bind("<MouseWheel>", self._on_wheel)
+        self.body.bind("<Button-4>", lambda _e: self._yview("scroll", -3, "units"))
+        self.body.bind("<Button-5>", lambda _e: self._yview("scroll", 3, "units"))
+
+    def pack(self, **kwargs) -> None:
+        self.frame.pack(**kwargs)
+
+    def set_columns(self, headers: List[str], widths: List[int]) -> None:
+        if headers == self.headers and widths == self.widths:
+            return
+        self.headers = list(headers)
+        self.widths = list(widths)
+        self.offsets = []
+        x = 0
+        for width in self.widths:
+            self.offsets.append(x)
+            x += width
+
+        self.header.delete("all")
+        for header, x0, width in zip(self.headers, self.offsets, self.widths):
+            self.header.create_rectangle(x0, 0, x0 + width, HEADER_HEIGHT, fill=HEADER_BG, outline=GRID_COLOR)
+            self.header.create_text(
+                x0 + width // 2,
+                HEADER_HEIGHT // 2,
+                text=header,
+                fill=HEADER_FG,
+                font=FONTS["bold"],
+            )
+        self.header.configure(scrollregion=(0, 0, x, HEADER_HEIGHT))
+
+        self.body.delete("all")
+        self.slots = []
+        self.slot_rows = []
+        self.slot_visible = []
+        self.slot_state = []
+        self.slot_actions = []
+
+    def set_items(self, items: Sequence[object], cell_builder: Callable[[object, int], List[Cell]]) -> None:
+        self.items = items
+        self.cell_builder = cell_builder
+        total_width = sum(self.widths)
+        self.body.configure(scrollregion=(0, 0, total_width, max(1, len(items)) * ROW_HEIGHT))
+        self._refresh_view()
+
+    def redraw(self) -> None:
+        # Rebuilds the visible rows, e.g. after data their cells read changed.
+        self._schedule_refresh()
+
+    def _yview(self, *args) -> None:
+        self.body.yview(*args)
+        self._schedule_refresh()
+
+    def _xview(self, *args) -> None:
+        self.body.xview(*args)
+        self.header.xview(*args)
+
+    def _on_yscroll(self, first: str, last: str) -> None:
+        self.scroll_y.set(first, last)
+        self._schedule_refresh()
+
+    def _on_wheel(self, event: tk.Event) -> None:
+        self._yview("scroll", int(-event.delta / 120) * 3, "units")
+
+    def _schedule_refresh(self) -> None:
+        if self.refresh_job is None:
+            self.refresh_job = self.body.after_idle(self._refresh_view)
+
+    def _refresh_view(self) -> None:
+        if self.refresh_job is not None:
+            try:
+                self.body.after_cancel(self.refresh_job)
+            except tk.TclError:
+                pass
+            self.refresh_job = None
+        if not self.widths:
+            return
+
+        height = max(self.body.winfo_height(), ROW_HEIGHT)
+        first = max(0, int(self.body.canvasy(0) // ROW_HEIGHT))
+        visible = height // ROW_HEIGHT + 2
+        while len(self.slots) < visible:
+            self._create_slot()
+
+        for slot_idx in range(len(self.slots)):
+            row_idx = first + slot_idx
+            if slot_idx >= visible or row_idx >= len(self.items):
+                self._hide_slot(slot_idx)
+                continue
+            cells = self.cell_builder(self.items[row_idx], row_idx)
+            self._show_slot(slot_idx, row_idx, cells)
+
+    def _create_slot(self) -> None:
+        slot: List[Tuple[int, int]] = []
+        for x0, width in zip(self.offsets, self.widths):
+            rect = self.body.create_rectangle(x0, 0, x0 + width, ROW_HEIGHT, outline=GRID_COLOR, state=tk.HIDDEN)
+            text = self.body.create_text(x0 + width // 2, ROW_HEIGHT // 2, text="", state=tk.HIDDEN)
+            slot.append((rect, text))
+        self.slots.append(slot)
+        self.slot_rows.append(None)
+        self.slot_visible.append(False)
+        self.slot_state.append([None for _ in self.widths])
+        self.slot_actions.append([None for _ in self.widths])
+
+    def _hide_slot(self, slot_idx: int) -> None:
+        if not self.slot_visible[slot_idx]:
+            return
+        for rect, text in self.slots[slot_idx]:
+            self.body.itemconfigure(rect, state=tk.HIDDEN)
+            self.body.itemconfigure(text, state=tk.HIDDEN)
+        self.slot_visible[slot_idx] = False
+        self.slot_rows[slot_idx] = None
+        self.slot_state[slot_idx] = [None for _ in self.widths]
+        self.slot_actions[slot_idx] = [None for _ in self.widths]
+
+    def _show_slot(self, slot_idx: int, row_idx: int, cells: List[Cell]) -> None:
+        slot = self.slots[slot_idx]
+        moved = self.slot_rows[slot_idx] != row_idx
+        was_hidden = not self.slot_visible[slot_idx]
+        y0 = row_idx * ROW_HEIGHT
+        state = self.slot_state[slot_idx]
+        actions = self.slot_actions[slot_idx]
+        for col, ((rect, text), cell) in enumerate(zip(slot, cells)):
+            label, fg, bg, font_key, action = cell
+            x0 = self.offsets[col]
+            width = self.widths[col]
+            if moved:
+                self.body.coords(rect, x0, y0, x0 + width, y0 + ROW_HEIGHT)
+                self.body.coords(text, x0 + width // 2, y0 + ROW_HEIGHT // 2)
+            if was_hidden:
+                self.body.itemconfigure(rect, state=tk.NORMAL)
+                self.body.itemconfigure(text, state=tk.NORMAL)
+            key = (label, fg, bg, font_key)
+            if state[col] != key:
+                previous = state[col]
+                if previous is None or previous[2] != bg:
+                    self.body.itemconfigure(rect, fill=bg)
+                if previous is None or previous[:2] != key[:2] or previous[3] != font_key:
+                    self.body.itemconfigure(text, text=label, fill=fg, font=FONTS.get(font_key, FONTS["normal"]))
+                state[col] = key
+            actions[col] = action
+        self.slot_rows[slot_idx] = row_idx
+        self.slot_visible[slot_idx] = True
+
+    def _cell_at(self, event: tk.Event) -> Tuple[Optional[int], Optional[int]]:
+        y = self.body.canvasy(event.y)
+        x = self.body.canvasx(event.x)
+        row_idx = int(y // ROW_HEIGHT)
+        col_idx = None
+        for col, (x0, width) in enumerate(zip(self.offsets, self.widths)):
+            if x0 <= x < x0 + width:
+                col_idx = col
+                break
+        if row_idx < 0 or row_idx >= len(self.items) or col_idx is None:
+            return None, None
+        return row_idx, col_idx
+
+    def _slot_action(self, row_idx: int, col_idx: int) -> Optional[Callable[[], None]]:
+        for slot_idx, slot_row in enumerate(self.slot_rows):
+            if slot_row == row_idx:
+                return self.slot_actions[slot_idx][col_idx]
+        return None
+
+    def _on_click(self, event: tk.Event) -> None:
+        row_idx, col_idx = self._cell_at(event)
+        if row_idx is None or col_idx is None:
+            return
+        action = self._slot_action(row_idx, col_idx)
+        if action is not None:
+            action()
+
+    def _on_motion(self, event: tk.Event) -> None:
+        row_idx, col_idx = self._cell_at(event)
+        clickable = row_idx is not None and col_idx is not None and self._slot_action(row_idx, col_idx) is not None
+        cursor = "hand2" if clickable else ""
+        if self.body.cget("cursor") != cursor:
+            self.body.configure(cursor=cursor)
@@ -0,0 +1,137 @@
+import argparse
+import asyncio
+import json
+import random
+import time
+import zlib
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from aiohttp import web
+
+
+def _base_price(symbol: str) -> float:
+    return 0.5 + (zlib.crc32(symbol.encode("utf-8")) % 50000) / 100.0
+
+
+def _exchange_bias(exchange_id: str, symbol: str) -> float:
+    seed = zlib.crc32(f"{exchange_id}:{symbol}".encode("utf-8"))
+    return 1.0 + ((seed % 400) - 200) / 10000.0
+
+
+def _load_script(path: Optional[Path]) -> List[dict]:
+    if path is None:
+        return []
+    events: List[dict] = []
+    for line in path.read_text(encoding="utf-8").splitlines():
+        line = line.strip()
+        if line:
+            events.append(json.loads(line))
+    return events
+
+
+async def _send_script(ws: web.WebSocketResponse, exchange_id: str, symbols: List[str], events: List[dict]) -> None:
+    wanted = set(symbols)
+    previous_delay = 0.0
+    for event in events:
+        if event.get("exchange") not in {None, exchange_id} or event.get("symbol") not in wanted:
+            continue
+        delay = float(event.get("delay", previous_delay))
+        await asyncio.sleep(max(0.0, delay - previous_delay))
+        previous_delay = delay
+        payload = {key: value for key, value in event.items() if key not in {"exchange", "delay"}}
+        payload.setdefault("timestamp", int(time.time() * 1000))
+        await ws.send_json(payload)
+
+
+async def _send_random_walk(
+    ws: web.WebSocketResponse,
+    exchange_id: str,
+    symbols: List[str],
+    interval: float,
+    rng: random.Random,
+) -> None:
+    prices: Dict[str, float] = {
+        symbol: _base_price(symbol) * _exchange_bias(exchange_id, symbol) for symbol in symbols
+    }
+    while not ws.closed:
+        symbol = rng.choice(symbols)
+        prices[symbol] *= 1.0 + rng.uniform(-0.002, 0.002)
+        last = prices[symbol]
+        half_spread = last * 0.0005
+        await ws.send_json(
+            {
+                "symbol": symbol,
+                "bid": last - half_spread,
+                "ask": last + half_spread,
+                "last": last,
+                "quoteVolume": rng.uniform(5000, 500000),
+                "timestamp": int(time.time() * 1000),
+            }
+        )
+        await asyncio.sleep(interval)
+
+
+async def stream_handler(request: web.Request) -> web.WebSocketResponse:
+    ws = web.WebSocketResponse()
+    await ws.prepare(request)
+
+    message = await ws.receive()
+    if message.type != web.WSMsgType.TEXT:
+        await ws.close()
+        return ws
+    subscribe = json.loads(message.data)
+    exchange_id = str(subscribe.get("exchange", ""))
+    symbols = [str(symbol) for symbol in subscribe.get("symbols", []) if symbol]
+    if not symbols:
+        await ws.close()
+        return ws
+
+    app = request.app
+    if app["script"]:
+        sender = asyncio.ensure_future(_send_script(ws, exchange_id, symbols, app["script"]))
+    else:
+        sender = asyncio.ensure_future(
+            _send_random_walk(ws, exchange_id, symbols, app["interval"], random.Random(app["seed"]))
+        )
+    # Incoming frames are read while quotes go out, so a client close is
+    # answered at once instead of waiting for the close timeout.
+    reader = asyncio.ensure_future(_drain(ws))
+    await asyncio.wait([sender, reader], return_when=asyncio.FIRST_COMPLETED)
+    sender.cancel()
+    reader.cancel()
+    await asyncio.gather(sender, reader, return_exceptions=True)
+    await ws.close()
+    return ws
+
+
+async def _drain(ws: web.WebSocketResponse) -> None:
+    async for _message in ws:
+        pass
+
+
+def create_app(interval: float = 0.05, seed: int = 1, script: Optional[Path] = None) -> web.Application:
+    app = web.Application()
+    app["interval"] = interval
+    app["seed"] = seed
+    app["script"] = _load_script(script)
+    app.router.add_get("/ws", stream_handler)
+    return app
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Local WebSocket stand-in for the STREAM scan mode")
+    parser.add_argument("--host", default="127.0.0.1", help="Bind address")
+    parser.add_argument("--port", type=int, default=8765, help="Bind port")
+    parser.add_argument("--interval", type=float, default=0.05, help="Seconds between random-walk quotes")
+    parser.add_argument("--seed", type=int, default=1, help="Random seed for the random walk")
+    parser.add_argument("--script", type=Path, default=None, help="JSONL file with scripted quotes")
+    args = parser.parse_args()
+
+    print(f"Stream URL: ws://{args.host}:{args.port}/ws")
+    print("Запусти приложение с ARBITRAJ_STREAM_URL=<Stream URL>, режим STREAM.")
+    web.run_app(create_app(args.interval, args.seed, args.script), host=args.host, port=args.port, print=None)
+
+
+if __name__ == "__main__":
+    main()